@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+from sklearn.ensemble import RandomForestClassifier
+from ema_workbench import CategoricalParameter, IntegerParameter
+from batch_model import regret_BECCS_batch, TECHS
+from designs import design_from_unit, design_to_unit
+from validation import best_tech
+
+# Adaptive design of experiments that concentrates the samples near the decision boundaries, where the best
+# technology (and so whether regret is zero) changes, instead of deep inside the regions one technology dominates.
+# It starts from a coarse Latin hypercube, fits a random forest classifier of the best technology on the unit-cube
+# coordinates of the parameters, and then repeatedly evaluates the candidates of a fresh random pool on which the
+# classifier is least certain (smallest margin between the two most likely technologies), plus a share of random
+# points so that no region is left unexplored. Convergence is tracked on a fixed set of probe points: the share of
+# probes whose predicted best technology changed since the previous round, which goes to zero as the boundaries
+# settle.
+#
+# The sample is deliberately not uniform: it is meant for finding and describing the boundaries (cart.py, the
+# regret plots); shares and averages over the whole space need a uniform design.
+#
+# The decision lever only selects which regret is reported, not any NPV, so it is not sampled or used as a feature;
+# the designs leave it at the regret_BECCS default.
+
+NOT_NPV = ["decision"]
+
+def npv_parameters(parameters):
+    """
+    The parameters the NPVs, and so the best technology, depend on: all but the levers in NOT_NPV.
+    """
+    return [parameter for parameter in parameters if parameter.name not in NOT_NPV]
+
+def snap(parameters, u):
+    """
+    u with the coordinates of integer and categorical parameters moved to the centres of their bins, so the
+    classifier sees one value per category, as design_from_unit maps them.
+    """
+    u = np.array(u, dtype=float)
+    for j, parameter in enumerate(parameters):
+        if isinstance(parameter, CategoricalParameter):
+            m = len(parameter.categories)
+        elif isinstance(parameter, IntegerParameter):
+            m = parameter.upper_bound - parameter.lower_bound + 1
+        else:
+            continue
+        u[:, j] = (np.minimum(np.floor(u[:, j] * m), m - 1) + 0.5) / m
+    return u
+
+def margin(probabilities):
+    """
+    Difference between the two highest class probabilities; small near a boundary.
+    """
+    top = np.sort(probabilities, axis=1)
+    return top[:, -1] - (top[:, -2] if top.shape[1] > 1 else 0)
+
+def adaptive_design(parameters=None, n_initial=2000, batch=500, budget=10000, pool=20, explore=0.1, probes=20000,
+                    tolerance=0.03, patience=2, evaluate=regret_BECCS_batch, seed=None, verbose=False):
+    """
+    Adaptive design over the npv_parameters of parameters (default: model.uncertainties + model.levers of
+    controller.py): n_initial LHS points, then rounds of batch points chosen from pool * batch random candidates,
+    until budget experiments or until fewer than tolerance of the probes change their predicted best technology in
+    patience successive rounds.
+    Refitting the forest alone changes about 2% of the predictions, so tolerances below that are never reached.
+
+    evaluate(design) -> {outcome: array} must return the npv_<tech> outcomes. Returns (experiments, outcomes,
+    history): the design DataFrame, {outcome: array}, and one row per round with the number of samples, the share
+    of probes that changed their predicted best technology and the share of probes with a margin below 0.5.
+    """
+    if parameters is None:
+        from controller import model
+        parameters = model.uncertainties + model.levers
+    parameters = npv_parameters(parameters)
+    d = len(parameters)
+    rng = np.random.default_rng(seed)
+    probe_u = snap(parameters, rng.random((probes, d)))
+    classifier = RandomForestClassifier(n_estimators=100, min_samples_leaf=2, n_jobs=1, random_state=seed)
+
+    u = qmc.LatinHypercube(d=d, seed=seed).random(n_initial)
+    outcomes = evaluate(design_from_unit(parameters, u))
+    history, previous, stable = [], None, 0
+    while True:
+        classifier.fit(snap(parameters, u), best_tech(outcomes))
+        predicted = classifier.predict(probe_u)
+        changed = np.nan if previous is None else float((predicted != previous).mean())
+        previous = predicted
+        history.append({"samples": len(u), "changed": changed,
+                        "boundary_share": float((margin(classifier.predict_proba(probe_u)) < 0.5).mean())})
+        if verbose:
+            print(history[-1])
+        stable = stable + 1 if changed < tolerance else 0
+        if stable >= patience or len(u) >= budget:
+            break
+
+        n = min(batch, budget - len(u))
+        n_random = int(round(explore * n))
+        candidates = rng.random((pool * n, d))
+        uncertain = np.argsort(margin(classifier.predict_proba(snap(parameters, candidates))), kind="stable")[:n - n_random]
+        new = np.vstack([candidates[uncertain], rng.random((n_random, d))])
+        new_outcomes = evaluate(design_from_unit(parameters, new))
+        u = np.vstack([u, new])
+        outcomes = {name: np.concatenate([values, new_outcomes[name]]) for name, values in outcomes.items()}
+    return design_from_unit(parameters, u), outcomes, pd.DataFrame(history)
+
+def boundary_accuracy(experiments, outcomes, test_experiments, test_outcomes, parameters, share=0.1, seed=None):
+    """
+    Accuracy on the test experiments of a classifier of the best technology fitted on experiments and outcomes:
+    over all of them, and over the share of them closest to a boundary, those with the smallest NPV difference
+    between the best and the second best technology. Only the npv_parameters of parameters are features.
+    """
+    parameters = npv_parameters(parameters)
+    classifier = RandomForestClassifier(n_estimators=100, min_samples_leaf=2, n_jobs=1, random_state=seed)
+    classifier.fit(snap(parameters, design_to_unit(parameters, experiments)), best_tech(outcomes))
+    truth = best_tech(test_outcomes)
+    correct = classifier.predict(snap(parameters, design_to_unit(parameters, test_experiments))) == truth
+    npv = np.sort(np.column_stack([test_outcomes[f"npv_{tech}"] for tech in TECHS]), axis=1)
+    gap = npv[:, -1] - npv[:, -2]
+    near = gap <= np.quantile(gap, share)
+    return {"accuracy": correct.mean(), "boundary_accuracy": correct[near].mean()}
+
+if __name__ == "__main__":
+    import time
+    from controller import model
+    from designs import sample_design
+
+    parameters = npv_parameters(model.uncertainties + model.levers)
+    start = time.perf_counter()
+    experiments, outcomes, history = adaptive_design(parameters, budget=10000, seed=1)
+    print(f"Adaptive design of {len(experiments)} experiments in {time.perf_counter() - start:.1f} s")
+    print(history)
+
+    test = sample_design(parameters, 50000, seed=2, method="mc")
+    test_outcomes = regret_BECCS_batch(test)
+    print("adaptive", len(experiments), boundary_accuracy(experiments, outcomes, test, test_outcomes, parameters, seed=1))
+    for n in [len(experiments), 5 * len(experiments)]:
+        lhs = sample_design(parameters, n, seed=3)
+        print("LHS", n, boundary_accuracy(lhs, regret_BECCS_batch(lhs), test, test_outcomes, parameters, seed=1))
@@ -0,0 +1,350 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+
+# Shared helpers for the parallel_* regret figures. Everything here works on whole columns at once,
+# so the cost stays small compared to the plotting even for the full experiments.csv.
+
+# Compact dtypes for the columns of experiments.csv/outcomes.csv. Anything else that is float is downcast to float32.
+COMPACT_DTYPES = {
+    "decision": "category",
+    "lifetime": "int16",
+    "timing": "int16",
+    "operating_increase": "int16",
+    "scenario": "int32",
+    "policy": "int32",
+    "model": "category",
+}
+
+_column_cache = {}
+
+def load_columns(path, columns):
+    """
+    Loads only the given columns of a results CSV, with compact dtypes.
+
+    Columns already loaded from the same (unchanged) file in this process are reused, so several figures
+    produced in one invocation read each column at most once.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    cached = _column_cache.get(key)
+
+    missing = [col for col in columns if cached is None or col not in cached.columns]
+    if missing:
+        loaded = pd.read_csv(path, usecols=missing, dtype={col: COMPACT_DTYPES[col] for col in missing if col in COMPACT_DTYPES})
+        floats = loaded.select_dtypes(include="float64").columns
+        loaded[floats] = loaded[floats].astype("float32")
+        cached = loaded if cached is None else pd.concat([cached, loaded], axis=1)
+        _column_cache[key] = cached
+
+    return cached[list(columns)]
+
+def load_results(experiment_columns, outcome_columns, experiments_path="experiments.csv", outcomes_path="outcomes.csv"):
+    """
+    Loads the requested experiment and outcome columns side by side, aligned on index.
+    """
+    return pd.concat([load_columns(experiments_path, experiment_columns), load_columns(outcomes_path, outcome_columns)], axis=1)
+
+def add_perturbation(df, outcome, direction='left', x="timing"):
+    """
+    Returns the x values jittered to one side of their category, with a greater jitter for rows where the outcome is 0.
+    """
+    zero = (df[outcome] == 0).to_numpy()
+    low = np.where(zero, 0.3, 0.2)
+    high = np.where(zero, 0.6, 0.5)
+    perturbation = np.random.uniform(low, high)
+    if direction == 'left':
+        perturbation = -perturbation
+
+    return df[x] + perturbation
+
+def stack_subsets(df, masks):
+    """
+    Stacks the rows selected by each boolean mask into one frame with a categorical "subset" column.
+
+    The masks may overlap (a row can belong to several subsets), which a plain groupby on one label column cannot express.
+    """
+    labels = list(masks)
+    positions = [np.flatnonzero(np.asarray(mask)) for mask in masks.values()]
+    stacked = df.iloc[np.concatenate(positions)].reset_index(drop=True)
+    stacked["subset"] = pd.Categorical(np.repeat(labels, [len(p) for p in positions]), categories=labels)
+    return stacked
+
+def bin_by_subset(values, subsets, num_bins):
+    """
+    Assigns each value to one of num_bins equal-width bins spanning the min/max of its own subset.
+
+    Returns (bin_index, bin_centers) where bin_centers is a subset x bin table. The last bin is closed, as in np.histogram.
+    """
+    grouped = values.groupby(subsets, observed=True)
+    vmin = grouped.transform("min")
+    width = (grouped.transform("max") - vmin) / num_bins
+
+    bin_index = np.floor((values - vmin) / width.where(width > 0, 1)).clip(0, num_bins - 1).astype(int)
+
+    lower = grouped.min()
+    step = (grouped.max() - lower) / num_bins
+    bin_centers = pd.DataFrame(
+        lower.to_numpy()[:, None] + step.to_numpy()[:, None] * (np.arange(num_bins) + 0.5),
+        index=lower.index,
+        columns=range(num_bins),
+    )
+    return bin_index, bin_centers
+
+def zero_regret_density(df, outcome, by, subset=None):
+    """
+    Share of rows with outcome == 0 for every (subset, by) pair, computed in one grouped reduction.
+
+    Returns a subset x by table (or a Series over by when no subset is given). Empty pairs are NaN.
+    """
+    is_zero = df[outcome] == 0
+    if subset is None:
+        return is_zero.groupby(df[by], observed=True).mean().sort_index()
+
+    density = is_zero.groupby([df[subset], df[by]], observed=True).mean()
+    return density.unstack(by).sort_index(axis=1)
+
+AUCTION_CATEGORY_LABELS = [
+    "Auction=True & crc>133",
+    "Auction=True & crc≤133",
+    "Auction=False & crc>133",
+    "Auction=False & crc≤133"
+]
+
+def auction_category(df, crc_threshold=133):
+    """
+    Encodes the Auction flag and the crc level into the categories 0-3 of AUCTION_CATEGORY_LABELS.
+    """
+    auction = df["Auction"].to_numpy() == True
+    high_crc = df["crc"].to_numpy() > crc_threshold
+    return np.where(auction, 0, 2) + np.where(high_crc, 0, 1)
+
+def normalize_columns(df):
+    """
+    Min-max normalizes every column to [0, 1] in one array operation. Constant columns are placed at 0.5.
+    """
+    values = df.to_numpy(dtype=float)
+    vmin = np.nanmin(values, axis=0)
+    span = np.nanmax(values, axis=0) - vmin
+    return np.where(span > 0, (values - vmin) / np.where(span > 0, span, 1), 0.5)
+
+def line_density(y_start, y_end, nx=64, ny=200):
+    """
+    Rasterizes straight lines from y_start (at x=0) to y_end (at x=1), both in [0, 1], into an (ny, nx) count image.
+    """
+    s = np.linspace(0, 1, nx)
+    density = np.zeros(ny * nx)
+    for block in range(0, len(y_start), 50000): # Bounded memory for very large frames
+        y0 = y_start[block:block+50000, None]
+        y1 = y_end[block:block+50000, None]
+        rows = np.rint((y0 + (y1 - y0) * s) * (ny - 1)).astype(np.int64)
+        density += np.bincount((rows * nx + np.arange(nx)).ravel(), minlength=ny * nx)
+    return density.reshape(ny, nx)
+
+def parallel_coordinates(ax, df, color_by=None, labels=None, mode="lines", cmap="viridis", alpha=0.2, linewidth=0.5, nx=64, ny=200):
+    """
+    Draws a parallel coordinates plot of all columns in df on ax.
+
+    mode="lines" draws every row as part of one LineCollection, which stays responsive for 100k+ rows.
+    mode="density" instead accumulates a line-density raster per pair of neighbouring axes, coloured by the
+    mix of categories passing through each pixel and shaded by the (log) number of lines.
+
+    color_by names an integer-coded column (e.g. Auction_Category) and labels optionally names its categories.
+    """
+    columns = list(df.columns)
+    y = normalize_columns(df)
+    n_rows, n_axes = y.shape
+    colormap = plt.get_cmap(cmap)
+
+    if color_by is not None:
+        codes, categories = pd.factorize(df[color_by], sort=True)
+    else:
+        codes, categories = np.zeros(n_rows, dtype=int), np.array([0])
+    category_colors = colormap(np.arange(len(categories)) / max(len(categories) - 1, 1))
+
+    if mode == "lines":
+        segments = np.empty((n_rows, n_axes, 2))
+        segments[:, :, 0] = np.arange(n_axes)
+        segments[:, :, 1] = y
+        lines = LineCollection(segments, colors=category_colors[codes], alpha=alpha, linewidths=linewidth)
+        lines.set_rasterized(True) # Keeps vector exports small
+        ax.add_collection(lines)
+
+    elif mode == "density":
+        for j in range(n_axes - 1):
+            counts = np.stack([line_density(y[codes == c, j], y[codes == c, j+1], nx, ny) for c in range(len(categories))])
+            total = counts.sum(axis=0)
+            image = np.einsum("cyx,ck->yxk", counts, category_colors) / np.where(total > 0, total, 1)[:, :, None]
+            image[:, :, 3] = np.log1p(total) / np.log1p(max(total.max(), 1))
+            ax.imshow(image, extent=(j, j+1, 0, 1), origin="lower", aspect="auto", interpolation="nearest")
+
+    else:
+        raise ValueError(f"Unknown parallel coordinates mode: {mode}")
+
+    # Configure plot aesthetics
+    ax.set_xlim(0, n_axes - 1)
+    ax.set_ylim(0, 1)
+    ax.set_xticks(np.arange(n_axes))
+    ax.set_xticklabels(columns, rotation=45)
+    ax.set_xlabel("Features and Outcomes")
+    ax.set_ylabel("Normalized Values")
+    ax.grid(axis="y", linestyle="--", alpha=0.5)
+    for j in range(n_axes):
+        ax.axvline(j, color="black", linewidth=0.8)
+
+    if color_by is not None:
+        names = [labels[category] if labels is not None else str(category) for category in categories]
+        return [Line2D([], [], color=color, linewidth=4, label=name) for color, name in zip(category_colors, names)]
+    return []
+
+def plot_auction_parallel(mode="lines", sample_fraction=None, seed=42, experiments_path="experiments.csv",
+                          outcomes_path="outcomes.csv"):
+    """
+    Parallel coordinates of the regret of every technology, colored by the Auction/CRC category (the optional
+    figure of the parallel_*.py scripts). sample_fraction plots a random share of the rows instead of all of them.
+    """
+    df = load_results(["Auction", "crc"], ["regret_ref", "regret_amine", "regret_oxy", "regret_clc"],
+                      experiments_path, outcomes_path).reset_index(drop=True)
+    if sample_fraction is not None:
+        df = df.sample(frac=sample_fraction, random_state=seed).reset_index(drop=True)
+
+    # Encode Auction and crc into one categorical feature and drop the original Auction column
+    df["Auction_Category"] = auction_category(df)
+    df = df.drop(columns=["Auction"])
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    handles = parallel_coordinates(ax, df, color_by="Auction_Category", labels=AUCTION_CATEGORY_LABELS, mode=mode)
+    ax.set_title("Custom Parallel Coordinates Plot Colored by Auction Category")
+    ax.legend(handles=handles, title="Auction Categories", bbox_to_anchor=(1.05, 1), loc="upper left")
+    return fig
+
+# Columns of the decision boxplot grid, see plot_decision_boxplots
+REGRET_COLUMNS = ["npv_ref_bio", "npv_ref_elc", "npv_amine", "npv_oxy", "npv_clc", "regret_ref","regret_amine","regret_oxy","regret_clc",]
+BOXPLOT_EXPERIMENT_COLUMNS = ["Auction", "Bioshortage", "cbio", "celc"]
+BOXPLOT_OUTCOME_COLUMNS = ["npv_ref", "npv_amine", "npv_oxy", "npv_clc", "regret_ref", "regret_amine", "regret_oxy", "regret_clc"]
+
+def plot_decision_boxplots(experiments, outcomes_df, cmap_min=-300, cmap_max=300):
+    """
+    2x2 grid of NPV/regret boxplots for the four Auction/Bioshortage subsets, coloured by the clipped median of each column.
+    """
+    import seaborn as sns
+
+    # Create new columns based on npv_ref and cbio/celc comparison
+    outcomes_df = outcomes_df.copy()
+    outcomes_df["npv_ref_bio"] = outcomes_df["npv_ref"].where(experiments["cbio"] > experiments["celc"])
+    outcomes_df["npv_ref_elc"] = outcomes_df["npv_ref"].where(experiments["cbio"] < experiments["celc"])
+
+    # Merge experiments and outcomes by index
+    df = pd.concat([experiments[["Auction", "Bioshortage"]], outcomes_df[REGRET_COLUMNS]], axis=1)
+
+    # Define subsets based on Auction and Bioshortage values
+    subsets = {
+        "Auction=False, Bioshortage=False": df[(df["Auction"] == False) & (df["Bioshortage"] == False)],
+        "Auction=False, Bioshortage=True": df[(df["Auction"] == False) & (df["Bioshortage"] == True)],
+        "Auction=True, Bioshortage=False": df[(df["Auction"] == True) & (df["Bioshortage"] == False)],
+        "Auction=True, Bioshortage=True": df[(df["Auction"] == True) & (df["Bioshortage"] == True)]
+    }
+
+    # Get global min/max values for y-axis synchronization
+    global_min = df[REGRET_COLUMNS].min().min()
+    global_max = df[REGRET_COLUMNS].max().max()
+
+    # Clip the column medians to the colormap range and map them to colors
+    box_colors = median_colors(df[REGRET_COLUMNS].median(), cmap_min, cmap_max)
+
+    # Create a figure with 2x2 subplots
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10), sharey=True)  # Synchronize y-axis
+
+    # Loop through subsets and plot boxplots
+    for ax, (title, subset) in zip(axes.flatten(), subsets.items()):
+        sns.boxplot(data=subset[REGRET_COLUMNS], ax=ax, palette=box_colors)
+        ax.set_title(title)
+        ax.set_ylabel("NPV Values")
+        ax.set_xticks(range(len(REGRET_COLUMNS)))
+        ax.set_xticklabels(REGRET_COLUMNS, rotation=20)
+        ax.set_ylim(global_min - 50, global_max)  # Ensure same y-axis scale
+        ax.axhline(0, color="black", linestyle="dashed", linewidth=1, alpha=0.8)
+
+    plt.tight_layout()
+    return fig
+
+def median_colors(medians, cmap_min=-300, cmap_max=300):
+    """
+    Maps medians, clipped to [cmap_min, cmap_max], to hex colors of the Red-Yellow-Green colormap.
+    """
+    clipped_median = np.clip(np.asarray(medians, dtype=float), cmap_min, cmap_max)
+    norm = mcolors.Normalize(vmin=cmap_min, vmax=cmap_max)
+    cmap = plt.get_cmap("RdYlGn")
+    return [mcolors.to_hex(cmap(norm(value))) for value in clipped_median]
+
+def plot_decision_sketches(decision_sketches, cmap_min=-300, cmap_max=300):
+    """
+    The decision boxplot grid of plot_decision_boxplots, drawn from streaming.DecisionSketches instead of all rows.
+
+    Boxes, medians and colors come from the quantile sketches; whiskers extend to 1.5 IQR, bounded by the exact min/max.
+    Outliers are not drawn, since individual rows are not kept. Columns without values in a subset (e.g. npv_ref_bio
+    when biomass is never the dearer fuel) are left empty, and drawn grey if they have no values at all.
+    """
+    filled = [sketch for sketch in decision_sketches.sketches.values() if sketch.count]
+    if not filled:
+        raise ValueError("The decision sketches hold no experiments")
+    global_min = min(sketch.min for sketch in filled)
+    global_max = max(sketch.max for sketch in filled)
+    medians = [decision_sketches.column(column).median() for column in REGRET_COLUMNS]
+    box_colors = [color if np.isfinite(median) else "lightgrey"
+                  for color, median in zip(median_colors(np.nan_to_num(medians), cmap_min, cmap_max), medians)]
+
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10), sharey=True)  # Synchronize y-axis
+
+    for ax, (auction, bioshortage) in zip(axes.flatten(), [(False, False), (False, True), (True, False), (True, True)]):
+        stats, positions, colors = [], [], []
+        for position, (column, color) in enumerate(zip(REGRET_COLUMNS, box_colors), start=1):
+            sketch = decision_sketches.sketch((auction, bioshortage), column)
+            if sketch.count == 0:
+                continue
+            q1, med, q3 = sketch.quantile([0.25, 0.5, 0.75])
+            iqr = q3 - q1
+            stats.append(dict(label=column, q1=q1, med=med, q3=q3, fliers=[],
+                              whislo=max(sketch.min, q1 - 1.5*iqr), whishi=min(sketch.max, q3 + 1.5*iqr)))
+            positions.append(position)
+            colors.append(color)
+        if stats:
+            boxes = ax.bxp(stats, positions=positions, showfliers=False, patch_artist=True, medianprops=dict(color="black"))
+            for patch, color in zip(boxes["boxes"], colors):
+                patch.set_facecolor(color)
+
+        ax.set_title(f"Auction={auction}, Bioshortage={bioshortage}")
+        ax.set_ylabel("NPV Values")
+        ax.set_xticks(range(1, len(REGRET_COLUMNS) + 1))
+        ax.set_xticklabels(REGRET_COLUMNS, rotation=20)
+        ax.set_ylim(global_min - 50, global_max)  # Ensure same y-axis scale
+        ax.axhline(0, color="black", linestyle="dashed", linewidth=1, alpha=0.8)
+
+    plt.tight_layout()
+    return fig
+
+def plot_sobol_indices(sobol_stats):
+    """
+    Horizontal bar chart of the total-order Sobol indices with their confidence intervals.
+    """
+    import seaborn as sns
+
+    sobol_stats_sorted = sobol_stats.sort_values(by="ST", ascending=False)
+
+    fig = plt.figure(figsize=(8, 10))
+    sns.barplot(
+        y=sobol_stats_sorted.index,  # Parameters on y-axis
+        x=sobol_stats_sorted["ST"],  # Sobol indices on x-axis
+        xerr=sobol_stats_sorted["ST_conf"],  # Confidence intervals as error bars
+        capsize=0.2,
+        color="crimson"
+    )
+    plt.ylabel("Parameter")
+    plt.xlabel("Total Sobol Index (ST)")
+    plt.title("Total-Order Sobol Indices with Confidence Intervals")
+    plt.grid(axis="x", linestyle="--", alpha=0.7)
+    return fig
@@ -0,0 +1,243 @@
+import inspect
+import numpy as np
+import pandas as pd
+from model import regret_BECCS, CASH_FLOW_YEARS, CASH_FLOW_QUANTITIES
+from cost_model import COSTS, CAPEX_NAMES
+
+# Vectorized version of model.regret_BECCS: every experiment of a design is evaluated at once with array operations.
+# The arithmetic follows regret_BECCS term by term and in the same order (including the year-by-year NPV sum),
+# so the outcomes match calling regret_BECCS once per row up to the last bit of numpy's pow/exp (~1e-12 MEUR).
+# Beyond regret_BECCS, prices can be given as per-year vectors (see price_paths), e.g. the ETS trajectories
+# of carbon_prices.py, at the same cost as constant prices.
+
+TECHS = ["ref", "amine", "clc", "oxy"]
+DEFAULTS = {name: parameter.default for name, parameter in inspect.signature(regret_BECCS).parameters.items()}
+
+def as_inputs(design=None, **inputs):
+    """
+    Returns {argument: array} for all regret_BECCS arguments, from the columns of design (a DataFrame or dict),
+    keyword overrides, and the regret_BECCS defaults for anything not given.
+    """
+    columns = dict(design.items()) if design is not None else {}
+    columns.update(inputs)
+    n = max([np.size(value) for value in columns.values()] + [1])
+
+    x = {}
+    for name, default in DEFAULTS.items():
+        value = np.asarray(columns.get(name, default))
+        x[name] = np.broadcast_to(value, (n,)) if value.ndim == 0 else value
+    x["decision"] = x["decision"].astype(str)
+    for name in ["Bioshortage", "Powersurge", "Auction", "Integration", "Fossilized", "Toxic", "Experimental", "Hydrogen", "Monostorage"]:
+        x[name] = x[name].astype(bool)
+    for name in ["lifetime", "timing", "operating_increase"]:
+        x[name] = x[name].astype(np.int64)
+    return x
+
+def energy_balances(x):
+    """
+    Qfuel, Qnet, P, mcaptured and operating hours of each technology, as in the energy balance part of regret_BECCS.
+    The plant parameters (LHV, Qfuel, Pnet, Qfgc, Qcond) are inputs like any other, so rows may be different plants.
+    """
+    LHV, Qfuel, Pnet, Qfgc, Qcond = x["LHV"], x["Qfuel"], x["Pnet"], x["Qfgc"], x["Qcond"]
+    Qnet = Qcond + Qfgc
+    rate = x["rate"]
+    operating = x["operating"]
+    operating_tech = operating + x["operating_increase"]
+
+    mfuel = Qfuel/LHV
+    memitted = 1.1024 * mfuel
+    ref = dict(Qfuel=Qfuel, Qnet=Qnet, P=Pnet, mcaptured=0, memitted=memitted, operating=operating)
+
+    # Amine
+    mcaptured = memitted * rate
+    Ploss_ref = 48.3-31.8
+    Qloss_ref = 106.6-73.7
+    Qrec = (11+21.7)/16.6 * mcaptured
+    amine = dict(Qfuel=Qfuel, Qnet=(Qcond - Qloss_ref/16.6 * mcaptured) + Qfgc + Qrec, P=Pnet - Ploss_ref/16.6 * mcaptured,
+                 mcaptured=mcaptured, memitted=memitted * (1-rate), operating=operating_tech)
+
+    # C&L, based on the amine capture
+    Wcompr = 3.5/16.6 * mcaptured
+    Qcool  = 3.6/16.6 * mcaptured
+
+    # CLC
+    O2demand = 0.024045 * mfuel
+    O2oxy = O2demand * (1-x["O2eff"])
+    mCO2 = 1.1024 * mfuel
+    Pasu = x["Wasu"]/1000*O2oxy*32
+    clc = dict(Qfuel=Qfuel, Qnet=Qnet, P=Pnet - Pasu - Wcompr - Qcool, mcaptured=mCO2 * rate, memitted=mCO2 * (1-rate),
+               operating=operating_tech)
+
+    # Oxyfuel
+    Pasu = x["Wasu"]/1000*O2demand*32
+    oxy = dict(Qfuel=Qfuel, Qnet=Qnet, P=Pnet - Pasu - Wcompr - Qcool, mcaptured=mCO2 * rate, memitted=mCO2 * (1-rate),
+               operating=operating_tech)
+
+    return {"ref": ref, "amine": amine, "clc": clc, "oxy": oxy}
+
+def capex(x, techs):
+    """
+    Adds CAPEX_initial (paid in years 1-2) and CAPEX (paid at timing) [MEUR] to each technology, from the compiled
+    cost model (see cost_model.py), including the Hydrogen (no ASU) and Experimental (4x CLC) shocks.
+    """
+    costs = COSTS.evaluate(x, CAPEX_NAMES)
+    techs["ref"].update(CAPEX_initial=0, CAPEX=0)
+    techs["amine"].update(CAPEX_initial=0, CAPEX=costs["CAPEX_amine"])
+    techs["clc"].update(CAPEX_initial=costs["CAPEX_initial_clc"], CAPEX=costs["CAPEX_clc"])
+    techs["oxy"].update(CAPEX_initial=0, CAPEX=costs["CAPEX_oxy"])
+    return techs
+
+PRICES = ["celc", "cheat", "cbio", "crc", "cets"]
+
+def as_trajectory(value, years):
+    """
+    A per-year price vector as a 2D array: shape (1, len(years)) if shared by all experiments, (n, len(years))
+    if per experiment. Element t-1 is model year t; vectors shorter than the analysis period keep their last price.
+    """
+    value = np.atleast_2d(np.asarray(value, dtype=float))
+    if value.shape[1] < len(years):
+        value = np.pad(value, ((0, 0), (0, len(years) - value.shape[1])), mode="edge")
+    return value[:, :len(years)]
+
+def price_paths(x, years, prices=None):
+    """
+    Prices per experiment and year, {name: array broadcastable to (n, len(years))} for every name in PRICES.
+
+    prices optionally gives per-year vectors (see as_trajectory) that replace the constant prices of x, named like
+    the regret_BECCS arguments (cheat is the heat-to-electricity price ratio, cets the ETS price [EUR/t]).
+    The Bioshortage and Powersurge escalations apply on top of either. With constant prices they are applied
+    as a running product, as in regret_BECCS. With Integration, CRCs sell at the higher of crc and cets.
+    """
+    prices = prices or {}
+    escalations = {"cbio": np.where(x["Bioshortage"][:, None] & (years < 11), 1.10, 1.0),
+                   "celc": np.where(x["Powersurge"][:, None] & (years < 4), 1.20, 1.0)}
+    paths = {}
+    for name in PRICES:
+        if name in prices:
+            paths[name] = as_trajectory(prices[name], years)
+            if name in escalations:
+                paths[name] = paths[name] * np.multiply.accumulate(escalations[name], axis=1)
+        elif name in escalations:
+            paths[name] = np.multiply.accumulate(np.column_stack([x[name], escalations[name]]), axis=1)[:, 1:]
+        elif name in x:
+            paths[name] = x[name][:, None]
+        else:
+            paths[name] = np.zeros((1, len(years)))
+    paths["crc"] = np.where(x["Integration"][:, None], np.maximum(paths["crc"], paths["cets"]), paths["crc"])
+    return paths
+
+def cash_flows(x, techs, years, prices=None):
+    """
+    Yearly costs and revenues [MEUR] of each technology, shape (n, len(years)). Years beyond timing+lifetime are zero.
+    The shocks are masks and multipliers, so experiments with different flags need no separate branches.
+    """
+    timing = x["timing"][:, None]
+    active = years < timing + x["lifetime"][:, None]
+    paths = price_paths(x, years, prices)
+    cbio, celc, cheat, crc, cets = paths["cbio"], paths["celc"], paths["cheat"], paths["crc"], paths["cets"]
+    cstore = x["cstore"][:, None] * np.where(x["Monostorage"][:, None], 4, 1)
+    cets = np.where(x["Fossilized"][:, None], cets, 0.0) # ETS allowances are only bought with Fossilized
+    stranded = x["Toxic"][:, None] & (years > timing + 6) # Amine capture stranded after 5 years of operation
+    ref = {key: np.asarray(value)[:, None] if np.ndim(value) else value for key, value in techs["ref"].items()}
+
+    flows = {}
+    for name, tech in techs.items():
+        tech = {key: np.asarray(value)[:, None] if np.ndim(value) else value for key, value in tech.items()}
+        operating = years > timing + 1
+        if name == "amine":
+            operating = operating & ~stranded
+        auction = x["Auction"][:, None] & (years < timing+15+2)
+
+        costs = np.where((years == 1) | (years == 2), tech["CAPEX_initial"] / 2, 0.0)
+        costs = costs + np.where((years == timing) | (years == timing + 1), tech["CAPEX"] / 2, 0.0)
+        revenues = 0.0
+
+        # Operating years of the technology
+        tech_costs = costs + tech["Qfuel"] * tech["operating"] * cbio * 10**-6
+        tech_celc = celc * tech["elc_shape"] if "elc_shape" in tech else celc # Dispatched price shape, see dispatch.py
+        tech_revenues = revenues + (tech["Qnet"] * (cheat * celc) + tech["P"] * tech_celc) * tech["operating"] * 10**-6
+        tech_costs = tech_costs + tech["mcaptured"] / 1000 * 3600 * tech["operating"] * (x["ctrans"][:, None]*x["sek"][:, None] + cstore) * 10**-6
+        tech_costs = tech_costs + tech["memitted"] / 1000 * 3600 * tech["operating"] * cets * 10**-6
+        tech_revenues = tech_revenues + tech["mcaptured"] / 1000 * 3600 * tech["operating"] * np.where(auction, crc+160, crc) * 10**-6
+        if name == "amine":
+            tech_costs = tech_costs + x["cmea"][:, None] * x["sek"][:, None] * 1.5 * tech["mcaptured"] / 1000 * 3600 * tech["operating"] * 10**-6
+        if name == "clc":
+            tech_costs = tech_costs + 1 / 1000 * tech["Qfuel"] * tech["operating"] * x["coc"][:, None] * 10**-6
+
+        # Other years run as the reference plant
+        ref_costs = costs + ref["Qfuel"] * ref["operating"] * cbio * 10**-6
+        ref_costs = ref_costs + ref["memitted"] / 1000 * 3600 * ref["operating"] * cets * 10**-6
+        ref_celc = celc * ref["elc_shape"] if "elc_shape" in ref else celc
+        ref_revenues = revenues + (ref["Qnet"] * (cheat * celc) + ref["P"] * ref_celc) * ref["operating"] * 10**-6
+
+        flows[name] = (np.where(active, np.where(operating, tech_costs, ref_costs), 0.0),
+                       np.where(active, np.where(operating, tech_revenues, ref_revenues), 0.0))
+    return flows
+
+def npv(x, flows, years):
+    """
+    NPV of each technology, summed year by year (np.cumsum) in the same order as regret_BECCS.
+    """
+    discount = (1 + x["dr"][:, None]) ** years
+    return {name: np.cumsum((revenues - costs) / discount, axis=1)[:, -1] for name, (costs, revenues) in flows.items()}
+
+def regrets(x, npv_values):
+    max_npv = np.maximum.reduce([npv_values[name] for name in TECHS])
+    regret_values = {name: max_npv - npv_values[name] for name in TECHS}
+
+    results = {"regret": np.select([x["decision"] == name for name in TECHS], [regret_values[name] for name in TECHS], np.nan)}
+    results.update({f"regret_{name}": regret_values[name] for name in ["ref", "amine", "clc", "oxy"]})
+    results.update({f"npv_{name}": npv_values[name] for name in ["ref", "amine", "oxy", "clc"]})
+    return results
+
+def evaluate(x, prices=None, profiles=None):
+    """
+    Evaluates prepared inputs (see as_inputs) and optional price vectors (see price_paths), returns {outcome: array}.
+    With hourly profiles (see dispatch.load_profiles), the operating hours come from the hourly dispatch.
+    """
+    years = np.arange(1, int((x["timing"] + x["lifetime"]).max()))
+    techs = capex(x, energy_balances(x))
+    if profiles is not None:
+        from dispatch import dispatch
+        techs = dispatch(x, techs, profiles)
+    return regrets(x, npv(x, cash_flows(x, techs, years, prices), years))
+
+def yearly_cash_flows(x, prices=None, profiles=None):
+    """
+    The "cash_flows" outcome of regret_BECCS for prepared inputs (see as_inputs): costs, revenues and discounted net
+    [MEUR] per technology and year, single precision, shape (n, len(TECHS), len(CASH_FLOW_QUANTITIES), CASH_FLOW_YEARS).
+    """
+    years = np.arange(1, CASH_FLOW_YEARS + 1)
+    techs = capex(x, energy_balances(x))
+    if profiles is not None:
+        from dispatch import dispatch
+        techs = dispatch(x, techs, profiles)
+    discount = (1 + x["dr"][:, None]) ** years
+    flows = np.empty((len(x["rate"]), len(TECHS), len(CASH_FLOW_QUANTITIES), CASH_FLOW_YEARS), dtype=np.float32)
+    for i, (costs, revenues) in enumerate(cash_flows(x, techs, years, prices)[name] for name in TECHS):
+        flows[:, i] = np.stack(np.broadcast_arrays(costs, revenues, (revenues - costs) / discount), axis=1)
+    return flows
+
+def regret_BECCS_batch(design=None, chunk_size=20000, prices=None, profiles=None, **inputs):
+    """
+    Vectorized regret_BECCS over all rows of design (a DataFrame or dict of columns named like the regret_BECCS
+    arguments; missing arguments take the regret_BECCS defaults). Returns the regret_BECCS outcomes as a dict of
+    arrays, evaluated in chunks of chunk_size rows to bound memory.
+
+    prices optionally gives per-year price vectors, {name: (years,) array shared by all experiments or
+    (n, years) array per experiment}, e.g. {"cets": carbon_prices.ets_trajectory("high")}; see price_paths.
+    profiles switches to the hourly dispatch mode, e.g. profiles=dispatch.load_profiles("hourly_profiles.csv").
+    """
+    x = as_inputs(design, **inputs)
+    n = len(x["rate"])
+    prices = {name: np.asarray(value, dtype=float) for name, value in (prices or {}).items()}
+    chunks = [evaluate({name: values[start:start+chunk_size] for name, values in x.items()},
+                       {name: value[start:start+chunk_size] if value.ndim == 2 else value for name, value in prices.items()},
+                       profiles)
+              for start in range(0, n, chunk_size)]
+    return {outcome: np.concatenate([chunk[outcome] for chunk in chunks]) for outcome in chunks[0]}
+
+if __name__ == "__main__":
+
+    results = regret_BECCS_batch(pd.DataFrame({"timing": [5, 10, 15, 20]}))
+    print("I regret my amine decision this much in terms of NPV [MEUR], for timing 5, 10, 15, 20:\n", results["regret_amine"])
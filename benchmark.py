@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Benchmarks of the model, runner and analysis hot paths, with fixed seeds and sizes.
+# Results are saved to JSON and compared against a stored baseline; a benchmark whose time grows by more than
+# the threshold is flagged as a regression, e.g.
+#   python benchmark.py --save-baseline           # on the reference commit
+#   python benchmark.py                           # after a change, compares against benchmark_baseline.json
+
+BENCHMARKS = {}
+SEED = 42
+
+def benchmark(name):
+    """
+    Registers function(scale) -> (seconds, items) as a benchmark. scale < 1 shrinks the problem size for quick runs.
+    A benchmark that also checks results returns (seconds, items, {"passed": bool, ...}).
+    """
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+def best_time(function, repeats=3):
+    """
+    Best wall time of repeats calls of function, which is the least noisy estimate of its cost.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def sized(n, scale):
+    return max(1, int(n * scale))
+
+def design(n):
+    from controller import model
+    from designs import sample_design
+    return sample_design(model.uncertainties + model.levers, n, seed=SEED)
+
+@benchmark("regret_BECCS_scalar")
+def bench_scalar(scale):
+    from model import regret_BECCS
+    rows = design(sized(2000, scale)).to_dict("records")
+    return best_time(lambda: [regret_BECCS(**row) for row in rows]), len(rows)
+
+@benchmark("regret_BECCS_batch")
+def bench_batch(scale):
+    from batch_model import regret_BECCS_batch
+    experiments = design(sized(100000, scale))
+    return best_time(lambda: regret_BECCS_batch(experiments)), len(experiments)
+
+@benchmark("lever_sweep")
+def bench_lever_sweep(scale):
+    from controller import model
+    from designs import sample_design
+    from lever_sweep import lever_sweep
+    scenarios = sample_design(model.uncertainties, sized(10000, scale), seed=SEED)
+    return best_time(lambda: lever_sweep(scenarios)), len(scenarios)
+
+@benchmark("gradients")
+def bench_gradients(scale):
+    from gradients import regret_BECCS_gradients
+    experiments = design(sized(20000, scale))
+    return best_time(lambda: regret_BECCS_gradients(experiments)), len(experiments)
+
+@benchmark("estimate_nominal_cycle")
+def bench_nominal_cycle(scale):
+    from model import estimate_nominal_cycle
+    n = sized(20, scale)
+    return best_time(lambda: [estimate_nominal_cycle(Qnet=140, P=48.3, Qfuel=174, LHV=10.44, psteam=95, Tsteam=525, isentropic=0.85)
+                              for _ in range(n)]), n
+
+def run_experiments(scale, evaluator=None):
+    from controller import model
+    from ema_workbench import perform_experiments, Samplers
+    n_scenarios, n_policies = sized(200, scale), 50
+    np.random.seed(SEED)
+    seconds = best_time(lambda: perform_experiments(model, n_scenarios, n_policies, evaluator=evaluator,
+                                                    uncertainty_sampling=Samplers.LHS, lever_sampling=Samplers.LHS), repeats=1)
+    return seconds, n_scenarios * n_policies
+
+@benchmark("perform_experiments_sequential")
+def bench_experiments_sequential(scale):
+    return run_experiments(scale)
+
+@benchmark("perform_experiments_parallel")
+def bench_experiments_parallel(scale):
+    from controller import model
+    from ema_workbench import MultiprocessingEvaluator
+    with MultiprocessingEvaluator(model) as evaluator:
+        return run_experiments(scale, evaluator)
+
+@benchmark("sobol_analyze")
+def bench_sobol(scale):
+    from SALib.sample import sobol as sobol_sample
+    from SALib.analyze import sobol
+    from ema_workbench.em_framework import get_SALib_problem
+    from controller_sobol import model
+    from batch_model import regret_BECCS_batch
+
+    problem = get_SALib_problem(model.uncertainties)
+    n = 2 ** int(np.log2(sized(512, scale))) # Sobol' balance properties need a power of 2
+    samples = sobol_sample.sample(problem, n, seed=SEED)
+    columns = pd.DataFrame(samples, columns=problem["names"])
+    for parameter in model.uncertainties: # SALib samples categories by index
+        if hasattr(parameter, "categories"):
+            columns[parameter.name] = [parameter.cat_for_index(int(i)).value for i in columns[parameter.name]]
+    y = regret_BECCS_batch(columns)["regret"]
+    return best_time(lambda: sobol.analyze(problem, y, seed=SEED), repeats=1), len(y)
+
+@benchmark("cart_build_tree")
+def bench_cart(scale):
+    import ema_workbench.analysis.cart as cart
+    from batch_model import regret_BECCS_batch
+
+    experiments = design(sized(100000, scale))
+    outcomes = regret_BECCS_batch(experiments)
+    experiments["decision"] = experiments["decision"].astype("category")
+
+    def build():
+        cart_alg = cart.setup_cart((experiments, outcomes), lambda data: data["npv_ref"] < 0, mass_min=0.05)
+        cart_alg.build_tree()
+    return best_time(build, repeats=1), len(experiments)
+
+@benchmark("load_csv_full")
+def bench_load_csv(scale):
+    path, n = results_files(scale)
+    return best_time(lambda: (pd.read_csv(path + "experiments.csv"), pd.read_csv(path + "outcomes.csv"))), n
+
+@benchmark("load_csv_projected")
+def bench_load_projected(scale):
+    import analysis
+    path, n = results_files(scale)
+    def load():
+        analysis._column_cache.clear()
+        analysis.load_results(["crc", "Auction", "timing", "cAM", "dr"], ["regret_ref", "regret_clc", "regret_amine"],
+                              path + "experiments.csv", path + "outcomes.csv")
+    return best_time(load), n
+
+@benchmark("load_npz_projected")
+def bench_load_npz(scale):
+    path, n = results_files(scale)
+    def load():
+        with np.load(path + "results.npz", allow_pickle=True) as columns:
+            return {name: columns[name] for name in ["crc", "Auction", "timing", "cAM", "dr", "regret_ref", "regret_clc", "regret_amine"]}
+    return best_time(load), n
+
+@benchmark("load_parquet_projected")
+def bench_load_parquet(scale):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None, 0
+    path, n = results_files(scale)
+    return best_time(lambda: pd.read_parquet(path + "results.parquet", columns=["crc", "Auction", "timing", "cAM", "dr", "regret_ref", "regret_clc", "regret_amine"])), n
+
+@benchmark("validate_fast_paths")
+def bench_validation(scale):
+    from validation import validate, print_report
+    n = sized(20000, scale)
+    start = time.perf_counter()
+    reports = validate(n, seed=SEED)
+    seconds = time.perf_counter() - start
+    print_report(reports)
+    return seconds, n, {"passed": all(report["passed"] for report in reports.values()), "reports": reports}
+
+_results_files = {}
+
+def results_files(scale):
+    """
+    Writes a results set of 100k experiments (scaled) once per process, as CSV, npz and (if pyarrow is installed) parquet.
+    """
+    if scale not in _results_files:
+        from batch_model import regret_BECCS_batch
+        experiments = design(sized(100000, scale))
+        outcomes = pd.DataFrame(regret_BECCS_batch(experiments))
+        path = os.path.join(tempfile.mkdtemp(prefix="beccs_bench_"), "")
+        experiments.to_csv(path + "experiments.csv", index=False)
+        outcomes.to_csv(path + "outcomes.csv", index=False)
+        both = pd.concat([experiments, outcomes], axis=1)
+        np.savez(path + "results.npz", **{name: both[name].to_numpy() for name in both})
+        try:
+            both.to_parquet(path + "results.parquet")
+        except ImportError:
+            pass
+        _results_files[scale] = (path, len(experiments))
+    return _results_files[scale]
+
+def run(names=None, scale=1.0):
+    results = {}
+    for name in names or BENCHMARKS:
+        seconds, items, *details = BENCHMARKS[name](scale)
+        if seconds is None:
+            print(f"{name:<34}{'skipped':>12}")
+            continue
+        results[name] = {"seconds": seconds, "items": items, "per_second": items / seconds, **(details[0] if details else {})}
+        print(f"{name:<34}{seconds:>11.3f}s{items / seconds:>14.0f}/s")
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": scale,
+            "seed": SEED,
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, threshold=0.20):
+    """
+    Returns {name: ratio of current to baseline time} of the benchmarks that slowed down by more than threshold.
+    """
+    if current["meta"]["scale"] != baseline["meta"]["scale"]:
+        print("WARNING: the baseline was run at a different scale, timings are not comparable")
+    regressions = {}
+    print(f"\n{'Benchmark':<34}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        ratio = result["seconds"] / baseline["results"][name]["seconds"]
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:<34}{baseline['results'][name]['seconds']:>11.3f}s{result['seconds']:>11.3f}s{ratio:>8.2f}{flag}")
+        if flag:
+            regressions[name] = ratio
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the model, runner and analysis hot paths.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="Run at 1/10 of the standard sizes")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Relative slow-down flagged as a regression")
+    args = parser.parse_args(argv)
+
+    current = run(args.only, 0.1 if args.quick else 1.0)
+    with open(args.baseline if args.save_baseline else args.out, "w") as f:
+        json.dump(current, f, indent=2)
+
+    failed = [name for name, result in current["results"].items() if not result.get("passed", True)]
+    if failed:
+        print(f"\nFAILED validation: {', '.join(failed)}")
+        return 1
+
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import os
+import numpy as np
+import pandas as pd
+from model import CASH_FLOW_YEARS, CASH_FLOW_QUANTITIES
+from batch_model import TECHS, as_inputs, yearly_cash_flows
+
+# Storage of the per-year cash flows of regret_BECCS(cash_flows=True): one float32 array of shape
+# (experiment, technology, quantity, year) in a .npy file that is written and read through a memory map, so that
+# neither the run nor the analyses hold more than the experiments they touch in memory. Row i is experiment ID i.
+#
+# During a run, pass a CashFlowStore to StreamingCallback(stores={"cash_flows": store}); for an existing design,
+# write_cash_flows evaluates the batched model straight into the file. Then e.g.
+#   flows = load_cash_flows()                 # nothing is read yet
+#   flows[:1000, TECHS.index("clc"), 2, :20]  # discounted net of CLC, first 20 years of the first 1000 experiments
+
+SHAPE = (len(TECHS), len(CASH_FLOW_QUANTITIES), CASH_FLOW_YEARS)
+
+class CashFlowStore:
+    """
+    Memory-mapped .npy file of per-year cash flows, written one experiment (or a block of experiments) at a time.
+    """
+    def __init__(self, path="cash_flows.npy"):
+        self.path = path
+        self.array = None
+
+    def open(self, n_experiments):
+        self.array = np.lib.format.open_memmap(self.path, mode="w+", dtype=np.float32, shape=(n_experiments,) + SHAPE)
+        return self
+
+    def write(self, experiment_id, values):
+        self.array[experiment_id] = values
+
+    def flush(self):
+        if self.array is not None:
+            self.array.flush()
+
+def load_cash_flows(path="cash_flows.npy"):
+    """
+    The stored cash flows as a read-only memory map; slicing it only reads the selected experiments and years.
+    """
+    return np.load(path, mmap_mode="r")
+
+def write_cash_flows(design, path="cash_flows.npy", chunk_size=20000, prices=None):
+    """
+    Evaluates the per-year cash flows of every row of design (e.g. experiments.csv) with the batched model and
+    writes them to path, chunk by chunk. Row i of design becomes experiment ID i.
+    """
+    store = CashFlowStore(path).open(len(design))
+    for start in range(0, len(design), chunk_size):
+        x = as_inputs(design.iloc[start:start + chunk_size])
+        chunk_prices = {name: value[start:start + chunk_size] if np.ndim(value) == 2 else value
+                        for name, value in (prices or {}).items()}
+        store.write(slice(start, start + len(x["rate"])), yearly_cash_flows(x, chunk_prices))
+    store.flush()
+    return store
+
+def append_cash_flows(design, path="cash_flows.npy", chunk_size=20000):
+    """
+    Evaluates the per-year cash flows of the new experiments of design and appends them to the file at path: row i
+    of design becomes experiment ID len(stored) + i. The stored rows are copied, not recomputed.
+    """
+    stored = load_cash_flows(path)
+    n = len(stored)
+    store = CashFlowStore(path + ".extending").open(n + len(design))
+    for start in range(0, n, chunk_size):
+        store.write(slice(start, min(start + chunk_size, n)), stored[start:start + chunk_size])
+    for start in range(0, len(design), chunk_size):
+        x = as_inputs(design.iloc[start:start + chunk_size])
+        store.write(slice(n + start, n + start + len(x["rate"])), yearly_cash_flows(x))
+    store.flush()
+    del stored
+    os.replace(store.path, path)
+
+def cash_flow_frame(flows, tech, quantity="discounted_net", experiments=slice(None)):
+    """
+    One technology and quantity as a DataFrame of experiments x years (1..CASH_FLOW_YEARS).
+    """
+    values = flows[experiments, TECHS.index(tech), CASH_FLOW_QUANTITIES.index(quantity)]
+    index = np.arange(len(flows))[experiments]
+    return pd.DataFrame(np.asarray(values), index=pd.Index(index, name="experiment"),
+                        columns=pd.Index(np.arange(1, CASH_FLOW_YEARS + 1), name="year"))
+
+def break_even_years(flows, tech, chunk_size=100000):
+    """
+    Year in which the investment in tech has paid back against the reference plant, per experiment: the first year
+    from which the cumulative discounted net of tech minus that of ref stays non-negative. NaN if it never does.
+    """
+    years = np.full(len(flows), np.nan)
+    i, ref, net = TECHS.index(tech), TECHS.index("ref"), CASH_FLOW_QUANTITIES.index("discounted_net")
+    for start in range(0, len(flows), chunk_size):
+        difference = np.cumsum(flows[start:start + chunk_size, i, net] - flows[start:start + chunk_size, ref, net],
+                               axis=1, dtype=float)
+        negative = difference < 0
+        last_negative = CASH_FLOW_YEARS - np.argmax(negative[:, ::-1], axis=1)  # Year, if any year is negative
+        years[start:start + len(difference)] = np.where(negative.any(axis=1), last_negative + 1, 1)
+        years[start:start + len(difference)][negative[:, -1]] = np.nan
+    return years
+
+if __name__ == "__main__":
+    import time
+    from controller import model
+    from designs import sample_design
+
+    design = sample_design(model.uncertainties + model.levers, 100000, seed=1)
+    start = time.perf_counter()
+    write_cash_flows(design)
+    print(f"{len(design) / (time.perf_counter() - start):.0f} experiments/s written to cash_flows.npy")
+
+    flows = load_cash_flows()
+    break_even = pd.DataFrame({tech: break_even_years(flows, tech) for tech in TECHS[1:]})
+    break_even["timing"] = design["timing"].to_numpy()
+    print("Median break-even year per timing:\n", break_even.groupby("timing").median())
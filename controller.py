@@ -1,3 +1,4 @@
+import os
 import numpy as np
 from model import *
 import matplotlib.pyplot as plt
@@ -17,11 +18,32 @@ from ema_workbench import (
 )
 from ema_workbench.em_framework import get_SALib_problem
 from SALib.analyze import sobol
-import matplotlib.cm as cm
-import matplotlib.colors as mcolors
+from functools import partial
+import profiling
+from runner import run_experiments
+from telemetry import Telemetry
+from analysis import plot_decision_sketches
+from streaming import StreamingCallback, DecisionSketches, RegretTally, log_progress
+from cash_flow_store import CashFlowStore, SHAPE
 
 model = Model("BECCSMalmo", function=regret_BECCS)
 
+# Shocks regret_BECCS implements beyond the three of the study. They keep their default (False) unless they are
+# opted in as uncertainties, e.g. BECCS_SHOCKS=Toxic,Hydrogen python controller.py; controller_sobol.py reads the
+# same variable, so both sample the same space.
+OPTIONAL_SHOCKS = ["Integration", "Fossilized", "Toxic", "Experimental", "Hydrogen", "Monostorage"]
+
+def opted_in_shocks(names=None):
+    """
+    Uncertainties of the OPTIONAL_SHOCKS in names (default: the comma-separated BECCS_SHOCKS environment variable).
+    """
+    names = os.environ.get("BECCS_SHOCKS", "") if names is None else names
+    names = [name.strip() for name in names.split(",") if name.strip()] if isinstance(names, str) else list(names)
+    unknown = sorted(set(names) - set(OPTIONAL_SHOCKS))
+    if unknown:
+        raise ValueError(f"Unknown shocks {unknown}, expected some of {OPTIONAL_SHOCKS}")
+    return [CategoricalParameter(name, [True, False]) for name in OPTIONAL_SHOCKS if name in names]
+
 model.uncertainties = [
     RealParameter("O2eff", 0.85, 0.95),     # [-] for CLC
     RealParameter("Wasu", 800, 900),        # MJ/tO2 (converted from 230*3.6, Macroscopic or Lyngfelt or Ramboll)
@@ -55,7 +77,7 @@ model.uncertainties = [
     CategoricalParameter("Bioshortage", [True, False]),
     CategoricalParameter("Powersurge", [True, False]),
     CategoricalParameter("Auction", [True, False]),
-]
+] + opted_in_shocks()
 
 model.levers = [
     CategoricalParameter("decision", ["ref", "amine", "oxy", "clc"]),
@@ -77,73 +99,53 @@ model.outcomes = [
     ScalarOutcome("npv_clc", ScalarOutcome.MAXIMIZE),
 ]
 
-ema_logging.log_to_stderr(ema_logging.INFO)
-n_scenarios = 1000
-n_policies = 500
-
-# Regular LHS sampling:
-results = perform_experiments(model, n_scenarios, n_policies, uncertainty_sampling = Samplers.LHS, lever_sampling = Samplers.LHS)
-experiments, outcomes = results
-
-outcomes_df = pd.DataFrame(outcomes)
-experiments.to_csv("experiments.csv", index=False)
-outcomes_df.to_csv("outcomes.csv", index=False)
-outcomes_df["decision"] = experiments["decision"]
-print(outcomes_df)
-
-zero_regret_counts = outcomes_df[outcomes_df["regret"] == 0].groupby("decision")["regret"].count()
-print(zero_regret_counts)
-
-# Create new columns based on npv_ref and cbio/celc comparison
-outcomes_df["npv_ref_bio"] = outcomes_df["npv_ref"].where(experiments["cbio"] > experiments["celc"])
-outcomes_df["npv_ref_elc"] = outcomes_df["npv_ref"].where(experiments["cbio"] < experiments["celc"])
-print(outcomes_df[["npv_ref", "npv_ref_bio", "npv_ref_elc"]].head())
-
-# Define regret columns
-regret_columns = ["npv_ref_bio", "npv_ref_elc", "npv_amine", "npv_oxy", "npv_clc", "regret_ref","regret_amine","regret_oxy","regret_clc",]
-
-# Merge experiments and outcomes by index
-df = pd.concat([experiments[["Auction", "Bioshortage"]], outcomes_df[regret_columns]], axis=1)
-
-# Define subsets based on Auction and Bioshortage values
-subsets = {
-    "Auction=False, Bioshortage=False": df[(df["Auction"] == False) & (df["Bioshortage"] == False)],
-    "Auction=False, Bioshortage=True": df[(df["Auction"] == False) & (df["Bioshortage"] == True)],
-    "Auction=True, Bioshortage=False": df[(df["Auction"] == True) & (df["Bioshortage"] == False)],
-    "Auction=True, Bioshortage=True": df[(df["Auction"] == True) & (df["Bioshortage"] == True)]
-}
-
-# Define fixed colormap limits (adjust these as needed)
-cmap_min, cmap_max = -300, 300  # Hard-coded limits
-
-# Get global min/max values for y-axis synchronization
-global_min = df[regret_columns].min().min()
-global_max = df[regret_columns].max().max()
-
-column_median = df[regret_columns].median()
-
-# Clip column_means to ensure they stay within the colormap range
-clipped_median = np.clip(column_median, cmap_min, cmap_max)
-
-# Normalize clipped mean values for colormap mapping
-norm = mcolors.Normalize(vmin=cmap_min, vmax=cmap_max)
-cmap = cm.get_cmap("RdYlGn")  # Red-Yellow-Green colormap
-
-# Generate dynamic colors based on clipped means
-box_colors = [mcolors.to_hex(cmap(norm(value))) for value in clipped_median]
-
-# Create a figure with 2x2 subplots
-fig, axes = plt.subplots(2, 2, figsize=(12, 10), sharey=True)  # Synchronize y-axis
-
-# Loop through subsets and plot boxplots
-for ax, (title, subset) in zip(axes.flatten(), subsets.items()):
-    sns.boxplot(data=subset[regret_columns], ax=ax, palette=box_colors)
-    ax.set_title(title)
-    ax.set_ylabel("NPV Values")
-    ax.set_xticklabels(regret_columns, rotation=20)
-    ax.set_ylim(global_min - 50, global_max)  # Ensure same y-axis scale
-    ax.axhline(0, color="black", linestyle="dashed", linewidth=1, alpha=0.8)
-
-# Adjust layout and show plot
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the LHS experiments of the Malmö BECCS model.")
+    parser.add_argument("--scenarios", type=int, default=1000)
+    parser.add_argument("--policies", type=int, default=500)
+    parser.add_argument("--profile", action="store_true",
+                        help="Write a per-stage profile of the run to profile.json and profile.folded (flame graph)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Publish live throughput, ETA and worker metrics to metrics.prom every 5 seconds")
+    parser.add_argument("--cash-flows", action="store_true",
+                        help="Store the per-year costs, revenues and discounted net of every technology in cash_flows.npy")
+    parser.add_argument("--save", action="store_true", help="Also keep every experiment and write experiments.csv "
+                        "and outcomes.csv (memory grows with the run)")
+    args = parser.parse_args()
+
+    ema_logging.log_to_stderr(ema_logging.INFO)
+    if args.profile:
+        profiling.enable("profile")
+        profiling.instrument(model)
+    telemetry = Telemetry("metrics.prom").instrument(model) if args.metrics else None
+    stores = {}
+    if args.cash_flows:
+        model.constants = [Constant("cash_flows", True)]
+        model.outcomes = list(model.outcomes) + [ArrayOutcome("cash_flows", shape=SHAPE, dtype=np.float32)]
+        stores["cash_flows"] = CashFlowStore("cash_flows.npy")
+
+    # Regular LHS sampling, with the boxplot statistics streamed into quantile sketches and the zero-regret
+    # tallies logged while experiments complete. Unless --save is given, no experiment is kept in memory:
+    decision_sketches = DecisionSketches()
+    tally = RegretTally()
+    callback = partial(StreamingCallback, aggregators=[decision_sketches, tally], progress=log_progress(tally),
+                       stores=stores, store_results=args.save)
+    results = run_experiments(model, args.scenarios, args.policies, uncertainty_sampling = Samplers.LHS, lever_sampling = Samplers.LHS, callback=callback,
+                              telemetry=telemetry)
+    if args.profile:
+        stats = profiling.collect("profile")
+        profiling.write_report(stats, "profile.json")
+        profiling.write_folded(stats, "profile.folded")
+        profiling.print_report(stats)
+    if args.save:
+        experiments, outcomes = results
+        experiments.to_csv("experiments.csv", index=False)
+        pd.DataFrame(outcomes).to_csv("outcomes.csv", index=False)
+
+    zero_regret_counts = tally.zero_regret("decision")
+    print(zero_regret_counts)
+    print(tally.npv_stats())
+
+    fig = plot_decision_sketches(decision_sketches)
+    plt.show()
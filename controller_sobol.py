@@ -17,6 +17,8 @@ from ema_workbench import (
 )
 from ema_workbench.em_framework import get_SALib_problem
 from SALib.analyze import sobol
+from analysis import plot_sobol_indices
+from controller import opted_in_shocks # The optional shocks of BECCS_SHOCKS, as in controller.py
 
 model = Model("BECCSMalmo", function=regret_BECCS)
 
@@ -53,6 +55,7 @@ model.uncertainties = [
     CategoricalParameter("Bioshortage", [True, False]),
     CategoricalParameter("Powersurge", [True, False]),
     CategoricalParameter("Auction", [True, False]),
+    *opted_in_shocks(),
 
     CategoricalParameter("decision", ["ref", "amine", "oxy", "clc"]),
     RealParameter("rate", 0.86, 0.94),      # High capture rates needed
@@ -75,14 +78,6 @@ model.outcomes = [
     ScalarOutcome("regret_clc", ScalarOutcome.MINIMIZE),
 ]
 
-ema_logging.log_to_stderr(ema_logging.INFO)
-n_scenarios = 10000
-n_policies = 0
-
-# If Sobol sampling:
-print(" NOTE : Should probably adapt this to also include some levers!")
-results = perform_experiments(model, n_scenarios, n_policies, uncertainty_sampling = Samplers.SOBOL, lever_sampling = Samplers.SOBOL)
-experiments, outcomes = results
 def analyze(results, ooi):
     """analyze results using SALib sobol, returns a dataframe"""
     _, outcomes = results
@@ -98,25 +93,23 @@ def analyze(results, ooi):
         sobol_indices["S2_conf"], index=problem["names"], columns=problem["names"]
     )
     return sobol_stats, s2, s2_conf, problem
-sobol_stats, s2, s2_conf, problem = analyze(results, "regret")
-print(sobol_stats)
-print(s2)
-print(s2_conf)
-sobol_stats = pd.DataFrame(sobol_stats, index=problem["names"])
-sobol_stats.to_csv("sobol_stats.csv")
-sobol_stats_sorted = sobol_stats.sort_values(by="ST", ascending=False)  # Ascending for better readability
 
-# Create horizontal bar plot
-plt.figure(figsize=(8, 10))  # Adjust figure size for better layout
-sns.barplot(
-    y=sobol_stats_sorted.index,  # Parameters on y-axis
-    x=sobol_stats_sorted["ST"],  # Sobol indices on x-axis
-    xerr=sobol_stats_sorted["ST_conf"],  # Confidence intervals as error bars
-    capsize=0.2,
-    color="crimson"
-)
-plt.ylabel("Parameter")
-plt.xlabel("Total Sobol Index (ST)")
-plt.title("Total-Order Sobol Indices with Confidence Intervals")
-plt.grid(axis="x", linestyle="--", alpha=0.7)
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+    ema_logging.log_to_stderr(ema_logging.INFO)
+    n_scenarios = 10000
+    n_policies = 0
+
+    # If Sobol sampling:
+    print(" NOTE : Should probably adapt this to also include some levers!")
+    results = perform_experiments(model, n_scenarios, n_policies, uncertainty_sampling = Samplers.SOBOL, lever_sampling = Samplers.SOBOL)
+    experiments, outcomes = results
+    sobol_stats, s2, s2_conf, problem = analyze(results, "regret")
+    print(sobol_stats)
+    print(s2)
+    print(s2_conf)
+    sobol_stats = pd.DataFrame(sobol_stats, index=problem["names"])
+    sobol_stats.to_csv("sobol_stats.csv")
+
+    # Create horizontal bar plot
+    fig = plot_sobol_indices(sobol_stats)
+    plt.show()
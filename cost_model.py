@@ -0,0 +1,238 @@
+import itertools
+import weakref
+from functools import reduce
+import numpy as np
+
+# Cost model as a graph of named expressions. The cost correlations are declared once, as expressions over the
+# model inputs, and compiled into a single vectorized numpy function. Expressions are hash-consed: building the
+# same subexpression twice returns the same node (also for a+b and b+a), so e.g. the CL and interim items shared by
+# CLC and oxyfuel, the (1 + EPC) and (1 + ownercost) factors of every TCR chain and mfuel-derived flows are
+# computed once per evaluation. Constants are folded as Python folds them, so the compiled evaluator returns the
+# same bits as writing the formulas out with numpy. The hash-consing table only holds nodes weakly: nodes live as
+# long as a graph (or an expression under construction) refers to them, so it does not grow across builds.
+#
+# Any named expression can be requested, e.g. COSTS.evaluate(x, ["BEC_oxy", "ASU_oxy"]); the evaluator of each
+# set of names is generated once and keeps only the nodes those names need.
+
+class Expr:
+    """
+    Node of the expression graph: an operation and its arguments (nodes, or the input name / constant value).
+    Create them through Input, constants in arithmetic, and the functions exp, where and maximum.
+    """
+    __slots__ = ("op", "args", "index", "__weakref__")
+    _table = weakref.WeakValueDictionary()
+    _indices = itertools.count() # Never reused, so the keys of collected nodes cannot match a new node
+
+    def __new__(cls, op, *args):
+        key = (op,) + tuple(arg.index if isinstance(arg, Expr) else repr(arg) for arg in args)
+        node = cls._table.get(key)
+        if node is None:
+            node = super().__new__(cls)
+            node.op, node.args, node.index = op, args, next(cls._indices)
+            cls._table[key] = node
+        return node
+
+    def __add__(self, other): return binary("+", self, other)
+    def __radd__(self, other): return binary("+", other, self)
+    def __sub__(self, other): return binary("-", self, other)
+    def __rsub__(self, other): return binary("-", other, self)
+    def __mul__(self, other): return binary("*", self, other)
+    def __rmul__(self, other): return binary("*", other, self)
+    def __truediv__(self, other): return binary("/", self, other)
+    def __rtruediv__(self, other): return binary("/", other, self)
+    def __pow__(self, other): return binary("**", self, other)
+    def __rpow__(self, other): return binary("**", other, self)
+    def __neg__(self): return Expr("neg", self)
+
+    def __repr__(self):
+        return f"Expr({self.op}, {self.index})"
+
+def Input(name):
+    return Expr("input", name)
+
+def constant(value):
+    if isinstance(value, Expr):
+        return value
+    return Expr("const", value.item() if isinstance(value, np.generic) else value)
+
+COMMUTATIVE = {"+", "*"}
+FOLD = {"+": lambda a, b: a + b, "-": lambda a, b: a - b, "*": lambda a, b: a * b, "/": lambda a, b: a / b,
+        "**": lambda a, b: a ** b}
+
+def binary(op, a, b):
+    a, b = constant(a), constant(b)
+    if a.op == "const" and b.op == "const":
+        return Expr("const", FOLD[op](a.args[0], b.args[0]))
+    if op in COMMUTATIVE and a.index > b.index: # Exact in floating point, and lets a+b and b+a share a node
+        a, b = b, a
+    return Expr(op, a, b)
+
+def exp(a): return Expr("exp", constant(a))
+def where(condition, a, b): return Expr("where", constant(condition), constant(a), constant(b))
+def maximum(a, b): return Expr("maximum", *sorted([constant(a), constant(b)], key=lambda node: node.index))
+
+def total(items):
+    """
+    Sum of items added left to right, as sum() adds a list in regret_BECCS (its leading 0 + is exact).
+    """
+    return reduce(lambda a, b: binary("+", a, b), items)
+
+class ExpressionGraph:
+    """
+    Named expressions, compiled on demand into functions of {input: array} returning {name: array}.
+    """
+    def __init__(self):
+        self.named = {}
+        self._compiled = {}
+
+    def define(self, name, expression):
+        self.named[name] = constant(expression)
+        self._compiled = {}
+        return self.named[name]
+
+    def __getitem__(self, name):
+        return self.named[name]
+
+    def _order(self, roots, stop=()):
+        """
+        Nodes needed for roots in evaluation order; nodes in stop are treated as given.
+        """
+        order, seen = [], set()
+        def visit(node):
+            if node.index in seen:
+                return
+            seen.add(node.index)
+            if node.index not in stop and node.op not in ("input", "const"):
+                for arg in node.args:
+                    visit(arg)
+            order.append(node)
+        for root in roots:
+            visit(root)
+        return order
+
+    def source(self, names=None, given=()):
+        """
+        Python source of the evaluator of names (default: every named expression). Nodes of the names in given are
+        read from the argument dictionary instead of being computed.
+        """
+        names = list(self.named) if names is None else list(names)
+        stop = {self.named[name].index: name for name in given}
+        order = self._order([self.named[name] for name in names], stop)
+        returned = {self.named[name].index for name in names}
+        last_use = {} # Temporaries are deleted after their last use, so numpy can reuse their memory
+        for position, node in enumerate(order):
+            if node.index not in stop and node.op not in ("input", "const"):
+                for arg in node.args:
+                    last_use[arg.index] = position
+        lines = ["def evaluate(x):"]
+        variables = {}
+        for position, node in enumerate(order):
+            if node.index in stop:
+                expression = f"x[{stop[node.index]!r}]"
+            elif node.op == "input":
+                expression = f"x[{node.args[0]!r}]"
+            elif node.op == "const":
+                variables[node.index] = repr(node.args[0])
+                continue
+            else:
+                args = [variables[arg.index] for arg in node.args]
+                if node.op in FOLD:
+                    expression = f"{args[0]} {node.op} {args[1]}"
+                elif node.op == "neg":
+                    expression = f"-{args[0]}"
+                else:
+                    expression = f"np.{node.op}({', '.join(args)})"
+            variables[node.index] = f"v{node.index}"
+            lines.append(f"    v{node.index} = {expression}")
+            if node.op not in ("input", "const") and node.index not in stop:
+                dead = [variables[arg.index] for arg in dict.fromkeys(node.args) if arg.op != "const"
+                        and last_use.get(arg.index) == position and arg.index not in returned]
+                if dead:
+                    lines.append(f"    del {', '.join(dead)}")
+        lines.append("    return {" + ", ".join(f"{name!r}: {variables[self.named[name].index]}" for name in names) + "}")
+        return "\n".join(lines)
+
+    def compile(self, names=None, given=()):
+        key = (None if names is None else tuple(names), tuple(given))
+        if key not in self._compiled:
+            namespace = {"np": np}
+            exec(compile(self.source(names, given), "<cost model>", "exec"), namespace)
+            self._compiled[key] = namespace["evaluate"]
+        return self._compiled[key]
+
+    def evaluate(self, x, names=None):
+        """
+        {name: array} of the named expressions (default: all) for inputs x, e.g. batch_model.as_inputs(design).
+        """
+        return self.compile(names)(x)
+
+    def dependencies(self, name):
+        """
+        The inputs and other named expressions that name refers to directly; only the first name of a node if name
+        is an alias of an earlier one (e.g. CAPEX_amine of amines).
+        """
+        named = {}
+        for other, node in self.named.items():
+            named.setdefault(node.index, other)
+        root = self.named[name].index
+        if named[root] != name:
+            return [named[root]]
+        del named[root]
+        return [named.get(node.index, node.args[0] if node.op == "input" else None)
+                for node in self._order([self.named[name]], named)
+                if node.index in named or node.op == "input"]
+
+COSTS = ExpressionGraph()
+define = COSTS.define
+
+CEPCI, usd, sek = Input("CEPCI"), Input("usd"), Input("sek")
+EPC, contingency_project, ownercost = Input("EPC"), Input("contingency_project"), Input("ownercost")
+
+# Flows the cost correlations depend on, as in regret_BECCS
+mfuel = define("mfuel", Input("Qfuel") / Input("LHV"))
+memitted = define("memitted", 1.1024 * mfuel)
+mcaptured_amine = define("mcaptured_amine", memitted * Input("rate"))
+O2demand = define("O2demand", 0.024045 * mfuel)
+O2oxy = define("O2oxy", O2demand * (1-Input("O2eff")))
+mCO2 = define("mCO2", 1.1024 * mfuel)
+mcaptured_ccs = define("mcaptured_ccs", mCO2 * Input("rate"))
+mfluegas = define("mfluegas", mCO2 + 0.7416 * mfuel + O2oxy*32)
+Afr = define("Afr", 1300/20 * (mfuel*(2.342 + 4.203)/5.5))
+mash = define("mash", 0.01375*mfuel)
+
+# Correlations used by more than one technology
+def asu(O2flow):
+    ASU = Input("cASU") * ( 0.02*(59)**0.067/((1-0.95)**0.073) * (O2flow*1000*3600/453.592)**0.852 )*usd * CEPCI/499.6 *1.3
+    return where(Input("Hydrogen"), 0.0, ASU)
+
+def total_capital_requirement(tech, BEC, contingency):
+    EPCC = define(f"EPCC_{tech}", BEC*(1 + EPC))
+    TPC = define(f"TPC_{tech}", EPCC + contingency*BEC + contingency_project*(EPCC + contingency*BEC))
+    TOC = define(f"TOC_{tech}", TPC*(1 + ownercost))
+    return define(f"TCR_{tech}", 1.154*TOC)
+
+# Shopping-list items [MEUR]
+amines = define("amines", Input("cAM")* (2000*sek * mcaptured_amine/16.6))
+FR = define("FR", Input("cFR")* (4.98*(Afr/1531)**0.6)*usd * CEPCI/585.7 *1.4)
+cyclone = define("cyclone", Input("cycl") * 0.345*( 3 )*usd * CEPCI/576.1 *1.4)
+POC = define("POC", ( 48.67*10**-6*(mfluegas) * (1 + np.exp(0.018*(850+273.15)-26.4)) * 1/(0.995-0.98) )*usd * CEPCI/585.7 *1.3)
+ASU_clc = define("ASU_clc", asu(O2oxy))
+OCash = define("OCash", (4.6*(mash/6.7)**0.56)*usd * CEPCI/603.1 *1.2)
+CL = define("CL", 25.5 * mcaptured_ccs/37.31 * CEPCI/607.5 *1.3)
+interim = define("interim", (53000+2400*(4000)**0.6 )*10**-6 *usd * CEPCI/499.6 *1.2)
+ASU_oxy = define("ASU_oxy", asu(O2demand))
+
+# CAPEX_initial (years 1-2) and CAPEX (at timing) of each technology
+experimental = where(Input("Experimental"), 4.0, 1.0)
+define("CAPEX_amine", total([amines]))
+define("BEC_clc_initial", total([FR, cyclone, POC, OCash]))
+define("CAPEX_initial_clc", total_capital_requirement("clc_initial", COSTS["BEC_clc_initial"], Input("contingency_clc")) * experimental)
+define("BEC_clc", total([ASU_clc, CL, interim]))
+define("CAPEX_clc", total_capital_requirement("clc", COSTS["BEC_clc"], Input("contingency_process")) * experimental)
+define("BEC_oxy", total([ASU_oxy, CL, interim]))
+define("CAPEX_oxy", total_capital_requirement("oxy", COSTS["BEC_oxy"], Input("contingency_process")))
+
+CAPEX_NAMES = ["CAPEX_amine", "CAPEX_initial_clc", "CAPEX_clc", "CAPEX_oxy"]
+
+if __name__ == "__main__":
+    print(COSTS.source(CAPEX_NAMES))
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+from ema_workbench import CategoricalParameter, IntegerParameter
+
+# Designs of experiments over ema_workbench parameters (e.g. model.uncertainties + model.levers from controller.py),
+# as plain DataFrames with one column per parameter, for the batched model and the tools built on it.
+
+def design_from_unit(parameters, u):
+    """
+    Maps points u in the unit hypercube, shape (n, len(parameters)), onto the parameter ranges.
+
+    Real parameters are scaled linearly, integer and categorical parameters are split into equally wide bins.
+    """
+    u = np.asarray(u, dtype=float)
+    columns = {}
+    for j, parameter in enumerate(parameters):
+        if isinstance(parameter, CategoricalParameter): # Must come first: CategoricalParameter is an IntegerParameter
+            values = np.array([category.value for category in parameter.categories])
+            index = np.minimum((u[:, j] * len(values)).astype(int), len(values) - 1)
+            columns[parameter.name] = values[index].astype(object) if values.dtype.kind == "U" else values[index]
+        elif isinstance(parameter, IntegerParameter):
+            lower, upper = parameter.lower_bound, parameter.upper_bound
+            columns[parameter.name] = np.minimum(lower + (u[:, j] * (upper - lower + 1)).astype(int), upper)
+        else:
+            lower, upper = parameter.lower_bound, parameter.upper_bound
+            columns[parameter.name] = lower + u[:, j] * (upper - lower)
+    return pd.DataFrame(columns)
+
+def design_to_unit(parameters, design):
+    """
+    Unit-cube coordinates of the experiments of design, shape (n, len(parameters)): the inverse of design_from_unit,
+    with integer and categorical parameters at the centres of their bins.
+    """
+    columns = []
+    for parameter in parameters:
+        values = design[parameter.name].to_numpy()
+        if isinstance(parameter, CategoricalParameter):
+            categories = [category.value for category in parameter.categories]
+            index = np.array([categories.index(value) for value in values])
+            columns.append((index + 0.5) / len(categories))
+        elif isinstance(parameter, IntegerParameter):
+            lower, upper = parameter.lower_bound, parameter.upper_bound
+            columns.append((values - lower + 0.5) / (upper - lower + 1))
+        else:
+            lower, upper = parameter.lower_bound, parameter.upper_bound
+            columns.append((values - lower) / (upper - lower))
+    return np.column_stack(columns)
+
+def sample_design(parameters, n, seed=None, method="lhs"):
+    """
+    Samples n experiments over the parameter ranges with Latin hypercube ("lhs"), scrambled Sobol ("sobol")
+    or plain Monte Carlo ("mc") sampling.
+    """
+    d = len(parameters)
+    if method == "lhs":
+        u = qmc.LatinHypercube(d=d, seed=seed).random(n)
+    elif method == "sobol":
+        u = qmc.Sobol(d=d, scramble=True, seed=seed).random(n)
+    elif method == "mc":
+        u = np.random.default_rng(seed).random((n, d))
+    else:
+        raise ValueError(f"Unknown sampling method: {method}")
+    return design_from_unit(parameters, u)
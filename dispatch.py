@@ -0,0 +1,148 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Hourly dispatch mode for the batched model: instead of running each plant a flat number of hours at the average
+# prices, each plant runs in the hours of a representative year where it earns most, given hourly electricity
+# prices and district heating demand. The hourly result is folded back into the annual quantities of batch_model:
+# the operating hours, the average heat delivered in them (Qnet) and elc_shape, the average relative electricity
+# price of the dispatched hours, by which the electricity revenue is scaled. P stays the nominal net power.
+#
+# The dispatch is decided once at the base-year prices of each experiment; price escalations and trajectories
+# then scale the annual cash flows as before. Profiles with a flat price and a demand above Qnet reproduce the
+# default mode. All technologies and experiments are dispatched together, in blocks of bounded memory; ranking
+# the 8760 hours of every experiment and technology (a sort per row) dominates the cost.
+#
+# Profiles come from a CSV file with one row per hour of a representative year (8760 rows, no leap day), e.g.
+#   price,heat_demand
+#   41.3,182.0
+#   39.8,176.5
+# with price the electricity spot price [EUR/MWh] (only its shape is used: the experiment's celc sets the level)
+# and heat_demand the district heating demand [MW]. save_profiles writes this format, e.g. for synthetic_profiles.
+
+HOURS = 8760
+_profiles = {}
+
+def load_profiles(path="hourly_profiles.csv"):
+    """
+    Hourly profiles of a representative year from a CSV file with 8760 rows and the columns
+    price (electricity spot price [EUR/MWh]) and heat_demand (district heating demand [MW]).
+
+    Returns {"shape": price / mean price, "heat_demand": MW}; the experiment's celc sets the price level.
+    The file is read once per process.
+    """
+    key = os.path.abspath(path)
+    if key not in _profiles:
+        df = pd.read_csv(path, usecols=["price", "heat_demand"])
+        if len(df) != HOURS:
+            raise ValueError(f"{path} has {len(df)} hours, expected {HOURS}")
+        price = df["price"].to_numpy(dtype=float)
+        _profiles[key] = {"shape": price / price.mean(), "heat_demand": df["heat_demand"].to_numpy(dtype=float)}
+    return _profiles[key]
+
+def save_profiles(profiles, path="hourly_profiles.csv", mean_price=50.0):
+    """
+    Writes profiles (see load_profiles) as a profile CSV file, with the price shape scaled to mean_price [EUR/MWh].
+    """
+    pd.DataFrame({"price": profiles["shape"] * mean_price, "heat_demand": profiles["heat_demand"]}).to_csv(path, index=False)
+
+def synthetic_profiles(seed=0, price_volatility=0.35, peak_demand=220, base_demand=30):
+    """
+    Synthetic profiles with a seasonal and daily cycle and noise, in the format of load_profiles, for trying out the
+    dispatch mode without measured data.
+    """
+    rng = np.random.default_rng(seed)
+    hours = np.arange(HOURS)
+    winter = (1 + np.cos(2*np.pi * hours / HOURS)) / 2  # 1 in January, 0 in July
+    daily = np.sin(2*np.pi * (hours % 24 - 6) / 24)
+    price = np.exp(price_volatility * (0.8*winter + 0.3*daily + 0.5*rng.standard_normal(HOURS)))
+    demand = base_demand + (peak_demand - base_demand) * winter * (1 + 0.1*daily) + 5*rng.standard_normal(HOURS)
+    return {"shape": price / price.mean(), "heat_demand": np.maximum(demand, 0)}
+
+def fixed_margin(x, tech, name):
+    """
+    Net earnings [EUR/h] of running a technology that are the same in every hour at the base-year prices: fuel,
+    capture and storage, shape (n,).
+    """
+    crc = np.where(x["Integration"], np.maximum(x["crc"], x["cets"]), x["crc"])
+    cstore = x["cstore"] * np.where(x["Monostorage"], 4, 1)
+    fixed = -tech["Qfuel"] * x["cbio"] + tech["mcaptured"] * 3.6 * (crc - (x["ctrans"]*x["sek"] + cstore))
+    fixed = fixed - np.where(x["Fossilized"], tech["memitted"] * 3.6 * x["cets"], 0.0)
+    if name == "amine":
+        fixed = fixed - x["cmea"] * x["sek"] * 1.5 * tech["mcaptured"] * 3.6
+    if name == "clc":
+        fixed = fixed - 1/1000 * tech["Qfuel"] * x["coc"]
+    return np.broadcast_to(fixed, x["rate"].shape)
+
+def hourly_margin(P, celc, cheat, shape, heat):
+    """
+    Net earnings [EUR/h] from electricity and heat sales in each hour at the base-year prices, shape (n, HOURS),
+    single precision, for the nominal net power P and the heat delivered in each hour. The hours are ranked by
+    this part alone.
+    """
+    variable = np.asarray(P * celc, dtype=np.float32)[:, None] * shape.astype(np.float32)
+    variable += np.asarray(cheat * celc, dtype=np.float32)[:, None] * heat.astype(np.float32)
+    return variable
+
+def dispatch_weights(variable, fixed, hours, economic=False):
+    """
+    Share of each hour that a plant runs, shape (n, HOURS): the best hours by margin until the annual hours are used
+    up (the last hour partly). With economic=True, hours with a negative margin are never run.
+    Ties at the threshold share the remaining hours equally.
+    """
+    if economic:
+        hours = np.minimum(hours, (variable > -fixed[:, None]).sum(axis=1))
+    k = np.clip(np.asarray(hours, dtype=float), 0, HOURS)
+    threshold = np.take_along_axis(np.sort(variable, axis=1), HOURS - np.maximum(np.ceil(k).astype(int), 1)[:, None], axis=1)
+    above = variable > threshold
+    tied = variable == threshold
+    rest = (k - above.sum(axis=1)) / np.maximum(tied.sum(axis=1), 1)
+    weights = above + tied * rest[:, None]
+    return np.where(k[:, None] > 0, weights, 0.0)
+
+def dispatch(x, techs, profiles, economic=False, block_size=2**17):
+    """
+    Replaces operating and Qnet of each technology in techs (see batch_model.energy_balances) by the dispatched
+    annual hours and the average delivered heat over those hours, and adds elc_shape, the average price shape
+    over those hours. All technologies and experiments are dispatched as one stack of rows, block_size hour
+    values (rows x 8760) at a time: the per-row sorts are bound by the CPU cache, so larger blocks are slower.
+    """
+    n = len(x["rate"])
+    names = list(techs)
+    column = lambda value: np.broadcast_to(np.asarray(value, dtype=float), (n,))
+    stack = lambda key: np.concatenate([column(techs[name][key]) for name in names])
+    P, Qnet, operating = stack("P"), stack("Qnet"), stack("operating")
+    fixed = np.concatenate([fixed_margin(x, techs[name], name) for name in names])
+    celc, cheat = np.tile(x["celc"], len(names)), np.tile(x["cheat"], len(names))
+
+    hours, elc_shape, heat_delivered = np.empty(len(P)), np.empty(len(P)), np.empty(len(P))
+    step = max(1, block_size // HOURS)
+    for start in range(0, len(P), step):
+        rows = slice(start, start + step)
+        heat = np.minimum(Qnet[rows, None], profiles["heat_demand"]) # Heat is only sold up to the demand
+        weights = dispatch_weights(hourly_margin(P[rows], celc[rows], cheat[rows], profiles["shape"], heat),
+                                   fixed[rows], operating[rows], economic)
+        hours[rows] = weights.sum(axis=1)
+        safe = np.maximum(hours[rows], 1e-12)
+        elc_shape[rows] = weights @ profiles["shape"] / safe # Electricity is sold at the dispatched prices
+        heat_delivered[rows] = np.einsum("ij,ij->i", weights, heat) / safe
+
+    for i, name in enumerate(names):
+        rows = slice(i * n, (i + 1) * n)
+        techs[name].update(operating=hours[rows], Qnet=heat_delivered[rows], elc_shape=elc_shape[rows])
+    return techs
+
+if __name__ == "__main__":
+    import time
+    from batch_model import regret_BECCS_batch
+    from validation import random_design
+
+    design = random_design(4000, seed=1)
+    profiles = synthetic_profiles()
+    start = time.perf_counter()
+    dispatched = regret_BECCS_batch(design, profiles=profiles)
+    seconds = time.perf_counter() - start
+    print(f"Hourly dispatch of {len(design)} experiments in {seconds:.2f} s ({seconds / len(design) / 4 * 1e3:.3f} ms per experiment and technology)")
+    default = regret_BECCS_batch(design)
+    for outcome in ["npv_ref", "npv_amine", "npv_oxy", "npv_clc"]:
+        print(f"{outcome}: mean {default[outcome].mean():.1f} MEUR flat, {dispatched[outcome].mean():.1f} MEUR dispatched")
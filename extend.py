@@ -0,0 +1,239 @@
+import json
+import os
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from scipy.stats import qmc
+from batch_model import regret_BECCS_batch
+from cash_flow_store import append_cash_flows, write_cash_flows
+from designs import design_from_unit, design_to_unit, sample_design
+
+# Extension of a stored run with more scenarios, without recomputing the experiments it already has. A run is a
+# directory with experiments.csv and outcomes.csv as controller.py writes them (every scenario with every policy,
+# row i is experiment ID i), optionally cash_flows.npy, and run_manifest.json recording how each batch of
+# scenarios was sampled. extend_run samples new scenarios that complement the stored ones, evaluates them with the
+# stored policies and appends the rows, so doubling a study costs the new experiments only:
+#   start_run(512, 20, "study", method="sobol", seed=1)   # or an existing controller.py run
+#   extend_run(512, "study")                              # the same as start_run(1024, ...)
+#
+# The new scenarios are either the next points of the scrambled Sobol sequence the run was started with ("sobol",
+# which needs the seed in the manifest) or an augmentation of the stored Latin hypercube ("lhs"): in each dimension
+# the range is split into as many strata as there are scenarios after the extension, and the new scenarios take
+# the strata no stored scenario is in, so extending an LHS of m scenarios by a multiple of m gives an LHS again.
+# New scenarios are named after the largest stored scenario or policy name, as ema_workbench numbers them.
+
+MANIFEST = "run_manifest.json"
+
+def run_parameters(uncertainties=None, levers=None):
+    """
+    The uncertainties and levers of a run, by default those of controller.py.
+    """
+    if uncertainties is None or levers is None:
+        from controller import model
+        uncertainties = model.uncertainties if uncertainties is None else uncertainties
+        levers = model.levers if levers is None else levers
+    return uncertainties, levers
+
+def stored_uncertainties(names):
+    """
+    The uncertainties of controller.py, including the optional shocks, with the given names, in that order.
+    """
+    from controller import model, opted_in_shocks, OPTIONAL_SHOCKS
+    known = {parameter.name: parameter for parameter in model.uncertainties + opted_in_shocks(OPTIONAL_SHOCKS)}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"The run has uncertainties {unknown} that controller.py does not define; pass uncertainties")
+    return [known[name] for name in names]
+
+def lhs_augmentation(u, n, seed=None, candidates=10):
+    """
+    n points of the unit hypercube that complement the points u, shape (m, d): in each dimension the new points
+    take the strata of m + n equal strata that are empty (then the least occupied ones), at a random position
+    within them. Of candidates random pairings of the strata across dimensions, the one whose closest pair of
+    points (new-new or new-stored) is farthest apart is returned.
+    """
+    rng = np.random.default_rng(seed)
+    m, d = u.shape
+    total = m + n
+    strata = []
+    for j in range(d):
+        occupied = np.bincount(np.minimum((u[:, j] * total).astype(int), total - 1), minlength=total)
+        strata.append(np.lexsort((rng.random(total), occupied))[:n]) # Empty strata first, in random order
+    stored = cKDTree(u) if m else None
+    best, best_distance = None, -np.inf
+    for _ in range(candidates):
+        new = (np.column_stack([rng.permutation(s) for s in strata]) + rng.random((n, d))) / total
+        distance = cKDTree(new).query(new, k=2)[0][:, 1].min() if n > 1 else np.inf
+        if stored is not None:
+            distance = min(distance, stored.query(new)[0].min())
+        if distance > best_distance:
+            best, best_distance = new, distance
+    return best
+
+def sobol_continuation(d, n, seed, skip):
+    """
+    Points skip to skip + n of the scrambled Sobol sequence that sample_design(..., seed, "sobol") starts.
+    """
+    return qmc.Sobol(d=d, scramble=True, seed=seed).fast_forward(skip).random(n)
+
+def experiment_rows(scenarios, policies, model_name):
+    """
+    The experiments of every scenario with every policy (both with a name column), ordered by policy then
+    scenario as ema_workbench runs them.
+    """
+    s, k = len(scenarios), len(policies)
+    df = pd.concat([scenarios.drop(columns="scenario").iloc[np.tile(np.arange(s), k)].reset_index(drop=True),
+                    policies.drop(columns="policy").iloc[np.repeat(np.arange(k), s)].reset_index(drop=True)], axis=1)
+    df["scenario"] = np.tile(scenarios["scenario"].to_numpy(), k)
+    df["policy"] = np.repeat(policies["policy"].to_numpy(), s)
+    df["model"] = model_name
+    return df
+
+def read_manifest(directory="."):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_manifest(manifest, directory="."):
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def batch_record(batch, method, seed, scenarios, start, stop, evaluate):
+    return {"batch": batch, "method": method, "seed": seed, "scenarios": int(len(scenarios)),
+            "first_scenario": int(scenarios["scenario"].iloc[0]), "experiments": [int(start), int(stop)],
+            "evaluator": None if evaluate is None else getattr(evaluate, "__name__", repr(evaluate)),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+
+def start_run(n_scenarios, policies, directory=".", method="sobol", seed=None, cash_flows=False,
+              uncertainties=None, levers=None, evaluate=regret_BECCS_batch, model_name="BECCSMalmo"):
+    """
+    A new run in directory: n_scenarios scenarios sampled with "sobol" or "lhs", each evaluated with every policy
+    (a DataFrame of the levers, or a number of policies to sample by LHS). evaluate(design) -> {outcome: array}.
+    The seed is drawn and recorded if not given, so that a Sobol run can be continued. Returns (experiments,
+    outcomes) as written.
+    """
+    uncertainties, levers = run_parameters(uncertainties, levers)
+    seed = int(np.random.SeedSequence().entropy) if seed is None else seed
+    os.makedirs(directory, exist_ok=True)
+    if isinstance(policies, int):
+        policies = sample_design(levers, policies, seed=seed)
+    scenarios = sample_design(uncertainties, n_scenarios, seed=seed, method=method)
+    scenarios["scenario"] = np.arange(n_scenarios)
+    policies = policies[[lever.name for lever in levers]].reset_index(drop=True)
+    policies["policy"] = n_scenarios + np.arange(len(policies))
+
+    experiments = experiment_rows(scenarios, policies, model_name)
+    outcomes = pd.DataFrame(evaluate(experiments))
+    experiments.to_csv(os.path.join(directory, "experiments.csv"), index=False)
+    outcomes.to_csv(os.path.join(directory, "outcomes.csv"), index=False)
+    if cash_flows:
+        write_cash_flows(experiments, os.path.join(directory, "cash_flows.npy"))
+    write_manifest({"uncertainties": [p.name for p in uncertainties], "levers": [p.name for p in levers],
+                    "policies": len(policies),
+                    "batches": [batch_record(0, method, seed, scenarios, 0, len(experiments), evaluate)]}, directory)
+    return experiments, outcomes
+
+def extend_run(n_scenarios, directory=".", method=None, seed=None, candidates=10, uncertainties=None, levers=None,
+               evaluate=regret_BECCS_batch):
+    """
+    Appends n_scenarios new scenarios, each with every stored policy, to the run in directory and returns the new
+    (experiments, outcomes). Only the new experiments are evaluated; their IDs follow the stored ones.
+
+    method is "sobol" (continue the Sobol sequence of the run, possible if every batch was sampled by it) or "lhs"
+    (lhs_augmentation of the stored scenarios, works for any run); by default "sobol" for Sobol runs and "lhs"
+    otherwise. The batch is recorded in run_manifest.json, which is created for runs that do not have one.
+
+    uncertainties default to those the run was sampled over: the names in the manifest, or for a run without one
+    the stored columns that are not levers, looked up among those of controller.py.
+    """
+    experiments_path, outcomes_path = os.path.join(directory, "experiments.csv"), os.path.join(directory, "outcomes.csv")
+    stored = pd.read_csv(experiments_path)
+    outcome_columns = pd.read_csv(outcomes_path, nrows=0).columns
+    n_outcomes = sum(1 for _ in open(outcomes_path)) - 1
+    if n_outcomes != len(stored):
+        raise ValueError(f"The run has {len(stored)} experiments but {n_outcomes} outcomes")
+
+    manifest = read_manifest(directory)
+    _, levers = run_parameters([], levers)
+    missing = [lever.name for lever in levers if lever.name not in stored]
+    if missing:
+        raise ValueError(f"The run has no columns for the levers {missing}")
+    if uncertainties is None:
+        names = manifest["uncertainties"] if manifest is not None else [
+            column for column in stored if column not in {lever.name for lever in levers} | {"scenario", "policy", "model"}]
+        uncertainties = stored_uncertainties(names)
+    if manifest is None: # A run not started by start_run, e.g. controller.py
+        scenarios = stored.drop_duplicates("scenario")
+        manifest = {"uncertainties": [p.name for p in uncertainties], "levers": [p.name for p in levers],
+                    "policies": int(stored["policy"].nunique()),
+                    "batches": [batch_record(0, None, None, scenarios, 0, len(stored), None)]}
+        manifest["batches"][0]["created"] = None
+    if manifest["uncertainties"] != [p.name for p in uncertainties] or manifest["levers"] != [p.name for p in levers]:
+        raise ValueError("The uncertainties or levers differ from those the run was started with")
+    batches = manifest["batches"]
+    sobol = all(batch["method"] == "sobol" and batch["seed"] == batches[0]["seed"] for batch in batches)
+    method = method or ("sobol" if sobol else "lhs")
+
+    scenarios = stored.drop_duplicates("scenario")
+    policies = stored.drop_duplicates("policy")[[lever.name for lever in levers] + ["policy"]].reset_index(drop=True)
+    if method == "sobol":
+        if not sobol:
+            raise ValueError("Only a run sampled entirely from one Sobol sequence can be continued with it")
+        seed = batches[0]["seed"]
+        u = sobol_continuation(len(uncertainties), n_scenarios, seed, len(scenarios))
+    elif method == "lhs":
+        seed = int(np.random.SeedSequence().entropy) if seed is None else seed
+        u = lhs_augmentation(design_to_unit(uncertainties, scenarios), n_scenarios, seed, candidates)
+    else:
+        raise ValueError(f"Unknown extension method: {method}")
+
+    new_scenarios = design_from_unit(uncertainties, u)
+    new_scenarios["scenario"] = max(stored["scenario"].max(), stored["policy"].max()) + 1 + np.arange(n_scenarios)
+    model_name = stored["model"].iloc[0] if "model" in stored else "BECCSMalmo"
+    experiments = experiment_rows(new_scenarios, policies, model_name)[stored.columns]
+    outcomes = pd.DataFrame(evaluate(experiments))[outcome_columns]
+    experiments.index += len(stored)
+    outcomes.index += len(stored)
+
+    if os.path.exists(os.path.join(directory, "cash_flows.npy")):
+        append_cash_flows(experiments, os.path.join(directory, "cash_flows.npy"))
+    outcomes.to_csv(outcomes_path, mode="a", header=False, index=False)
+    experiments.to_csv(experiments_path, mode="a", header=False, index=False)
+    batches.append(batch_record(len(batches), method, seed, new_scenarios, len(stored), len(stored) + len(experiments),
+                                evaluate))
+    write_manifest(manifest, directory)
+    return experiments, outcomes
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    uncertainties, _ = run_parameters()
+    with tempfile.TemporaryDirectory() as directory:
+        start_run(256, 20, directory, method="sobol", seed=1)
+        start = time.perf_counter()
+        extend_run(256, directory)
+        print(f"Sobol run extended from 256 to 512 scenarios in {time.perf_counter() - start:.2f} s")
+        direct = os.path.join(directory, "direct")
+        start_run(512, pd.read_csv(os.path.join(directory, "experiments.csv")).drop_duplicates("policy"), direct,
+                  method="sobol", seed=1)
+        extended = pd.read_csv(os.path.join(directory, "outcomes.csv"))
+        print("Same outcomes as a run of 512 scenarios:",
+              np.allclose(extended.sort_values(list(extended)).to_numpy(),
+                          pd.read_csv(os.path.join(direct, "outcomes.csv")).sort_values(list(extended)).to_numpy()))
+
+        start_run(500, 20, directory, method="lhs", seed=2)
+        extend_run(500, directory, seed=3)
+        scenarios = pd.read_csv(os.path.join(directory, "experiments.csv")).drop_duplicates("scenario")
+        real = [j for j, p in enumerate(uncertainties) if p.__class__.__name__ == "RealParameter"]
+        u = design_to_unit(uncertainties, scenarios)[:, real]
+        strata = np.sort(np.floor(u * len(u)).astype(int), axis=0)
+        print("Extended LHS is an LHS of 1000 scenarios:", (strata == np.arange(len(u))[:, None]).all())
+        fresh = design_to_unit(uncertainties, sample_design(uncertainties, 1000, seed=4))[:, real]
+        independent = np.vstack([u[:500], design_to_unit(uncertainties, sample_design(uncertainties, 500, seed=5))[:, real]])
+        for name, points in [("extended", u), ("fresh LHS", fresh), ("two independent LHS", independent)]:
+            print(f"Centered L2 discrepancy, {name}: {qmc.discrepancy(points):.5f}")
+        print(read_manifest(directory)["batches"])
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from batch_model import as_inputs, evaluate
+
+# Fleet mode: screens several CHPs with the same regret framework. The plants are rows of a local table (plants.csv)
+# with the nominal parameters that regret_BECCS otherwise takes for the Malmö CHP, kept as one array per parameter.
+# Besides Malmö, plants.csv ships two synthetic example plants (labelled in its source column) to exercise the
+# multi-plant path; replace them with the plants to screen.
+# Each chunk of experiments is repeated for every plant and evaluated by the batched model in one pass, so the
+# plants share the same scenarios and policies, and screening P plants costs about as much as P chunks.
+
+PLANT_PARAMETERS = ["LHV", "Qfuel", "Pnet", "Qfgc", "Qcond"]
+
+def load_plants(path="plants.csv"):
+    """
+    Plant registry {"plant": names, parameter: array} from a CSV file with a plant column and PLANT_PARAMETERS.
+    """
+    df = pd.read_csv(path)
+    missing = [column for column in ["plant"] + PLANT_PARAMETERS if column not in df]
+    if missing:
+        raise ValueError(f"{path} is missing the columns {missing}")
+    if df["plant"].duplicated().any():
+        raise ValueError(f"{path} has duplicate plants: {sorted(df['plant'][df['plant'].duplicated()])}")
+    plants = {"plant": df["plant"].astype(str).to_numpy()}
+    plants.update({name: df[name].to_numpy(dtype=float) for name in PLANT_PARAMETERS})
+    return plants
+
+def full_factorial(scenarios, policies):
+    """
+    Every scenario with every policy, ordered by scenario then policy: row i * len(policies) + j is scenario i with
+    policy j. perform_experiments orders them by policy then scenario instead (see extend.experiment_rows).
+    """
+    s, k = len(scenarios), len(policies)
+    return pd.concat([scenarios.iloc[np.repeat(np.arange(s), k)].reset_index(drop=True),
+                      policies.iloc[np.tile(np.arange(k), s)].reset_index(drop=True)], axis=1)
+
+def fleet_regret(design, plants=None, chunk_size=20000, prices=None, profiles=None):
+    """
+    Evaluates every experiment of design (see batch_model.regret_BECCS_batch) for every plant of the registry
+    (see load_plants; defaults to plants.csv). Experiments are evaluated chunk_size plant-rows at a time.
+
+    Returns {plant: {outcome: array}}, with the outcome arrays in the order of design. The arrays of all plants are
+    rows of one (plants, experiments) array per outcome.
+    """
+    plants = plants if plants is not None else load_plants()
+    n_plants = len(plants["plant"])
+    x = as_inputs(design)
+    n = len(x["rate"])
+    prices = {name: np.asarray(value, dtype=float) for name, value in (prices or {}).items()}
+    step = max(1, chunk_size // n_plants)
+
+    results = {}
+    for start in range(0, n, step):
+        rows = slice(start, start + step)
+        chunk = {name: values[rows] for name, values in x.items()}
+        m = len(chunk["rate"])
+        # Plant-major: row p*m + i is experiment i at plant p
+        xp = {name: np.tile(values, n_plants) for name, values in chunk.items()}
+        xp.update({name: np.repeat(plants[name], m) for name in PLANT_PARAMETERS})
+        chunk_prices = {name: np.tile(value[rows], (n_plants, 1)) if value.ndim == 2 else value for name, value in prices.items()}
+        for outcome, values in evaluate(xp, chunk_prices, profiles).items():
+            if outcome not in results:
+                results[outcome] = np.empty((n_plants, n), dtype=values.dtype)
+            results[outcome][:, rows] = values.reshape(n_plants, m)
+    return {plant: {outcome: values[p] for outcome, values in results.items()} for p, plant in enumerate(plants["plant"])}
+
+def check_fleet(design, plants=None, atol=1e-9, rtol=1e-9):
+    """
+    Compares every plant's slice of fleet_regret(design, plants) with a single-plant regret_BECCS_batch run with
+    that plant's parameters, as validation.compare reports {plant: report}.
+    """
+    from batch_model import regret_BECCS_batch
+    from validation import compare
+
+    plants = plants if plants is not None else load_plants()
+    fleet = fleet_regret(design, plants, chunk_size=max(1, len(design) // 3)) # Several chunks per run
+    return {plant: compare(regret_BECCS_batch(design, **{name: plants[name][p] for name in PLANT_PARAMETERS}),
+                           fleet[plant], atol, rtol)
+            for p, plant in enumerate(plants["plant"])}
+
+def fleet_summary(fleet, design):
+    """
+    Per plant, the share of experiments in which each technology is the best choice, and the mean and
+    95th percentile regret of each decision.
+    """
+    rows = []
+    for plant, outcomes in fleet.items():
+        row = {"plant": plant}
+        for tech in ["ref", "amine", "clc", "oxy"]:
+            row[f"best_{tech}"] = (outcomes[f"regret_{tech}"] == 0).mean()
+        regret = pd.Series(outcomes["regret"]).groupby(design["decision"].to_numpy())
+        row.update({f"mean_regret_{decision}": value for decision, value in regret.mean().items()})
+        row.update({f"p95_regret_{decision}": value for decision, value in regret.quantile(0.95).items()})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("plant")
+
+if __name__ == "__main__":
+    import time
+    from controller import model
+    from designs import sample_design
+
+    plants = load_plants()
+    scenarios = sample_design(model.uncertainties, 200, seed=1)
+    policies = sample_design(model.levers, 50, seed=2)
+    design = full_factorial(scenarios, policies)
+    start = time.perf_counter()
+    fleet = fleet_regret(design, plants)
+    seconds = time.perf_counter() - start
+    print(f"{len(plants['plant'])} plants x {len(design)} experiments in {seconds:.2f} s")
+    print(fleet_summary(fleet, design).T)
+    checks = check_fleet(design.iloc[:2000], plants)
+    print("Plants equal to single-plant runs:", {plant: report["passed"] for plant, report in checks.items()})
@@ -0,0 +1,298 @@
+import inspect
+import numpy as np
+from batch_model import as_inputs, TECHS
+from cost_model import COSTS
+
+# Incremental recomputation of the batched model for what-if edits: the model is an explicit dependency graph of
+# named nodes (the expressions of cost_model.COSTS, Pasu, per-phase discounted cash-flow sums, NPVs and
+# regrets), each a function of the inputs or of other nodes. An Incremental keeps the node values of a design;
+# changing an input column drops only the nodes downstream of it, and the next evaluation recomputes just those.
+#
+# The cash flows enter as discounted sums of each price over the phases of the analysis period (as the reference
+# plant, operating, stranded, with the Auction bonus), which the NPVs combine linearly. The sums are one value per
+# experiment, so the cache stays small; of the per-year arrays only the discount factors and phase masks are kept.
+# The outcomes match regret_BECCS up to the summation order (~1e-12 MEUR). Per-year price vectors are not supported.
+
+OUTCOMES = ["regret", "regret_ref", "regret_amine", "regret_clc", "regret_oxy", "npv_ref", "npv_amine", "npv_oxy", "npv_clc"]
+
+class Graph:
+    """
+    Nodes {name: (function, dependencies, cache)}; a node's value is function(*values of its dependencies).
+    Nodes with cache=False (per-year arrays) are recomputed when needed instead of being kept.
+    """
+    def __init__(self):
+        self.nodes = {}
+        self._downstream = {}
+
+    def add(self, name, function, dependencies, cache=True):
+        self.nodes[name] = (function, list(dependencies), cache)
+        self._downstream = {}
+        return function
+
+    def node(self, cache=True):
+        """
+        Registers the decorated function as a node named after it, with its arguments as dependencies.
+        """
+        def register(function):
+            return self.add(function.__name__, function, inspect.signature(function).parameters, cache)
+        return register
+
+    def downstream(self, name):
+        """
+        All nodes that depend on name, directly or indirectly.
+        """
+        if name not in self._downstream:
+            dependents = {}
+            for node, (_, dependencies, _) in self.nodes.items():
+                for dependency in dependencies:
+                    dependents.setdefault(dependency, []).append(node)
+            found, stack = set(), [name]
+            while stack:
+                for dependent in dependents.get(stack.pop(), []):
+                    if dependent not in found:
+                        found.add(dependent)
+                        stack.append(dependent)
+            self._downstream[name] = found
+        return self._downstream[name]
+
+GRAPH = Graph()
+node = GRAPH.node
+
+# Flows, shopping-list items, TCR and CAPEX: one node per named expression of the cost model
+def cost_node(name, dependencies):
+    evaluate = COSTS.compile([name], given=[dependency for dependency in dependencies if dependency in COSTS.named])
+    return lambda *values: evaluate(dict(zip(dependencies, values)))[name]
+for name in COSTS.named:
+    GRAPH.add(name, cost_node(name, COSTS.dependencies(name)), COSTS.dependencies(name))
+
+# Energy balances, as in regret_BECCS
+@node()
+def Qnet_ref(Qcond, Qfgc): return Qcond + Qfgc
+@node()
+def operating_tech(operating, operating_increase): return operating + operating_increase
+@node()
+def memitted_amine(memitted, rate): return memitted * (1-rate)
+@node()
+def P_amine(Pnet, mcaptured_amine): return Pnet - (48.3-31.8)/16.6 * mcaptured_amine
+@node()
+def Qnet_amine(Qcond, Qfgc, mcaptured_amine):
+    return (Qcond - (106.6-73.7)/16.6 * mcaptured_amine) + Qfgc + (11+21.7)/16.6 * mcaptured_amine
+@node()
+def Wcompr(mcaptured_amine): return 3.5/16.6 * mcaptured_amine
+@node()
+def Qcool(mcaptured_amine): return 3.6/16.6 * mcaptured_amine
+@node()
+def Pasu_clc(Wasu, O2oxy): return Wasu/1000*O2oxy*32
+@node()
+def Pasu_oxy(Wasu, O2demand): return Wasu/1000*O2demand*32
+@node()
+def P_clc(Pnet, Pasu_clc, Wcompr, Qcool): return Pnet - Pasu_clc - Wcompr - Qcool
+@node()
+def P_oxy(Pnet, Pasu_oxy, Wcompr, Qcool): return Pnet - Pasu_oxy - Wcompr - Qcool
+@node()
+def memitted_ccs(mCO2, rate): return mCO2 * (1-rate)
+
+# Analysis period, discounting and phases. Per-year arrays have shape (n or 1, years); the discount factors and the
+# phase masks (one byte per year) are kept, the prices are not.
+@node()
+def years(timing, lifetime): return np.arange(1, int((timing + lifetime).max()))
+@node()
+def discount(years, dr): return (1 + dr[:, None]) ** -years
+@node()
+def capex_discount_initial(discount): return (discount[:, 0] + discount[:, 1]) / 2
+@node()
+def capex_discount(discount, timing):
+    return (np.take_along_axis(discount, timing[:, None] - 1, axis=1) + np.take_along_axis(discount, timing[:, None], axis=1))[:, 0] / 2
+@node()
+def phase_all(years, timing, lifetime): return years < (timing + lifetime)[:, None]
+@node()
+def phase_operating(phase_all, years, timing): return phase_all & (years > timing[:, None] + 1)
+@node()
+def phase_before(phase_all, phase_operating): return phase_all & ~phase_operating
+@node()
+def phase_stranded(phase_operating, years, timing, Toxic): # Amine capture stranded after 5 years of operation
+    return phase_operating & Toxic[:, None] & (years > timing[:, None] + 6)
+@node()
+def phase_auction(phase_operating, years, timing, Auction): return phase_operating & Auction[:, None] & (years < timing[:, None]+15+2)
+@node()
+def phase_auction_stranded(phase_auction, phase_stranded): return phase_auction & phase_stranded
+
+# Prices per year, as in batch_model.price_paths
+@node(cache=False)
+def price_celc(celc, Powersurge, years):
+    return np.multiply.accumulate(np.column_stack([celc, np.where(Powersurge[:, None] & (years < 4), 1.20, 1.0)]), axis=1)[:, 1:]
+@node(cache=False)
+def price_heat(cheat, price_celc): return cheat[:, None] * price_celc
+@node(cache=False)
+def price_cbio(cbio, Bioshortage, years):
+    return np.multiply.accumulate(np.column_stack([cbio, np.where(Bioshortage[:, None] & (years < 11), 1.10, 1.0)]), axis=1)[:, 1:]
+@node(cache=False)
+def price_crc(crc, cets, Integration): return np.where(Integration, np.maximum(crc, cets), crc)[:, None]
+@node(cache=False)
+def price_cets(cets, Fossilized): return np.where(Fossilized, cets, 0.0)[:, None] # ETS allowances only with Fossilized
+@node(cache=False)
+def price_one(): return np.ones((1, 1))
+
+# Discounted sums of each price over each phase: sum_<price>_<phase> = sum over the phase's years of price * discount
+PHASE_PRICES = {
+    "all": ["celc", "heat", "cbio", "cets"],
+    "before": ["celc", "heat", "cbio", "cets"],
+    "operating": ["celc", "heat", "cbio", "cets", "crc", "one"],
+    "stranded": ["celc", "heat", "cbio", "cets", "crc", "one"],
+    "auction": ["one"],
+    "auction_stranded": ["one"],
+}
+def discounted_sum(price, discount, phase): return np.where(phase, price * discount, 0.0).sum(axis=1)
+for phase, prices in PHASE_PRICES.items():
+    for price in prices:
+        GRAPH.add(f"sum_{price}_{phase}", discounted_sum, [f"price_{price}", "discount", f"phase_{phase}"])
+
+def reference_flows(Qnet_ref, Pnet, Qfuel, memitted, operating, sums):
+    """
+    Discounted cash flows [MEUR] of running as the reference plant, from the price sums (celc, heat, cbio, cets).
+    """
+    celc, heat, cbio, cets = sums
+    return ((Qnet_ref * heat + Pnet * celc) * operating - Qfuel * operating * cbio
+            - memitted / 1000 * 3600 * operating * cets) * 10**-6
+
+def technology_flows(Qnet, P, Qfuel, mcaptured, memitted, operating, variable_cost, sums, auction):
+    """
+    Discounted cash flows [MEUR] of running a capture technology, from the price sums (celc, heat, cbio, cets, crc,
+    one) and the discounted Auction years. variable_cost is the cost per captured tonne that is not a price path.
+    """
+    celc, heat, cbio, cets, crc, one = sums
+    captured = mcaptured / 1000 * 3600 * operating
+    return ((Qnet * heat + P * celc) * operating - Qfuel * operating * cbio - memitted / 1000 * 3600 * operating * cets
+            + captured * (crc + 160 * auction) - variable_cost * one) * 10**-6
+
+@node()
+def reference_all(Qnet_ref, Pnet, Qfuel, memitted, operating, sum_celc_all, sum_heat_all, sum_cbio_all, sum_cets_all):
+    return reference_flows(Qnet_ref, Pnet, Qfuel, memitted, operating, (sum_celc_all, sum_heat_all, sum_cbio_all, sum_cets_all))
+@node()
+def reference_before(Qnet_ref, Pnet, Qfuel, memitted, operating, sum_celc_before, sum_heat_before, sum_cbio_before, sum_cets_before):
+    return reference_flows(Qnet_ref, Pnet, Qfuel, memitted, operating, (sum_celc_before, sum_heat_before, sum_cbio_before, sum_cets_before))
+@node()
+def reference_stranded(Qnet_ref, Pnet, Qfuel, memitted, operating, sum_celc_stranded, sum_heat_stranded, sum_cbio_stranded, sum_cets_stranded):
+    return reference_flows(Qnet_ref, Pnet, Qfuel, memitted, operating, (sum_celc_stranded, sum_heat_stranded, sum_cbio_stranded, sum_cets_stranded))
+@node()
+def storage_cost(mcaptured_ccs, operating_tech, ctrans, sek, cstore, Monostorage):
+    return mcaptured_ccs / 1000 * 3600 * operating_tech * (ctrans*sek + cstore * np.where(Monostorage, 4, 1))
+
+@node()
+def operating_amine(Qnet_amine, P_amine, Qfuel, mcaptured_amine, memitted_amine, operating_tech, ctrans, sek, cstore, Monostorage, cmea,
+                    sum_celc_operating, sum_heat_operating, sum_cbio_operating, sum_cets_operating, sum_crc_operating, sum_one_operating,
+                    sum_celc_stranded, sum_heat_stranded, sum_cbio_stranded, sum_cets_stranded, sum_crc_stranded, sum_one_stranded,
+                    sum_one_auction, sum_one_auction_stranded):
+    captured = mcaptured_amine / 1000 * 3600 * operating_tech
+    variable_cost = captured * (ctrans*sek + cstore * np.where(Monostorage, 4, 1)) + cmea * sek * 1.5 * captured
+    sums = [operating - stranded for operating, stranded in zip(
+        (sum_celc_operating, sum_heat_operating, sum_cbio_operating, sum_cets_operating, sum_crc_operating, sum_one_operating),
+        (sum_celc_stranded, sum_heat_stranded, sum_cbio_stranded, sum_cets_stranded, sum_crc_stranded, sum_one_stranded))]
+    return technology_flows(Qnet_amine, P_amine, Qfuel, mcaptured_amine, memitted_amine, operating_tech, variable_cost, sums,
+                            sum_one_auction - sum_one_auction_stranded)
+@node()
+def operating_clc(Qnet_ref, P_clc, Qfuel, mcaptured_ccs, memitted_ccs, operating_tech, storage_cost, coc,
+                  sum_celc_operating, sum_heat_operating, sum_cbio_operating, sum_cets_operating, sum_crc_operating, sum_one_operating,
+                  sum_one_auction):
+    variable_cost = storage_cost + 1/1000 * Qfuel * operating_tech * coc
+    return technology_flows(Qnet_ref, P_clc, Qfuel, mcaptured_ccs, memitted_ccs, operating_tech, variable_cost,
+                            (sum_celc_operating, sum_heat_operating, sum_cbio_operating, sum_cets_operating, sum_crc_operating, sum_one_operating),
+                            sum_one_auction)
+@node()
+def operating_oxy(Qnet_ref, P_oxy, Qfuel, mcaptured_ccs, memitted_ccs, operating_tech, storage_cost,
+                  sum_celc_operating, sum_heat_operating, sum_cbio_operating, sum_cets_operating, sum_crc_operating, sum_one_operating,
+                  sum_one_auction):
+    return technology_flows(Qnet_ref, P_oxy, Qfuel, mcaptured_ccs, memitted_ccs, operating_tech, storage_cost,
+                            (sum_celc_operating, sum_heat_operating, sum_cbio_operating, sum_cets_operating, sum_crc_operating, sum_one_operating),
+                            sum_one_auction)
+
+# NPVs and regrets
+@node()
+def npv_ref(reference_all): return reference_all
+@node()
+def npv_amine(reference_before, reference_stranded, operating_amine, CAPEX_amine, capex_discount):
+    return reference_before + reference_stranded + operating_amine - CAPEX_amine * capex_discount
+@node()
+def npv_clc(reference_before, operating_clc, CAPEX_initial_clc, CAPEX_clc, capex_discount_initial, capex_discount):
+    return reference_before + operating_clc - CAPEX_initial_clc * capex_discount_initial - CAPEX_clc * capex_discount
+@node()
+def npv_oxy(reference_before, operating_oxy, CAPEX_oxy, capex_discount):
+    return reference_before + operating_oxy - CAPEX_oxy * capex_discount
+@node()
+def max_npv(npv_ref, npv_amine, npv_clc, npv_oxy): return np.maximum.reduce([npv_ref, npv_amine, npv_clc, npv_oxy])
+@node()
+def regret_ref(max_npv, npv_ref): return max_npv - npv_ref
+@node()
+def regret_amine(max_npv, npv_amine): return max_npv - npv_amine
+@node()
+def regret_clc(max_npv, npv_clc): return max_npv - npv_clc
+@node()
+def regret_oxy(max_npv, npv_oxy): return max_npv - npv_oxy
+@node()
+def regret(decision, regret_ref, regret_amine, regret_clc, regret_oxy):
+    return np.select([decision == name for name in TECHS], [regret_ref, regret_amine, regret_clc, regret_oxy], np.nan)
+
+class Incremental:
+    """
+    Node values of a design (a DataFrame or dict of columns named like the regret_BECCS arguments), computed on
+    demand and kept between evaluations. update() changes input columns and drops their downstream nodes;
+    what_if() evaluates a change without keeping it.
+    """
+    def __init__(self, design=None, graph=GRAPH, **inputs):
+        self.graph = graph
+        self.values = dict(as_inputs(design, **inputs))
+        self.inputs = set(self.values)
+        self.computed = [] # Nodes computed by the last evaluation
+
+    def get(self, name, scratch=None):
+        scratch = {} if scratch is None else scratch
+        if name in self.values:
+            return self.values[name]
+        if name in scratch:
+            return scratch[name]
+        function, dependencies, cache = self.graph.nodes[name]
+        value = function(*[self.get(dependency, scratch) for dependency in dependencies])
+        (self.values if cache else scratch)[name] = value
+        self.computed.append(name)
+        return value
+
+    def outcomes(self, names=OUTCOMES):
+        self.computed = []
+        scratch = {}
+        return {name: self.get(name, scratch) for name in names}
+
+    def update(self, **columns):
+        n = len(self.values["rate"])
+        for name, values in columns.items():
+            if name not in self.inputs:
+                raise KeyError(f"{name} is not an input of the model")
+            self.values[name] = as_inputs({name: np.broadcast_to(values, (n,))})[name]
+            for dependent in self.graph.downstream(name):
+                self.values.pop(dependent, None)
+        return self
+
+    def what_if(self, names=OUTCOMES, **columns):
+        """
+        Outcomes with the given input columns changed; the cached nodes of this design are reused but not changed.
+        """
+        branch = Incremental.__new__(Incremental)
+        branch.graph, branch.values, branch.inputs, branch.computed = self.graph, dict(self.values), self.inputs, []
+        outcomes = branch.update(**columns).outcomes(names)
+        self.computed = branch.computed
+        return outcomes
+
+if __name__ == "__main__":
+    import time
+    from validation import random_design
+
+    design = random_design(500000, seed=1)
+    model = Incremental(design)
+    start = time.perf_counter()
+    model.outcomes()
+    full = time.perf_counter() - start
+    print(f"Full evaluation of {len(design)} experiments: {full:.2f} s, {len(model.computed)} nodes")
+    for name, values in [("crc", design["crc"] * 1.5), ("CEPCI", 900), ("celc", design["celc"] + 10), ("rate", 0.94), ("dr", 0.06)]:
+        start = time.perf_counter()
+        model.what_if(**{name: values})
+        seconds = time.perf_counter() - start
+        print(f"What-if {name:<6} {seconds:6.2f} s ({seconds / full:4.0%} of a full run), {len(model.computed)} nodes recomputed")
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+from batch_model import as_inputs, energy_balances, capex, price_paths, TECHS
+
+# Lever sweep: instead of sampling timing and operating_increase as separate experiments, every scenario is
+# evaluated over the whole timing x operating_increase grid and a vector of capture rates in one call.
+#
+# A technology runs as the reference plant up to year timing+1 and as itself from timing+2 to timing+lifetime-1
+# (a stranded amine plant as the reference plant again), and its yearly cash flow while running is proportional
+# to its operating hours. With cumulative discounted sums of the reference flows, of the technology's flows per
+# operating hour (one per rate) and of the discount factors, the NPV of any timing and operating_increase is a few
+# lookups, so the grid costs about as much as one policy.
+# The outcomes match regret_BECCS_batch up to the summation order (~1e-12 MEUR).
+
+TIMINGS = [5, 10, 15, 20]
+OPERATING_INCREASES = [0, 600, 1200]
+RATES = [0.86, 0.90, 0.94]
+
+def cumulative(values):
+    """
+    Cumulative sum over the last axis with a leading zero, so that element t is the sum over years 1..t.
+    """
+    return np.concatenate([np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)], axis=-1)
+
+def lookup(sums, index):
+    """
+    sums[i, ..., index[i, j]] for sums of shape (n, ..., years+1) and index of shape (n, k), shape (n, ..., k).
+    """
+    index = index.reshape((len(index),) + (1,) * (sums.ndim - 2) + index.shape[1:])
+    return np.take_along_axis(sums, np.broadcast_to(index, sums.shape[:-1] + index.shape[-1:]), axis=-1)
+
+def hourly_flow(x, tech, name, paths):
+    """
+    Cash flow [MEUR] per operating hour of a technology in each year, shape (n, rates, years), for technology values
+    of shape (n, rates) and prices of shape (n or 1, years); cets is the price paid for the CO2 not captured.
+    """
+    cbio, celc, cheat, crc, cets = (paths[price][:, None, :] for price in ["cbio", "celc", "cheat", "crc", "cets"])
+    column = lambda value: np.broadcast_to(np.asarray(value, dtype=float), x["rate"].shape)[:, None, None]
+    value = lambda key: np.asarray(tech[key], dtype=float)[..., None]
+    captured = value("mcaptured") / 1000 * 3600
+    cstore = x["cstore"] * np.where(x["Monostorage"], 4, 1)
+    costs = value("Qfuel") * cbio + captured * column(x["ctrans"]*x["sek"] + cstore) + value("memitted") / 1000 * 3600 * cets
+    if name == "amine":
+        costs = costs + column(x["cmea"] * x["sek"] * 1.5) * captured
+    if name == "clc":
+        costs = costs + 1/1000 * value("Qfuel") * column(x["coc"])
+    revenues = value("Qnet") * (cheat * celc) + value("P") * celc + captured * crc
+    return (revenues - costs) * 10**-6
+
+def sweep_chunk(x, timings, operating_increases, rates, prices):
+    n, n_rates = len(x["rate"]), len(rates)
+    taus = np.broadcast_to(timings, (n, len(timings)))
+    years = np.arange(1, int(taus.max() + x["lifetime"].max()))
+    paths = price_paths(x, years, prices)
+    paths["cets"] = np.where(x["Fossilized"][:, None], paths["cets"], 0.0)
+    discount = (1 + x["dr"][:, None]) ** -years
+    discount_sum = cumulative(discount)
+
+    # Reference plant flows, also run by every technology before it starts
+    ref = {key: np.broadcast_to(value, (n,))[:, None] for key, value in energy_balances(x)["ref"].items()}
+    ref_flow = ((ref["Qnet"] * (paths["cheat"] * paths["celc"]) + ref["P"] * paths["celc"]) * ref["operating"]
+                - ref["Qfuel"] * ref["operating"] * paths["cbio"]
+                - ref["memitted"] / 1000 * 3600 * ref["operating"] * paths["cets"]) * 10**-6
+    ref_sum = cumulative(ref_flow * discount)
+
+    first = taus + 1                                            # Last year as the reference plant
+    last = np.minimum(taus + x["lifetime"][:, None] - 1, len(years))  # Last year of the analysis period
+    before = lookup(ref_sum, first)[:, :, None, None]           # (n, timings, 1, 1)
+    hours = (x["operating"][:, None] + np.asarray(operating_increases))[:, None, :, None]
+
+    # Each scenario repeated once per rate, (n, rates) after reshaping
+    xr = {key: np.repeat(value, n_rates) for key, value in x.items()}
+    xr["rate"] = np.tile(np.asarray(rates, dtype=float), n)
+    techs = capex(xr, energy_balances(xr))
+    shaped = lambda value: np.broadcast_to(np.asarray(value, dtype=float), (n * n_rates,)).reshape(n, n_rates)
+
+    npv_values = {"ref": np.broadcast_to(lookup(ref_sum, last)[:, :, None, None],
+                                         (n, len(timings), len(operating_increases), n_rates))}
+    for name in TECHS[1:]:
+        tech = {key: shaped(techs[name][key]) for key in ["Qfuel", "Qnet", "P", "mcaptured", "memitted", "CAPEX_initial", "CAPEX"]}
+        end = last
+        if name == "amine": # Stranded after 5 years of operation with Toxic, then runs as the reference plant again
+            end = np.where(x["Toxic"][:, None], np.minimum(taus + 6, last), last)
+        after = (lookup(ref_sum, last) - lookup(ref_sum, end))[:, :, None, None]
+        auction_end = np.minimum(taus + 16, end)
+        flow_sum = cumulative(hourly_flow(x, tech, name, paths) * discount[:, None, :])  # (n, rates, years+1)
+        running = lookup(flow_sum, end) - lookup(flow_sum, first)                       # (n, rates, timings)
+        bonus = np.where(x["Auction"], 1.0, 0.0)[:, None, None] * (tech["mcaptured"] / 1000 * 3600 * 160 * 10**-6)[:, :, None] * (
+            lookup(discount_sum, auction_end) - lookup(discount_sum, first))[:, None, :]
+        per_hour = np.moveaxis(running + bonus, 1, 2)[:, :, None, :]                    # (n, timings, 1, rates)
+
+        initial = tech["CAPEX_initial"] / 2 * (discount[:, :1] + discount[:, 1:2])       # (n, rates)
+        investment = tech["CAPEX"][:, None, :] / 2 * (np.take_along_axis(discount, taus - 1, axis=1)
+                                                      + np.take_along_axis(discount, taus, axis=1))[:, :, None]
+        npv_values[name] = before + after + hours * per_hour - (initial[:, None, :] + investment)[:, :, None, :]
+    return npv_values
+
+def lever_sweep(design=None, timings=TIMINGS, operating_increases=OPERATING_INCREASES, rates=RATES, prices=None,
+                chunk_size=10000, **inputs):
+    """
+    NPV and regret of every technology for every scenario of design (a DataFrame or dict of uncertainties named like
+    the regret_BECCS arguments) over the grid of timings x operating_increases x rates.
+
+    Returns {"npv_<tech>": array, "regret_<tech>": array} with arrays of shape
+    (scenarios, len(timings), len(operating_increases), len(rates)); the regret of a technology is against the best
+    technology at the same levers. prices optionally gives per-year price vectors, see batch_model.price_paths.
+    """
+    x = as_inputs(design, **inputs)
+    n = len(x["rate"])
+    prices = {name: np.asarray(value, dtype=float) for name, value in (prices or {}).items()}
+    chunks = [sweep_chunk({name: values[start:start+chunk_size] for name, values in x.items()}, timings,
+                          operating_increases, rates,
+                          {name: value[start:start+chunk_size] if value.ndim == 2 else value for name, value in prices.items()})
+              for start in range(0, n, chunk_size)]
+    npv_values = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in TECHS}
+    max_npv = np.maximum.reduce([npv_values[name] for name in TECHS])
+    results = {f"npv_{name}": npv_values[name] for name in TECHS}
+    results.update({f"regret_{name}": max_npv - npv_values[name] for name in TECHS})
+    return results
+
+def sweep_frame(sweep, timings=TIMINGS, operating_increases=OPERATING_INCREASES, rates=RATES):
+    """
+    The result of lever_sweep as a long DataFrame with one row per scenario and lever combination.
+    """
+    n = len(sweep["npv_ref"])
+    grid = pd.MultiIndex.from_product([range(n), timings, operating_increases, rates],
+                                      names=["scenario", "timing", "operating_increase", "rate"])
+    return pd.DataFrame({name: values.ravel() for name, values in sweep.items()}, index=grid).reset_index()
+
+if __name__ == "__main__":
+    import time
+    from controller import model
+    from designs import sample_design
+
+    scenarios = sample_design(model.uncertainties, 10000, seed=1)
+    start = time.perf_counter()
+    sweep = lever_sweep(scenarios)
+    seconds = time.perf_counter() - start
+    cells = len(scenarios) * len(TIMINGS) * len(OPERATING_INCREASES) * len(RATES)
+    print(f"{len(scenarios) / seconds:.0f} scenarios/s, {cells / seconds:.0f} lever combinations/s")
+
+    # Share of scenarios in which each technology is the best choice, per timing (at 600 h and rate 0.90)
+    best = np.argmax(np.stack([sweep[f"npv_{name}"][:, :, 1, 1] for name in TECHS]), axis=0)
+    print(pd.DataFrame({name: (best == i).mean(axis=0) for i, name in enumerate(TECHS)}, index=pd.Index(TIMINGS, name="timing")))
@@ -101,6 +101,11 @@ def estimate_nominal_cycle(Qnet, P, Qfuel, LHV, psteam, Tsteam, isentropic):
     else:
         raise ValueError("One or more of the variables (msteam, Pestimated, Qfuel, pcond_guess) is not positive.")
 
+# Per-year cash flows (cash_flows=True): array of shape (technology, quantity, year) with the technologies in the
+# order ref, amine, clc, oxy, the quantities below [MEUR] and element t-1 for year t, zero after the analysis period
+CASH_FLOW_YEARS = 50 # Longest analysis period is timing 20 + lifetime 30
+CASH_FLOW_QUANTITIES = ["costs", "revenues", "discounted_net"]
+
 def regret_BECCS( 
     #Uncertainties:
     O2eff = 0.90,        #[-] for CLC
@@ -118,6 +123,7 @@ def regret_BECCS(
     ctrans=600,
     cstore=30,
     crc=100,
+    cets=95,    #EUR/tCO2, EU ETS price (2025, see carbon_prices.py)
     cmea=29,    #SEK/kgmea (Ramboll)
     coc=500,    #EUR/tOC Magnus/Felicia
 
@@ -136,11 +142,11 @@ def regret_BECCS(
     Bioshortage = False,  # True if biomass price increases by 15% per year
     Powersurge = False,   # True if electricity price increases by 20% per year
     Auction = False,      # True if additional revenue from CRC is added
-    Integration = False,  # True if the option to sell CRCs at the fossil ETS price is added
-    Fossilized = False,   # True if CO2 emissions require purchased ETS allowances
-    Toxic = False,        # True if the amine capture unit becomes stranded after 5 years
-    Experimental = False, # True if chemical-looping CAPEX is multiplied by 4
-    Hydrogen = False,     # True if air separation units have zero costs
+    Integration = False,  # True if the option to sell CRCs at the fossil ETS price is added (the higher of crc and cets)
+    Fossilized = False,   # True if CO2 emissions require purchased ETS allowances (at cets, for the CO2 not captured)
+    Toxic = False,        # True if the amine capture unit becomes stranded after 5 years (then runs as the reference plant)
+    Experimental = False, # True if chemical-looping CAPEX is multiplied by 4 (CAPEX_initial and CAPEX)
+    Hydrogen = False,     # True if air separation units have zero costs (CAPEX, the ASU power is unchanged)
     Monostorage = False,   # True if storage prices are multiplied by 4
 
     #Levers:
@@ -149,13 +155,16 @@ def regret_BECCS(
     operating_increase = 600, # [0, 600, 1200],
     timing = 10, # [5, 10, 15, 20] represents when C&L+amines+ASUs are built, and T&S are paid for, and revenues gained!
 
+    # Plant (defaults are the Malmö CHP, other plants in plants.csv):
+    LHV = 10.44,    #[MJ/kg] fuel
+    Qfuel = 174.5,  #[MW] fuel input
+    Pnet = 48.3,    #[MW] net power
+    Qfgc = 33.3,    #[MW] flue gas condensation heat
+    Qcond = 106.6,  #[MW] condenser heat
+
+    cash_flows = False, # True adds the per-year "cash_flows" outcome, see CASH_FLOW_YEARS
 ):
     Invasion = False
-    LHV = 10.44
-    Qfuel = 174.5
-    Pnet = 48.3
-    Qfgc = 33.3
-    Qcond = 106.6
     Qnet = Qcond + Qfgc
 
     mfuel = Qfuel/LHV           #[kgf/s]
@@ -225,6 +234,11 @@ def regret_BECCS(
     #     print("Energy balances do not sum to 0, Ramboll's study is strange?")
 
     ### -------------- NEW SECTION ON COSTS AND NPV ------------- ###
+    if Monostorage:
+        cstore *= 4
+    if Integration:
+        crc = max(crc, cets)
+
     # Calculating CAPEX per item [MEUR]:
     REF.shopping_list = {
     }
@@ -246,6 +260,10 @@ def regret_BECCS(
         'interim' : (53000+2400*(4000)**0.6 )*10**-6 *usd * CEPCI/499.6 *1.2,  
     }
 
+    if Hydrogen:
+        CLC.shopping_list['ASU'] = 0
+        OXY.shopping_list['ASU'] = 0
+
     # Escalating CAPEX
     REF.CAPEX = 0
     AMINE.CAPEX = sum(AMINE.shopping_list.values())
@@ -262,6 +280,9 @@ def regret_BECCS(
         CAPEX.append(TCR)
     CLC.CAPEX_initial = CAPEX[0]
     CLC.CAPEX = CAPEX[1]
+    if Experimental:
+        CLC.CAPEX_initial *= 4
+        CLC.CAPEX *= 4
 
     BEC =  sum(OXY.shopping_list.values())
     EPCC = BEC*(1 + EPC)
@@ -307,7 +328,7 @@ def regret_BECCS(
 
     #     return NPV
     
-    def calculate_NPV(TECH, cbio, celc):
+    def calculate_NPV(TECH, cbio, celc, flows=None):
         analysis_period = timing + lifetime  # Example: invest after 5, lifetime of 25 => 30 years
 
         invested = False
@@ -331,13 +352,16 @@ def regret_BECCS(
                 costs += TECH.CAPEX / 2  # [MEUR]
 
             # Adding OPEX and revenues
-            if t > timing + 1 and invested and not Invasion:
+            stranded = Toxic and TECH.name == "amine" and t > timing + 6 # After 5 years of operation
+            if t > timing + 1 and invested and not Invasion and not stranded:
 
                 # Calculate operational costs and revenues
                 costs += TECH.Qfuel * TECH.operating * cbio * 10**-6  # Biomass fuel costs
                 revenues += (TECH.Qnet * (cheat * celc) + TECH.P * celc) * TECH.operating * 10**-6  # Revenue from CHP
 
                 costs += TECH.mcaptured / 1000 * 3600 * TECH.operating * (ctrans*sek + cstore) * 10**-6  # Capture and storage costs
+                if Fossilized:
+                    costs += TECH.memitted / 1000 * 3600 * TECH.operating * cets * 10**-6  # ETS allowances for the CO2 not captured
                 if Auction and t < timing+15+2: #Add two years for the capital delay before operations
                     revenues += TECH.mcaptured / 1000 * 3600 * TECH.operating * (crc+160) * 10**-6  # Revenue from CO2 capture credits
                 else:
@@ -350,10 +374,14 @@ def regret_BECCS(
 
             else:
                 costs += REF.Qfuel * REF.operating * cbio * 10**-6  # Reference fuel costs
+                if Fossilized:
+                    costs += REF.memitted / 1000 * 3600 * REF.operating * cets * 10**-6
                 revenues += (REF.Qnet * (cheat * celc) + REF.P * celc) * REF.operating * 10**-6  # Reference revenue
 
             # Add to NPV calculation
             NPV += (revenues - costs) / (1 + dr) ** t
+            if flows is not None:
+                flows[:, t-1] = costs, revenues, (revenues - costs) / (1 + dr) ** t
 
         return NPV
 
@@ -363,12 +391,13 @@ def regret_BECCS(
         return regret
 
     TECHS = [REF, AMINE, CLC, OXY]
+    flows = np.zeros((len(TECHS), len(CASH_FLOW_QUANTITIES), CASH_FLOW_YEARS)) if cash_flows else [None] * len(TECHS)
     npv_values = {}
-    for tech in TECHS:
+    for tech, tech_flows in zip(TECHS, flows):
         # Reset cbio and celc before each call to calculate_NPV
         initial_cbio = cbio
         initial_celc = celc
-        npv_values[tech.name] = calculate_NPV(tech, initial_cbio, initial_celc)
+        npv_values[tech.name] = calculate_NPV(tech, initial_cbio, initial_celc, tech_flows)
 
     regret_values = {tech.name: calculate_regret(tech.name, npv_values) for tech in TECHS}
 
@@ -384,6 +413,8 @@ def regret_BECCS(
         "npv_oxy": npv_values["oxy"],     
         "npv_clc": npv_values["clc"],     
     }
+    if cash_flows:
+        results["cash_flows"] = flows.astype(np.float32)
 
     return results
 
@@ -0,0 +1,261 @@
+import os
+import sys
+import glob
+import json
+import time
+import atexit
+import threading
+import multiprocessing.util
+
+# Opt-in per-stage timers and counters for the model and the experiment runner.
+#
+#   import profiling
+#   profiling.enable("profile")     # before the evaluator starts its worker processes
+#   profiling.instrument(model)     # times every call of the model function as a stage
+#   ... run experiments ...
+#   stats = profiling.collect("profile")
+#   profiling.write_report(stats, "profile.json")
+#   profiling.write_folded(stats, "profile.folded")   # flamegraph.pl profile.folded > profile.svg, or speedscope
+#
+# Stages nest: a stage opened inside another one is recorded under its path, e.g. "dispatch;regret_BECCS". The model
+# itself is not instrumented; instrument() wraps its function at the boundary the evaluator calls.
+# When disabled, stage() returns a shared no-op object, which costs well under a microsecond per model call.
+# Every process (including ema_workbench's pool workers, forked or spawned) writes its own profile-<pid>.json
+# into the profile directory, periodically and at exit; collect() sums them.
+
+ENV = "BECCS_PROFILE"
+DUMP_INTERVAL = 5.0 # [s] between periodic dumps of a process's statistics
+
+_enabled = False
+_directory = None
+_stats = {}     # stage path (tuple) -> [calls, seconds]
+_counters = {}  # name -> count
+_local = threading.local()
+_last_dump = 0.0
+_started = 0.0
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+def _record(path, seconds):
+    stats = _stats.get(path)
+    if stats is None:
+        stats = _stats[path] = [0, 0.0]
+    stats[0] += 1
+    stats[1] += seconds
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        _stack().append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = _stack()
+        _record(tuple(stack), elapsed)
+        stack.pop()
+        return False
+
+class _Disabled:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_DISABLED = _Disabled()
+
+def stage(name):
+    """
+    Context manager timing the enclosed block as stage name.
+    """
+    return _Stage(name) if _enabled else _DISABLED
+
+class StagedFunction:
+    """
+    Model function wrapper that times each call as a stage named after the function, and dumps the statistics of
+    its (worker) process every DUMP_INTERVAL seconds.
+    """
+    def __init__(self, function, name=None):
+        self.function = function
+        self.name = name or function.__name__
+
+    def __call__(self, **kwargs):
+        if not _enabled:
+            return self.function(**kwargs)
+        with _Stage(self.name):
+            result = self.function(**kwargs)
+        if time.perf_counter() - _last_dump > DUMP_INTERVAL:
+            dump()
+        return result
+
+def instrument(model, name=None):
+    """
+    Wraps the function of an ema_workbench Model in a StagedFunction and returns the model. Must be called before
+    the evaluator pickles the model into its worker processes.
+    """
+    if not isinstance(model.function, StagedFunction):
+        model.function = StagedFunction(model.function, name)
+    return model
+
+def count(name, n=1):
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+def _reset():
+    global _last_dump, _started
+    _stats.clear()
+    _counters.clear()
+    _local.stack = []
+    _last_dump = _started = time.perf_counter()
+
+def _start_process():
+    """
+    Starts profiling in this process from the environment, so that it is inherited by spawned workers too.
+    """
+    global _enabled, _directory
+    _enabled = True
+    _directory = os.environ[ENV]
+    _reset()
+    # Pool workers leave through multiprocessing's exit handlers, not atexit
+    multiprocessing.util.Finalize(None, dump, exitpriority=100)
+
+def enable(directory="profile"):
+    """
+    Enables profiling in this process and in the worker processes started from it afterwards. Removes profiles
+    of earlier runs from directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "profile-*.json")):
+        os.remove(path)
+    os.environ[ENV] = os.path.abspath(directory)
+    _start_process()
+    atexit.register(dump)
+
+def disable():
+    global _enabled
+    if _enabled:
+        dump()
+    _enabled = False
+    os.environ.pop(ENV, None)
+
+def dump():
+    """
+    Writes this process's statistics to profile-<pid>.json in the profile directory.
+    """
+    global _last_dump
+    if not _enabled:
+        return
+    _last_dump = time.perf_counter()
+    profile = {
+        "pid": os.getpid(),
+        "wall": _last_dump - _started,
+        "stages": [[";".join(path), calls, seconds] for path, (calls, seconds) in list(_stats.items())],
+        "counters": dict(_counters),
+    }
+    path = os.path.join(_directory, f"profile-{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(profile, f)
+    os.replace(path + ".tmp", path)
+
+def collect(directory="profile"):
+    """
+    Dumps this process's statistics and sums those of all processes in directory.
+    Returns {"processes", "wall", "stages": {path: [calls, seconds]}, "counters"}.
+    """
+    dump()
+    total = {"processes": 0, "wall": 0.0, "stages": {}, "counters": {}}
+    for path in sorted(glob.glob(os.path.join(directory, "profile-*.json"))):
+        with open(path) as f:
+            profile = json.load(f)
+        total["processes"] += 1
+        total["wall"] = max(total["wall"], profile["wall"])
+        for name, calls, seconds in profile["stages"]:
+            stats = total["stages"].setdefault(name, [0, 0.0])
+            stats[0] += calls
+            stats[1] += seconds
+        for name, n in profile["counters"].items():
+            total["counters"][name] = total["counters"].get(name, 0) + n
+    return total
+
+def self_times(stages):
+    """
+    Time spent in each stage outside of its sub-stages.
+    """
+    own = {name: seconds for name, (calls, seconds) in stages.items()}
+    for name, (calls, seconds) in stages.items():
+        parent = name.rpartition(";")[0]
+        if parent in own:
+            own[parent] -= seconds
+    return own
+
+def report(stats):
+    """
+    Per-stage calls, total and self time, mean time per call and share of the summed top-level time.
+    """
+    own = self_times(stats["stages"])
+    top = sum(seconds for name, (calls, seconds) in stats["stages"].items() if ";" not in name) or 1.0
+    stages = [{
+        "stage": name,
+        "calls": calls,
+        "total_s": seconds,
+        "self_s": own[name],
+        "mean_us": seconds / calls * 1e6,
+        "share": seconds / top,
+    } for name, (calls, seconds) in sorted(stats["stages"].items())]
+    return {"processes": stats["processes"], "wall_s": stats["wall"], "stages": stages, "counters": stats["counters"]}
+
+def write_report(stats, path="profile.json"):
+    with open(path, "w") as f:
+        json.dump(report(stats), f, indent=2)
+
+def write_folded(stats, path="profile.folded"):
+    """
+    Folded stacks ("a;b;c <self microseconds>" per line) for flamegraph.pl, speedscope or inferno.
+    """
+    with open(path, "w") as f:
+        for name, seconds in sorted(self_times(stats["stages"]).items()):
+            if seconds > 0:
+                f.write(f"{name} {round(seconds * 1e6)}\n")
+
+def print_report(stats):
+    table = report(stats)
+    print(f"{table['processes']} process(es), {table['wall_s']:.1f}s wall")
+    print(f"{'Stage':<48}{'calls':>10}{'total':>11}{'self':>11}{'mean':>12}{'share':>8}")
+    for row in table["stages"]:
+        name = "  " * row["stage"].count(";") + row["stage"].rpartition(";")[2]
+        print(f"{name:<48}{row['calls']:>10}{row['total_s']:>10.3f}s{row['self_s']:>10.3f}s{row['mean_us']:>10.1f}us{row['share']:>8.1%}")
+    for name, n in sorted(table["counters"].items()):
+        print(f"{name:<48}{n:>10}")
+
+class _AfterFork:
+    pass
+
+_after_fork = _AfterFork()
+
+if os.environ.get(ENV):
+    _start_process()
+# Forked workers start from zero. multiprocessing clears the finalizers of a forked process before it runs its
+# after-fork hooks, so the exit dump has to be registered from one of those.
+os.register_at_fork(after_in_child=lambda: _reset() if _enabled else None)
+multiprocessing.util.register_after_fork(_after_fork, lambda _: _start_process() if _enabled else None)
+
+if __name__ == "__main__":
+    # python profiling.py [directory]: summarize the profiles of a run into profile.json and profile.folded
+    directory = sys.argv[1] if len(sys.argv) > 1 else "profile"
+    stats = collect(directory)
+    write_report(stats)
+    write_folded(stats)
+    print_report(stats)
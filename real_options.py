@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from batch_model import as_inputs, energy_balances, capex, price_paths
+from stochastic_prices import simulate_paths, STOCHASTIC_PRICES, PRICE_PROCESSES, CORRELATION
+
+# Real-options value of deferring the capture investment. Instead of committing to a timing up front, the plant
+# runs as the reference plant and decides every year whether to invest now or wait, after seeing the electricity,
+# biomass and CRC prices of that year. The optimal exercise policy is found by least-squares Monte Carlo
+# (Longstaff & Schwartz 2001) on simulated price paths, with all scenarios of a block evaluated as arrays.
+#
+# The exercise value of investing in year tau is the discounted change in cash flows against staying the reference
+# plant, i.e. npv_<tech> - npv_ref of regret_BECCS with timing=tau along that price path. The CLC boiler
+# (CAPEX_initial) is built in years 1-2 whatever the timing, so the CLC route pays for it even if it never invests.
+#
+# The price paths are shared by all scenarios (common random numbers), as relative deviations from each scenario's
+# prices, so the regression basis is the same for all scenarios and one pseudo-inverse per year serves them all.
+# The exercise policy is fitted on one set of paths and valued on an independent one: fitting and valuing on the
+# same paths lets the regression see the future and biases the option value upward, whereas an out-of-sample
+# policy is at worst suboptimal, so the flexible values are (up to Monte Carlo error) a lower bound.
+#
+# The flexible policy is compared with committing up front to the best of the same decision years, or to never
+# investing, so that the value of waiting is zero without price uncertainty.
+
+OPTION_TECHS = ["amine", "clc", "oxy"]
+
+def yearly_gain(x, techs, name, prices):
+    """
+    Change in the yearly cash flow [MEUR] of running technology name instead of the reference plant, for prices
+    {celc, cbio, crc, cets} of shape (n, paths, years), excluding CAPEX and the Auction bonus. cets is the price
+    paid for the CO2 not captured (zero unless Fossilized).
+    """
+    tech, ref = techs[name], techs["ref"]
+    column = lambda value: np.broadcast_to(np.asarray(value, dtype=float), x["rate"].shape)[:, None, None]
+    cheat = x["cheat"][:, None, None]
+    elc = ((column(tech["Qnet"]) * cheat + column(tech["P"])) * column(tech["operating"])
+           - (column(ref["Qnet"]) * cheat + column(ref["P"])) * column(ref["operating"]))
+    bio = column(tech["Qfuel"]) * column(tech["operating"]) - column(ref["Qfuel"]) * column(ref["operating"])
+    captured = column(tech["mcaptured"]) / 1000 * 3600 * column(tech["operating"])
+    other = captured * column(x["ctrans"]*x["sek"] + x["cstore"] * np.where(x["Monostorage"], 4, 1))
+    other = other + (column(tech["memitted"]) * column(tech["operating"])
+                     - column(ref["memitted"]) * column(ref["operating"])) / 1000 * 3600 * prices["cets"]
+    if name == "amine":
+        other = other + column(x["cmea"] * x["sek"] * 1.5) * captured
+    if name == "clc":
+        other = other + 1/1000 * column(tech["Qfuel"]) * column(tech["operating"]) * column(x["coc"])
+    return (elc * prices["celc"] - bio * prices["cbio"] + captured * prices["crc"] - other) * 10**-6
+
+def exercise_values(x, techs, name, prices, taus, years):
+    """
+    Discounted value at year 0 of investing in year tau, against never investing, shape (n, paths, len(taus)).
+    """
+    discount = (1 + x["dr"][:, None]) ** -years                          # (n, years)
+    gains = yearly_gain(x, techs, name, prices) * discount[:, None, :]
+    cumulative = np.concatenate([np.zeros(gains.shape[:2] + (1,)), np.cumsum(gains, axis=2)], axis=2)
+    cumulative_discount = np.concatenate([np.zeros((len(discount), 1)), np.cumsum(discount, axis=1)], axis=1)
+
+    # Operations in years tau+2 .. tau+lifetime-1, as in regret_BECCS
+    first = taus[None, :] + 1
+    last = np.minimum(taus[None, :] + x["lifetime"][:, None] - 1, len(years))
+    if name == "amine": # Stranded after 5 years of operation with Toxic, then runs as the reference plant again
+        last = np.where(x["Toxic"][:, None], np.minimum(taus[None, :] + 6, last), last)
+    values = (np.take_along_axis(cumulative, np.broadcast_to(last[:, None, :], gains.shape[:2] + last.shape[1:]), axis=2)
+              - np.take_along_axis(cumulative, np.broadcast_to(first[:, None, :], gains.shape[:2] + first.shape[1:]), axis=2))
+
+    tech = techs[name]
+    mcaptured = np.broadcast_to(np.asarray(tech["mcaptured"], dtype=float), x["rate"].shape)
+    auction_end = np.minimum(taus[None, :] + 16, last)
+    bonus = np.where(x["Auction"], mcaptured / 1000 * 3600 * tech["operating"] * 160 * 10**-6, 0.0)[:, None] * (
+        np.take_along_axis(cumulative_discount, auction_end, axis=1) - np.take_along_axis(cumulative_discount, first, axis=1))
+    capex_paid = np.asarray(tech["CAPEX"])[:, None] / 2 * (discount[:, taus - 1] + discount[:, taus])
+    initial = np.broadcast_to(np.asarray(tech["CAPEX_initial"], dtype=float), x["rate"].shape) / 2 * (discount[:, 0] + discount[:, 1])
+    return values + (bonus - capex_paid - initial[:, None])[:, None, :]
+
+def basis(state):
+    """
+    Regression basis of the continuation and exercise values: 1, the relative prices, their squares and products.
+    """
+    columns = [np.ones(len(state))] + [state[:, i] for i in range(state.shape[1])]
+    columns += [state[:, i] * state[:, j] for i in range(state.shape[1]) for j in range(i, state.shape[1])]
+    return np.column_stack(columns)
+
+def real_options(design, n_paths=200, decision_years=range(1, 21), process="ou", params=PRICE_PROCESSES,
+                 correlation=CORRELATION, antithetic=True, seed=0, block_size=250):
+    """
+    Value of investing flexibly (invest in the first year where investing beats waiting) versus committing up
+    front to the best of decision_years or to never investing, for AMINE, CLC and OXY in every scenario of design
+    (a DataFrame of uncertainties, optionally with the rate and operating_increase levers).
+
+    Returns a DataFrame with, per technology, committed_<tech> (best fixed-timing NPV gain against the reference
+    plant [MEUR]), flexible_<tech> (the same under the exercise policy fitted on n_paths independent paths),
+    deferral_<tech> (their difference, the value of waiting) and invest_<tech> (share of paths that invest by the
+    last decision year).
+    """
+    taus = np.asarray(list(decision_years))
+    if taus.min() < 1 or (taus + 1).max() > 20 + 30:
+        raise ValueError("decision years must lie between 1 and 49")
+    n_years = 50
+    years = np.arange(1, n_years + 1)
+    rng = np.random.default_rng(seed)
+    fitting, valuation = [simulate_paths(dict.fromkeys(STOCHASTIC_PRICES, 1.0), n_paths, n_years, process, params,
+                                         correlation, antithetic, rng) for _ in range(2)]
+    regressions = []
+    for tau in taus: # Least squares on the fitting paths, applied to the valuation paths: Y @ pinv(X).T @ X_valuation.T
+        state = lambda relative: basis(np.column_stack([relative[name][:, tau - 1] for name in STOCHASTIC_PRICES]))
+        X = state(fitting)
+        regressions.append((np.linalg.pinv(X).T, X.T, state(valuation).T))
+
+    results = []
+    for first in range(0, len(design), block_size):
+        x = as_inputs(design.iloc[first:first + block_size])
+        techs = capex(x, energy_balances(x))
+        escalated = price_paths(x, years)
+        def path_prices(relative):
+            prices = {name: escalated[name][:, None, :] * relative[name][None, :, :] for name in ["celc", "cbio"]}
+            crc = x["crc"][:, None, None] * relative["crc"][None, :, :]
+            prices["crc"] = np.where(x["Integration"][:, None, None], np.maximum(crc, escalated["cets"][:, None, :]), crc)
+            prices["cets"] = np.where(x["Fossilized"][:, None], escalated["cets"], 0.0)[:, None, :]
+            return prices
+        fitting_prices, valuation_prices = path_prices(fitting), path_prices(valuation)
+
+        block = {}
+        for name in OPTION_TECHS:
+            fitted = exercise_values(x, techs, name, fitting_prices, taus, years)  # (n, paths, taus)
+            values = exercise_values(x, techs, name, valuation_prices, taus, years)
+            # Never investing still pays for the CLC boiler
+            never = -np.broadcast_to(np.asarray(techs[name]["CAPEX_initial"], dtype=float), x["rate"].shape) / 2 * (
+                (1 + x["dr"])**-1 + (1 + x["dr"])**-2)
+            # Value of the policy from the next year on, on the fitting and on the valuation paths
+            realized_fitting = np.repeat(never[:, None], n_paths, axis=1)
+            realized = realized_fitting.copy()
+            invested = np.zeros(values.shape[:2], dtype=bool)
+            for i in range(len(taus) - 1, -1, -1):
+                pinv, X, X_valuation = regressions[i]
+                exercise_coefficients, continuation_coefficients = fitted[:, :, i] @ pinv, realized_fitting @ pinv
+                worth = lambda X: ((exercise_coefficients @ X > continuation_coefficients @ X)
+                                   & (exercise_coefficients @ X > never[:, None]))
+                realized_fitting = np.where(worth(X), fitted[:, :, i], realized_fitting)
+                invest = worth(X_valuation)
+                realized = np.where(invest, values[:, :, i], realized)
+                invested |= invest
+
+            block[f"committed_{name}"] = np.maximum(values.mean(axis=1).max(axis=1), never)
+            block[f"flexible_{name}"] = realized.mean(axis=1)
+            block[f"deferral_{name}"] = block[f"flexible_{name}"] - block[f"committed_{name}"]
+            block[f"invest_{name}"] = invested.mean(axis=1)
+        results.append(pd.DataFrame(block))
+    return pd.concat(results, ignore_index=True)
+
+if __name__ == "__main__":
+    import time
+    from controller import model
+    from designs import sample_design
+
+    scenarios = sample_design(model.uncertainties, 1000, seed=1)
+    start = time.perf_counter()
+    options = real_options(scenarios)
+    print(f"{len(scenarios) / (time.perf_counter() - start):.0f} scenarios/s")
+    print(options.describe().T[["mean", "50%", "min", "max"]])
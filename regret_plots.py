@@ -0,0 +1,197 @@
+import re
+import argparse
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from analysis import load_results, add_perturbation, stack_subsets, bin_by_subset, zero_regret_density
+
+# The standard regret figures, previously parallel_ref.py, parallel_clc.py and parallel_amine.py.
+# "box" selects the highlighted scenarios (e.g. our SD findings), "other" the scenarios they are compared to
+# (None means all remaining scenarios). A discrete x (timing) is jittered, a continuous x (crc) is binned for the density.
+PRESETS = {
+    "ref": dict(
+        tech="ref", x="crc", box=["Auction==True"], other=["Auction==False"],
+        box_label="Auction=True", other_label="Auction=False", box_color="deepskyblue",
+        sample_fraction=0.005, alpha=0.5, num_bins=10, density_ylim=None, box_on_top=False,
+        title="regret_ref+density vs CRC price", legend_loc="upper right", density_legend_loc="upper center",
+        output="regret_ref.png",
+    ),
+    "clc": dict(
+        tech="clc", x="crc", box=["timing>17.5"], other=["Auction==False"],
+        box_label="Delay>17.5 years", other_label="Auction=False", box_color="mediumseagreen",
+        sample_fraction=0.05, alpha=0.35, num_bins=8, density_ylim=1.0, box_on_top=True,
+        title="regret_clc+density vs CRC price", legend_loc="upper left", density_legend_loc="upper center",
+        output="regret_clc.png",
+    ),
+    "amine": dict(
+        tech="amine", x="timing", box=["cAM<1.381", "dr>0.078"], other=None,
+        box_label="Scenarios of DR>7.8% and low CAPEX", other_label="Remaining scenarios", box_color="deepskyblue",
+        sample_fraction=0.05, alpha=0.15, num_bins=None, density_ylim=0.4, box_on_top=False,
+        density_labels=["Density (blue scenarios)", "Density (red scenarios)"],
+        title="regret_amine vs timing with perturbation", legend_loc="upper left", density_legend_loc="upper right",
+        output="regret_amine.png",
+    ),
+}
+
+DEFAULTS = dict(
+    box=[], other=None, box_label="Box scenarios", other_label="Remaining scenarios", box_color="deepskyblue",
+    sample_fraction=0.05, alpha=0.35, num_bins=10, density_ylim=None, box_on_top=True, density_labels=None, title=None,
+    legend_loc="upper left", density_legend_loc="upper right", output=None,
+)
+
+CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(.+?)\s*$")
+OPERATORS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater,
+    ">=": np.greater_equal, "==": np.equal, "!=": np.not_equal,
+}
+
+def parse_condition(condition):
+    """
+    Parses a condition such as "cAM<1.381" or "Auction==True" into (column, operator, value).
+    """
+    match = CONDITION.match(condition)
+    if match is None:
+        raise ValueError(f"Cannot parse condition: {condition}")
+    column, operator, value = match.groups()
+    if value in ("True", "False"):
+        value = value == "True"
+    else:
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    return column, operator, value
+
+def condition_columns(conditions):
+    return [parse_condition(condition)[0] for condition in conditions or []]
+
+def select(df, conditions):
+    """
+    Returns the boolean mask of rows satisfying all conditions.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, operator, value in map(parse_condition, conditions):
+        mask &= OPERATORS[operator](df[column].to_numpy(), value)
+    return mask
+
+def required_columns(spec):
+    """
+    Returns the (experiment, outcome) columns a figure needs, so that only those are loaded.
+    """
+    experiment_columns = [spec["x"]] + condition_columns(spec["box"]) + condition_columns(spec["other"])
+    return list(dict.fromkeys(experiment_columns)), [f"regret_{spec['tech']}"]
+
+def plot_regret(df, spec):
+    """
+    Scatter of regret_<tech> vs x for the box and other scenarios, with the density of regret = 0 on a secondary axis.
+    """
+    outcome = f"regret_{spec['tech']}"
+    x = spec["x"]
+
+    # Sample some data for faster plotting
+    if spec["sample_fraction"] < 1:
+        df = df.loc[df.sample(frac=spec["sample_fraction"], random_state=42).index]
+
+    in_box = select(df, spec["box"])
+    in_other = ~in_box if spec["other"] is None else select(df, spec["other"])
+    labels = [spec["box_label"], spec["other_label"]]
+    df_stacked = stack_subsets(df, {labels[0]: in_box, labels[1]: in_other})
+
+    fig, ax1 = plt.subplots(figsize=(7, 6))
+    discrete = spec["num_bins"] is None
+    layers = [(labels[1], "crimson", 'right'), (labels[0], spec["box_color"], 'left')]
+    for label, color, direction in (layers if spec["box_on_top"] else layers[::-1]):
+        subset = df_stacked[df_stacked["subset"] == label]
+        positions = add_perturbation(subset, outcome, direction=direction, x=x) if discrete else subset[x]
+        ax1.scatter(positions, subset[outcome], color=color, alpha=spec["alpha"], label=label)
+
+    ax1.set_xlabel(x)
+    ax1.set_ylabel(outcome, color="black")
+    ax1.tick_params(axis="y", labelcolor="black")
+    ax1.set_title(spec["title"] or f"{outcome}+density vs {x}")
+    ax1.legend(loc=spec["legend_loc"])
+
+    # Create secondary y-axis for the density of regret = 0, for every (subset, x value or bin) pair at once
+    if discrete:
+        density = zero_regret_density(df_stacked, outcome, by=x, subset="subset")
+        centers = pd.DataFrame([density.columns.to_numpy()] * len(density), index=density.index)
+    else:
+        df_stacked["bin"], centers = bin_by_subset(df_stacked[x], df_stacked["subset"], spec["num_bins"])
+        density = zero_regret_density(df_stacked, outcome, by="bin", subset="subset").reindex(columns=range(spec["num_bins"]))
+
+    ax2 = ax1.twinx()
+    density_labels = spec.get("density_labels") or [f"Density ({label})" for label in labels]
+    density_legend_handles = []
+    for label, density_label, line in [(labels[0], density_labels[0], "-"), (labels[1], density_labels[1], "--")]:
+        if label not in density.index:
+            continue
+        line_handle, = ax2.plot(centers.loc[label], density.loc[label], color="black", linestyle=line, marker="o", label=density_label)
+        density_legend_handles.append(line_handle)
+
+    ax2.set_ylabel(f"Density of {outcome} = 0", color="black")
+    ax2.tick_params(axis="y", labelcolor="black")
+    if spec["density_ylim"] is not None:
+        bottom, top = ax2.get_ylim()
+        ax2.set_ylim(bottom, spec["density_ylim"]) # Hard-coding a ylim for density
+    ax2.legend(handles=density_legend_handles, loc=spec["density_legend_loc"])
+
+    ax1.grid(True, linestyle="--", alpha=0.5)
+    return fig
+
+def plot_figures(specs, experiments_path="experiments.csv", outcomes_path="outcomes.csv", dpi=450):
+    """
+    Plots several figures from one projected load: the union of their columns is read once.
+    """
+    experiment_columns, outcome_columns = [], []
+    for spec in specs:
+        e_cols, o_cols = required_columns(spec)
+        experiment_columns += e_cols
+        outcome_columns += o_cols
+    df = load_results(list(dict.fromkeys(experiment_columns)), list(dict.fromkeys(outcome_columns)), experiments_path, outcomes_path)
+
+    figures = []
+    for spec in specs:
+        fig = plot_regret(df, spec)
+        if spec["output"]:
+            fig.savefig(spec["output"], dpi=dpi)
+        figures.append(fig)
+    return figures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plot regret vs a variable, with the density of zero regret inside/outside an SD box.")
+    parser.add_argument("--figure", nargs="+", choices=sorted(PRESETS), help="Standard figure(s) to produce; other options override the preset")
+    parser.add_argument("--tech", choices=["ref", "amine", "oxy", "clc"], help="Technology whose regret is plotted")
+    parser.add_argument("--x", help="Experiment column on the x-axis, e.g. crc or timing")
+    parser.add_argument("--box", nargs="+", help='Conditions of the SD box, e.g. "cAM<1.381" "dr>0.078"')
+    parser.add_argument("--other", nargs="+", help="Conditions of the comparison scenarios (default: outside the box)")
+    parser.add_argument("--bins", type=int, help="Number of bins for a continuous x; 0 treats x as discrete")
+    parser.add_argument("--sample", type=float, help="Fraction of experiments to plot")
+    parser.add_argument("--output", help="Output path of the figure")
+    parser.add_argument("--experiments", default="experiments.csv")
+    parser.add_argument("--outcomes", default="outcomes.csv")
+    parser.add_argument("--dpi", type=int, default=450)
+    parser.add_argument("--show", action="store_true")
+    args = parser.parse_args(argv)
+
+    overrides = {
+        "tech": args.tech, "x": args.x, "box": args.box, "other": args.other, "output": args.output,
+        "sample_fraction": args.sample, "num_bins": None if args.bins == 0 else args.bins,
+    }
+    overrides = {key: value for key, value in overrides.items() if value is not None or (key == "num_bins" and args.bins == 0)}
+
+    if args.figure:
+        specs = [{**PRESETS[name], **overrides} for name in args.figure]
+        if args.output and len(specs) > 1:
+            parser.error("--output can only be used with a single figure")
+    else:
+        if not (args.tech and args.x and args.box):
+            parser.error("either --figure or all of --tech, --x and --box are required")
+        specs = [{**DEFAULTS, **overrides}]
+        specs[0]["output"] = specs[0]["output"] or f"regret_{args.tech}_{args.x}.png"
+
+    plot_figures(specs, args.experiments, args.outcomes, dpi=args.dpi)
+    if args.show:
+        plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import matplotlib
+matplotlib.use("Agg")  # Headless: must be set before pyplot is imported anywhere in this process or its workers
+
+import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import matplotlib.pyplot as plt
+
+# Renders all standard figures from the stored results (experiments.csv, outcomes.csv, sobol_stats.csv)
+# in a process pool. A figure is skipped when its inputs, its settings (including the resolved plot spec), the
+# plotting code and its output are unchanged since the last render, as recorded in the manifest next to the figures.
+
+MANIFEST = ".report_manifest.json"
+
+# name: (renderer, settings, input files, output file)
+FIGURES = {
+    "regret_ref": ("regret", {"preset": "ref"}, ["experiments.csv", "outcomes.csv"], "regret_ref.png"),
+    "regret_clc": ("regret", {"preset": "clc"}, ["experiments.csv", "outcomes.csv"], "regret_clc.png"),
+    "regret_amine": ("regret", {"preset": "amine"}, ["experiments.csv", "outcomes.csv"], "regret_amine.png"),
+    "decisions": ("decisions", {}, ["experiments.csv", "outcomes.csv"], "decisions.png"),
+    "sobol": ("sobol", {}, ["sobol_stats.csv"], "sobol_stats.png"),
+}
+
+def render_regret(inputs, settings):
+    from regret_plots import PRESETS, plot_regret, required_columns
+    from analysis import load_results
+
+    spec = PRESETS[settings["preset"]]
+    experiment_columns, outcome_columns = required_columns(spec)
+    return plot_regret(load_results(experiment_columns, outcome_columns, *inputs), spec)
+
+def render_decisions(inputs, settings):
+    from analysis import load_results, plot_decision_boxplots, BOXPLOT_EXPERIMENT_COLUMNS, BOXPLOT_OUTCOME_COLUMNS
+
+    df = load_results(BOXPLOT_EXPERIMENT_COLUMNS, BOXPLOT_OUTCOME_COLUMNS, *inputs)
+    return plot_decision_boxplots(df[BOXPLOT_EXPERIMENT_COLUMNS], df[BOXPLOT_OUTCOME_COLUMNS])
+
+def render_sobol(inputs, settings):
+    from analysis import plot_sobol_indices
+
+    return plot_sobol_indices(pd.read_csv(inputs[0], index_col=0))
+
+RENDERERS = {
+    "regret": render_regret,
+    "decisions": render_decisions,
+    "sobol": render_sobol,
+}
+
+def regret_spec(settings):
+    from regret_plots import PRESETS
+
+    return PRESETS[settings["preset"]]
+
+# What a renderer draws beyond its settings, resolved when the fingerprint is taken
+SPECS = {
+    "regret": regret_spec,
+}
+
+# Modules whose plotting code every figure depends on
+CODE = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+        for name in ["report.py", "regret_plots.py", "analysis.py"]]
+
+def fingerprint(paths, renderer, settings, dpi):
+    """
+    Cheap identity of a figure's inputs: size and modification time of each input file and of the plotting code,
+    the render settings and a hash of the resolved plot spec.
+    """
+    files = []
+    for path in paths + CODE:
+        stat = os.stat(path)
+        files.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    spec = SPECS[renderer](settings) if renderer in SPECS else {}
+    spec_hash = hashlib.sha256(json.dumps(spec, sort_keys=True, default=repr).encode()).hexdigest()
+    return {"inputs": files, "settings": settings, "spec": spec_hash, "dpi": dpi}
+
+def render(name, renderer, settings, inputs, output, dpi):
+    """
+    Renders and saves one figure. Runs in a worker process and returns (name, seconds).
+    """
+    start = time.perf_counter()
+    fig = RENDERERS[renderer](inputs, settings)
+    fig.savefig(output, dpi=dpi)
+    plt.close(fig)
+    return name, time.perf_counter() - start
+
+def build_report(names=None, data_dir=".", out_dir=".", dpi=450, jobs=None, force=False):
+    """
+    Renders the requested standard figures (all by default) and returns {name: seconds or "skipped"/"missing inputs"/
+    "failed: <error>"}. The figures that rendered are recorded in the manifest even if others failed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    timings = {}
+    pending = {}
+    for name in names or FIGURES:
+        renderer, settings, inputs, output = FIGURES[name]
+        inputs = [os.path.join(data_dir, path) for path in inputs]
+        output = os.path.join(out_dir, output)
+        if not all(os.path.exists(path) for path in inputs):
+            timings[name] = "missing inputs"
+            continue
+        current = fingerprint(inputs, renderer, settings, dpi)
+        if not force and manifest.get(name) == current and os.path.exists(output):
+            timings[name] = "skipped"
+            continue
+        pending[name] = (renderer, settings, inputs, output, current)
+
+    if pending:
+        try:
+            with ProcessPoolExecutor(max_workers=jobs or min(len(pending), os.cpu_count())) as pool:
+                futures = {pool.submit(render, name, renderer, settings, inputs, output, dpi): name
+                           for name, (renderer, settings, inputs, output, _) in pending.items()}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        _, seconds = future.result()
+                    except Exception as exc:
+                        timings[name] = f"failed: {exc}"
+                        manifest.pop(name, None)
+                        continue
+                    timings[name] = seconds
+                    manifest[name] = pending[name][4]
+        finally:
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render all standard figures headlessly in parallel.")
+    parser.add_argument("--only", nargs="+", choices=list(FIGURES), help="Render only these figures")
+    parser.add_argument("--data", default=".", help="Directory of experiments.csv, outcomes.csv and sobol_stats.csv")
+    parser.add_argument("--out", default=".", help="Output directory of the figures")
+    parser.add_argument("--dpi", type=int, default=450)
+    parser.add_argument("--jobs", type=int, help="Number of worker processes (default: one per figure, up to the CPU count)")
+    parser.add_argument("--force", action="store_true", help="Render even if the inputs are unchanged")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    timings = build_report(args.only, args.data, args.out, args.dpi, args.jobs, args.force)
+
+    print(f"{'Figure':<16}{'Time':>16}")
+    for name, seconds in timings.items():
+        print(f"{name:<16}{seconds:>16}" if isinstance(seconds, str) else f"{name:<16}{seconds:>15.2f}s")
+    print(f"{'total (wall)':<16}{time.perf_counter() - start:>15.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from ema_workbench import Samplers, SequentialEvaluator
+from ema_workbench.em_framework.evaluators import setup_scenarios, setup_policies, setup_callback
+from ema_workbench.em_framework.util import determine_objects
+from ema_workbench.util import EMAError
+from profiling import stage
+
+# Experiment runner: ema_workbench's perform_experiments for a single model, split into its sampling, dispatch
+# and collection phases so that each of them can be profiled (see profiling.py), with optional live telemetry
+# (see telemetry.py).
+
+class TimedCallback:
+    """
+    Wraps a callback so that processing each completed experiment is recorded as the "collection" stage,
+    and counted by the telemetry, if any.
+    """
+    def __init__(self, callback, telemetry=None):
+        self.callback = callback
+        self.telemetry = telemetry
+
+    def __call__(self, experiment, outcomes):
+        with stage("collection"):
+            self.callback(experiment, outcomes)
+        if self.telemetry is not None:
+            self.telemetry.completed()
+
+def run_experiments(model, scenarios=0, policies=0, evaluator=None, callback=None, uncertainty_sampling=Samplers.LHS,
+                    lever_sampling=Samplers.LHS, reporting_interval=None, reporting_frequency=10, log_progress=False,
+                    return_callback=False, telemetry=None):
+    """
+    Same as perform_experiments(model, ...) with a full factorial of scenarios and policies.
+
+    telemetry, a telemetry.Telemetry, publishes the run metrics while the experiments are dispatched. Call its
+    instrument(model) before creating the evaluator to get the per-worker metrics too.
+    """
+    with stage("sampling"):
+        scenarios, uncertainties, n_scenarios = setup_scenarios(scenarios, uncertainty_sampling, False, model)
+        policies, levers, n_policies = setup_policies(policies, lever_sampling, False, model)
+        scenarios, policies = list(scenarios), list(policies) # The samplers are lazy
+    n_experiments = n_scenarios * n_policies
+
+    callback = setup_callback(callback, uncertainties, levers, determine_objects(model, "outcomes"), n_experiments,
+                              reporting_interval, reporting_frequency, log_progress)
+    evaluator = evaluator or SequentialEvaluator(model)
+    if telemetry is not None:
+        telemetry.start(n_experiments, evaluator)
+    try:
+        with stage("dispatch"):
+            evaluator.evaluate_experiments(scenarios, policies, TimedCallback(callback, telemetry))
+    finally:
+        if telemetry is not None:
+            telemetry.stop()
+    if callback.i != n_experiments:
+        raise EMAError(f"Not all experiments have completed. Expected {n_experiments}, got {callback.i}")
+
+    if return_callback:
+        return callback
+    with stage("collection"):
+        return callback.get_results()
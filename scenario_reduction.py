@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import spearmanr
+from batch_model import regret_BECCS_batch
+from designs import design_to_unit
+from fleet import full_factorial
+
+# Scenario reduction: an ensemble of scenarios (e.g. 1000 LHS scenarios of controller.py) replaced by k weighted
+# representative scenarios for inner loops such as robust optimization and real options. The scenarios are compared
+# over their inputs (unit-cube coordinates of the uncertainties) or over their outcome signatures (the regret of a
+# set of reference policies in each scenario, in MEUR), and reduced by fast-forward selection (greedily adding the
+# scenario that most reduces the probability-weighted distance of the ensemble to the selected set) or k-medoids
+# (started from the fast-forward selection). Each representative carries the probability of the scenarios nearest
+# to it as its weight.
+#
+# The reduced set is a DataFrame of scenarios with a weight column, indexed by the scenario's row in the ensemble.
+# The batched model ignores columns that are not model inputs, so it can be passed wherever the ensemble was (e.g.
+# stochastic_regret, real_options) and the per-scenario results averaged with weighted_mean / weighted_quantile.
+# reduction_report measures the error the reduction introduces in the policy ranking and the regret quantiles.
+
+def regret_signatures(scenarios, policies, chunk_size=20000):
+    """
+    Regret [MEUR] of each policy in each scenario, shape (scenarios, policies).
+    """
+    outcomes = regret_BECCS_batch(full_factorial(scenarios, policies), chunk_size=chunk_size)
+    return outcomes["regret"].reshape(len(scenarios), len(policies))
+
+def features(scenarios, by="inputs", uncertainties=None, policies=None):
+    """
+    The coordinates scenarios are compared by: "inputs" (the unit-cube coordinates of the uncertainties, default
+    those of controller.py) or "outcomes" (regret_signatures for policies).
+    """
+    if by == "inputs":
+        if uncertainties is None:
+            from controller import model
+            uncertainties = model.uncertainties
+        return design_to_unit(uncertainties, scenarios)
+    if by == "outcomes":
+        if policies is None:
+            raise ValueError("Reducing by outcomes needs the reference policies")
+        return regret_signatures(scenarios, policies)
+    raise ValueError(f"Unknown scenario features: {by}")
+
+def distances(points):
+    """
+    Euclidean distance matrix of points, shape (n, n).
+    """
+    squared = (points ** 2).sum(axis=1)
+    return np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2 * points @ points.T, 0))
+
+def fast_forward(D, p, k):
+    """
+    Indices of k scenarios selected by fast-forward selection for the distance matrix D and probabilities p.
+    """
+    remaining = p.astype(float).copy()
+    nearest = np.full(len(p), np.inf) # Distance of each scenario to the selected set
+    selected = []
+    for _ in range(k):
+        cost = remaining @ np.minimum(nearest[:, None], D)
+        cost[selected] = np.inf
+        u = int(np.argmin(cost))
+        selected.append(u)
+        remaining[u] = 0.0
+        nearest = np.minimum(nearest, D[:, u])
+    return np.array(selected)
+
+def k_medoids(D, p, medoids, max_iterations=100):
+    """
+    Weighted k-medoids from the initial medoids: scenarios are assigned to their nearest medoid and each medoid is
+    moved to the member with the smallest probability-weighted distance to its cluster, until nothing changes.
+    """
+    medoids = np.array(medoids)
+    for _ in range(max_iterations):
+        assignment = np.argmin(D[:, medoids], axis=1)
+        updated = medoids.copy()
+        for c in range(len(medoids)):
+            members = np.flatnonzero(assignment == c)
+            if len(members):
+                updated[c] = members[np.argmin(D[np.ix_(members, members)] @ p[members])]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+    return medoids
+
+def reduce_scenarios(scenarios, k, by="inputs", method="fast_forward", weights=None, uncertainties=None, policies=None):
+    """
+    k weighted representative scenarios of scenarios (a DataFrame of uncertainties), compared by their inputs or
+    outcome signatures (see features), selected by "fast_forward" or "kmedoids".
+
+    weights are the probabilities of the scenarios (default: equal). Returns the selected rows with a weight
+    column, the summed probability of the scenarios nearest to each, indexed by their position in scenarios.
+    """
+    scenarios = scenarios.reset_index(drop=True)
+    p = np.full(len(scenarios), 1 / len(scenarios)) if weights is None else np.asarray(weights, dtype=float) / np.sum(weights)
+    D = distances(features(scenarios, by, uncertainties, policies))
+    selected = fast_forward(D, p, k)
+    if method == "kmedoids":
+        selected = k_medoids(D, p, selected)
+    elif method != "fast_forward":
+        raise ValueError(f"Unknown reduction method: {method}")
+    assignment = np.argmin(D[:, selected], axis=1)
+    reduced = scenarios.iloc[selected].copy()
+    reduced["weight"] = np.bincount(assignment, weights=p, minlength=k)
+    reduced.index.name = "scenario"
+    return reduced
+
+def save_reduced(reduced, path="reduced_scenarios.csv"):
+    reduced.to_csv(path)
+
+def load_reduced(path="reduced_scenarios.csv"):
+    """
+    A reduced scenario set saved by save_reduced: the scenarios with their weight column.
+    """
+    return pd.read_csv(path, index_col="scenario")
+
+def weighted_mean(values, weights=None, axis=0):
+    return np.average(values, weights=weights, axis=axis)
+
+def weighted_quantile(values, q, weights=None):
+    """
+    Quantile q of values (along the first axis) for a discrete distribution with the given weights (default:
+    equal): the smallest value whose cumulative weight reaches q.
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    order = np.argsort(values, axis=0, kind="stable")
+    cumulative = np.cumsum(weights[order], axis=0) / weights.sum()
+    index = np.expand_dims(np.minimum((cumulative < q - 1e-12).sum(axis=0), len(values) - 1), 0)
+    return np.take_along_axis(values, np.take_along_axis(order, index, axis=0), axis=0)[0]
+
+def reduction_report(scenarios, reduced, policies, quantiles=(0.5, 0.9, 0.95)):
+    """
+    Error of the reduced set against the full ensemble, for the policies: per policy, the mean regret and the
+    regret quantiles of both and the policy's rank by mean regret in each; and a summary with the largest absolute
+    errors, the Spearman correlation of the two rankings and whether the best policy is the same.
+    """
+    full = regret_signatures(scenarios.reset_index(drop=True), policies)
+    approximate = regret_signatures(reduced.drop(columns="weight").reset_index(drop=True), policies)
+    weights = reduced["weight"].to_numpy()
+
+    report = pd.DataFrame({"mean_full": weighted_mean(full), "mean_reduced": weighted_mean(approximate, weights)})
+    for q in quantiles:
+        report[f"q{q:g}_full"] = weighted_quantile(full, q)
+        report[f"q{q:g}_reduced"] = weighted_quantile(approximate, q, weights)
+    report["rank_full"] = report["mean_full"].rank(method="min").astype(int)
+    report["rank_reduced"] = report["mean_reduced"].rank(method="min").astype(int)
+    report.index.name = "policy"
+
+    summary = {"scenarios": len(scenarios), "representatives": len(reduced),
+               "max_mean_error": float((report["mean_reduced"] - report["mean_full"]).abs().max())}
+    for q in quantiles:
+        summary[f"max_q{q:g}_error"] = float((report[f"q{q:g}_reduced"] - report[f"q{q:g}_full"]).abs().max())
+    summary["rank_correlation"] = float(spearmanr(report["mean_full"], report["mean_reduced"])[0])
+    summary["same_best_policy"] = bool(report["mean_full"].idxmin() == report["mean_reduced"].idxmin())
+    return report, summary
+
+if __name__ == "__main__":
+    from controller import model
+    from designs import sample_design
+
+    scenarios = sample_design(model.uncertainties, 1000, seed=1)
+    policies = sample_design(model.levers, 20, seed=2)
+    test_policies = sample_design(model.levers, 40, seed=3) # Not used for the reduction
+    for by, method in [("inputs", "fast_forward"), ("inputs", "kmedoids"), ("outcomes", "fast_forward"), ("outcomes", "kmedoids")]:
+        for k in [20, 50, 100]:
+            reduced = reduce_scenarios(scenarios, k, by, method, policies=policies)
+            _, summary = reduction_report(scenarios, reduced, test_policies)
+            print(by, method, {name: round(value, 3) if isinstance(value, float) else value for name, value in summary.items()})
+    save_reduced(reduce_scenarios(scenarios, 50, "outcomes", "kmedoids", policies=policies))
+    print(load_reduced().head())
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+from batch_model import as_inputs, evaluate, TECHS
+
+# Stochastic price mode: instead of one constant electricity, biomass and CRC price per experiment, each scenario
+# gets an ensemble of correlated yearly price paths around its sampled prices, and every policy is evaluated on the
+# same paths (common random numbers), so that regret differences between decisions have low variance.
+# Paths are simulated over all years at once as (paths, years) arrays and evaluated in blocks of bounded size.
+
+STOCHASTIC_PRICES = ["celc", "cbio", "crc"]
+
+# Yearly log-volatility sigma, mean-reversion speed kappa (OU) and drift (GBM) per price. Assumed values, to be
+# calibrated against market data.
+PRICE_PROCESSES = {
+    "celc": {"sigma": 0.20, "kappa": 0.30, "drift": 0.0},
+    "cbio": {"sigma": 0.10, "kappa": 0.20, "drift": 0.0},
+    "crc":  {"sigma": 0.25, "kappa": 0.10, "drift": 0.0},
+}
+
+# Correlation of the yearly shocks, in the order of STOCHASTIC_PRICES
+CORRELATION = np.array([
+    [1.0, 0.3, 0.2],
+    [0.3, 1.0, 0.1],
+    [0.2, 0.1, 1.0],
+])
+
+def correlated_shocks(rng, n_paths, n_years, correlation=CORRELATION, antithetic=True):
+    """
+    Standard normal shocks of shape (len(STOCHASTIC_PRICES), n_paths, n_years) with the given correlation across
+    prices. With antithetic variates, the second half of the paths mirrors the first (n_paths must be even).
+    """
+    n_drawn = n_paths // 2 if antithetic else n_paths
+    z = rng.standard_normal((n_drawn, n_years, len(STOCHASTIC_PRICES))) @ np.linalg.cholesky(correlation).T
+    if antithetic:
+        z = np.concatenate([z, -z])
+    return np.moveaxis(z, 2, 0)
+
+def simulate_paths(start, n_paths, n_years, process="ou", params=PRICE_PROCESSES, correlation=CORRELATION,
+                   antithetic=True, rng=None):
+    """
+    Price paths {name: (n_paths, n_years)} starting from (and, for "ou", reverting to) the prices in start.
+
+    "ou" is an exponential Ornstein-Uhlenbeck process, log p_t = m_t + a (log p_t-1 - m_t-1) + sigma e_t with
+    a = 1 - kappa, "gbm" a geometric Brownian motion. Both are evaluated over all years at once, also for kappa = 1
+    (no memory). Both carry the convexity correction -Var[log p_t]/2 in m_t, so that E[p_t] is the start price
+    (times exp(drift t) for "gbm") and the choice of process does not shift the mean prices.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    shocks = correlated_shocks(rng, n_paths, n_years, correlation, antithetic)
+    t = np.arange(1, n_years + 1)
+    paths = {}
+    for name, z in zip(STOCHASTIC_PRICES, shocks):
+        sigma, kappa, drift = params[name]["sigma"], params[name]["kappa"], params[name]["drift"]
+        if process == "ou":
+            # log p_t - m = sigma * sum_s a^(t-s) e_s, by the recursion x_t = a x_t-1 + e_t (stable for kappa=1, a=0)
+            a = 1 - kappa
+            # Var = sigma^2 (1 - a^2t) / (1 - a^2), the discrete form of sigma^2 (1 - e^-2 kappa t) / (2 kappa)
+            variance = sigma**2 * ((1 - a**(2*t)) / (1 - a**2) if a**2 != 1 else t)
+            deviation = sigma * lfilter([1.0], [1.0, -a], z, axis=1) - variance / 2
+        elif process == "gbm":
+            deviation = (drift - sigma**2 / 2) * t + sigma * np.cumsum(z, axis=1)
+        else:
+            raise ValueError(f"Unknown price process: {process}")
+        paths[name] = start[name] * np.exp(deviation)
+    return paths
+
+def stochastic_regret(scenarios, policies, n_paths=200, n_years=50, process="ou", params=PRICE_PROCESSES,
+                      correlation=CORRELATION, antithetic=True, seed=0, block_size=100000):
+    """
+    Evaluates every policy in every scenario over n_paths price paths per scenario (shared by all policies)
+    and returns one row per scenario and policy with the path means of npv_<tech> and regret_<tech>,
+    the mean regret of the policy's decision and its standard error.
+
+    scenarios and policies are DataFrames of uncertainties and levers (e.g. designs.sample_design). The paths of a
+    scenario depend only on seed and the scenario's position, not on the policies or the block layout.
+    """
+    if antithetic and n_paths % 2:
+        raise ValueError("n_paths must be even with antithetic variates")
+    scenarios, policies = scenarios.reset_index(drop=True), policies.reset_index(drop=True)
+    n_policies = len(policies)
+    per_scenario = n_policies * n_paths
+    scenarios_per_block = max(1, block_size // per_scenario)
+
+    results = []
+    for first in range(0, len(scenarios), scenarios_per_block):
+        block = scenarios.iloc[first:first + scenarios_per_block]
+        paths = {name: [] for name in STOCHASTIC_PRICES}
+        for i, scenario in zip(block.index, block.to_dict("records")):
+            rng = np.random.default_rng([seed, i])
+            for name, values in simulate_paths(scenario, n_paths, n_years, process, params, correlation, antithetic, rng).items():
+                paths[name].append(values)
+
+        # Rows ordered by scenario, policy, path; the paths of a scenario are repeated for each policy
+        s, k, p = len(block), n_policies, n_paths
+        design = pd.concat([block.iloc[np.repeat(np.arange(s), k * p)].reset_index(drop=True),
+                            policies.iloc[np.tile(np.repeat(np.arange(k), p), s)].reset_index(drop=True)], axis=1)
+        prices = {name: np.broadcast_to(np.stack(values)[:, None], (s, k, p, n_years)).reshape(s * k * p, n_years)
+                  for name, values in paths.items()}
+        outcomes = evaluate(as_inputs(design), prices)
+
+        summary = {}
+        for tech in TECHS:
+            summary[f"npv_{tech}"] = outcomes[f"npv_{tech}"].reshape(s, k, p).mean(axis=2)
+            summary[f"regret_{tech}"] = outcomes[f"regret_{tech}"].reshape(s, k, p).mean(axis=2)
+        regret = outcomes["regret"].reshape(s, k, p)
+        if antithetic: # Antithetic pairs are the independent draws
+            regret = (regret[:, :, :p // 2] + regret[:, :, p // 2:]) / 2
+        summary["regret"] = regret.mean(axis=2)
+        summary["regret_se"] = regret.std(axis=2, ddof=1) / np.sqrt(regret.shape[2])
+
+        frame = pd.DataFrame({name: values.ravel() for name, values in summary.items()})
+        frame.insert(0, "scenario", np.repeat(block.index, k))
+        frame.insert(1, "policy", np.tile(np.arange(k), s))
+        results.append(frame)
+    return pd.concat(results, ignore_index=True)
+
+if __name__ == "__main__":
+    from controller import model
+    from designs import sample_design
+
+    scenarios = sample_design(model.uncertainties, 20, seed=1)
+    policies = pd.DataFrame({"decision": TECHS, "rate": 0.90, "operating_increase": 600, "timing": 10})
+    results = stochastic_regret(scenarios, policies, n_paths=200)
+    results["decision"] = policies["decision"].to_numpy()[results["policy"]]
+    print(results.groupby("decision")[["regret", "regret_se"]].mean())
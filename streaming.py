@@ -0,0 +1,298 @@
+import time
+import numpy as np
+import pandas as pd
+from ema_workbench import ema_logging
+from ema_workbench.em_framework.callbacks import AbstractCallback, DefaultCallback
+from analysis import REGRET_COLUMNS
+
+# Streaming statistics for experiment runs. Aggregators are updated in batches while experiments complete,
+# keep a bounded amount of memory regardless of the number of experiments, and can be merged (e.g. across workers).
+
+class KLLSketch:
+    """
+    Mergeable KLL quantile sketch (Karnin, Lang & Liberty 2016), plus exact count/min/max.
+
+    Keeps O(k log(n/k)) values; the rank error of quantile() is roughly 1.7/k for k >= 100.
+    """
+    def __init__(self, k=200, c=2/3, seed=None):
+        self.k = k
+        self.c = c
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * self.c**depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                leftover = items[:len(items) % 2]       # An odd item stays on this level
+                pairs = items[len(items) % 2:]
+                promoted = pairs[self._rng.integers(2)::2] # Every other item moves up with twice the weight
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """
+        Approximate quantile(s) q in [0, 1]. q=0 and q=1 return the exact min and max.
+        """
+        q = np.asarray(q, dtype=float)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_h), 2.0**h) for h, items_h in enumerate(self.levels)])
+        order = np.argsort(items)
+        items, cumulative = items[order], np.cumsum(weights[order])
+        index = np.clip(np.searchsorted(cumulative, q * cumulative[-1], side="left"), 0, len(items) - 1)
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, items[index]))
+        return result if result.ndim else float(result)
+
+    def median(self):
+        return self.quantile(0.5)
+
+class DecisionSketches:
+    """
+    Quantile sketches and count/min/max of every REGRET_COLUMNS outcome per Auction/Bioshortage subset,
+    i.e. everything the decision boxplot grid (analysis.plot_decision_sketches) needs.
+    """
+    def __init__(self, k=200):
+        self.k = k
+        self.sketches = {}
+
+    def sketch(self, subset, column):
+        if (subset, column) not in self.sketches:
+            self.sketches[(subset, column)] = KLLSketch(self.k)
+        return self.sketches[(subset, column)]
+
+    def update(self, batch):
+        """
+        Adds a batch of experiments, given as one frame of experiment parameters and outcomes.
+        """
+        values = batch.reindex(columns=[col for col in REGRET_COLUMNS if not col.startswith("npv_ref_")]).astype(float)
+        values["npv_ref_bio"] = batch["npv_ref"].where(batch["cbio"] > batch["celc"])
+        values["npv_ref_elc"] = batch["npv_ref"].where(batch["cbio"] < batch["celc"])
+
+        subsets = [batch["Auction"].astype(bool).to_numpy(), batch["Bioshortage"].astype(bool).to_numpy()]
+        for (auction, bioshortage), rows in values.groupby(subsets, sort=False).indices.items():
+            for column in REGRET_COLUMNS:
+                self.sketch((bool(auction), bool(bioshortage)), column).update(values[column].to_numpy()[rows])
+
+    def merge(self, other):
+        for key, sketch in other.sketches.items():
+            self.sketch(*key).merge(sketch)
+        return self
+
+    def column(self, column):
+        """
+        Sketch of one column over all subsets.
+        """
+        merged = KLLSketch(self.k)
+        for (subset, col), sketch in self.sketches.items():
+            if col == column:
+                merged.merge(sketch)
+        return merged
+
+class RegretTally:
+    """
+    Online tallies of the run: the number of experiments with zero regret per decision, per decision and timing,
+    and per decision and shock value, the number of "wins" (regret_<tech> == 0) per technology, and the running
+    mean/variance (Welford/Chan) of every npv_* outcome. All of it is a few small counters, and tallies merge exactly.
+    """
+    techs = ["ref", "amine", "oxy", "clc"]
+    shocks = ["Bioshortage", "Powersurge", "Auction", "Integration", "Fossilized", "Toxic", "Experimental", "Hydrogen", "Monostorage"]
+
+    def __init__(self):
+        self.n = 0
+        self.counts = {}    # (grouping columns) -> {group value(s): [zero regret count, experiment count]}
+        self.wins = dict.fromkeys(self.techs, 0)
+        self.npv = {f"npv_{tech}": [0, 0.0, 0.0] for tech in self.techs} # count, mean, sum of squared deviations
+
+    def _count(self, columns, batch, zero):
+        grouped = pd.Series(zero).groupby([batch[col].to_numpy() for col in columns]).agg(["sum", "count"])
+        table = self.counts.setdefault(columns, {})
+        for key, (n_zero, n) in zip(grouped.index, grouped.to_numpy()):
+            counts = table.setdefault(key, [0, 0])
+            counts[0] += int(n_zero)
+            counts[1] += int(n)
+
+    def update(self, batch):
+        self.n += len(batch)
+        zero = batch["regret"].to_numpy() == 0
+        self._count(("decision",), batch, zero)
+        if "timing" in batch:
+            self._count(("decision", "timing"), batch, zero)
+        for shock in self.shocks:
+            if shock in batch:
+                self._count(("decision", shock), batch, zero)
+
+        for tech in self.techs:
+            self.wins[tech] += int((batch[f"regret_{tech}"].to_numpy() == 0).sum())
+
+        for column, stats in self.npv.items():
+            values = batch[column].to_numpy(dtype=float)
+            self._merge_moments(stats, len(values), values.mean(), ((values - values.mean())**2).sum())
+
+    @staticmethod
+    def _merge_moments(stats, n_b, mean_b, m2_b):
+        n_a, mean_a, m2_a = stats
+        n = n_a + n_b
+        if n_b == 0:
+            return
+        delta = mean_b - mean_a
+        stats[0] = n
+        stats[1] = mean_a + delta * n_b / n
+        stats[2] = m2_a + m2_b + delta**2 * n_a * n_b / n
+
+    def merge(self, other):
+        self.n += other.n
+        for columns, table in other.counts.items():
+            mine = self.counts.setdefault(columns, {})
+            for key, (n_zero, n) in table.items():
+                counts = mine.setdefault(key, [0, 0])
+                counts[0] += n_zero
+                counts[1] += n
+        for tech, wins in other.wins.items():
+            self.wins[tech] += wins
+        for column, stats in other.npv.items():
+            self._merge_moments(self.npv[column], *stats)
+        return self
+
+    def zero_regret(self, *columns):
+        """
+        Zero-regret counts, experiment counts and shares grouped by columns (default: decision), as a DataFrame.
+        """
+        columns = columns or ("decision",)
+        table = self.counts.get(columns, {})
+        rows = [(*(key if len(columns) > 1 else (key,)), *counts) for key, counts in table.items()]
+        df = pd.DataFrame(rows, columns=[*columns, "zero_regret", "experiments"]).set_index(list(columns))
+        df["share"] = df["zero_regret"] / df["experiments"]
+        return df.sort_index()
+
+    def npv_stats(self):
+        """
+        Running count, mean and standard deviation of every npv_* outcome, as a DataFrame.
+        """
+        return pd.DataFrame({
+            column: {"count": n, "mean": mean, "std": np.sqrt(m2 / (n - 1)) if n > 1 else np.nan}
+            for column, (n, mean, m2) in self.npv.items()
+        }).T
+
+    def summary(self):
+        decisions = self.zero_regret("decision")
+        zero = ", ".join(f"{d} {n_zero}/{n} ({share:.0%})" for d, n_zero, n, share in decisions.itertuples())
+        wins = ", ".join(f"{tech} {count/max(self.n, 1):.0%}" for tech, count in self.wins.items())
+        npv = ", ".join(f"{column} {mean:.0f}" for column, (n, mean, _) in self.npv.items())
+        return f"{self.n} experiments | zero regret by decision: {zero} | wins: {wins} | mean {npv}"
+
+def log_progress(*aggregators):
+    """
+    Progress function for StreamingCallback that logs the summary() of the given aggregators.
+    """
+    def progress(callback):
+        for aggregator in aggregators:
+            ema_logging.get_rootlogger().info(aggregator.summary())
+    return progress
+
+class StreamingCallback(DefaultCallback):
+    """
+    ema_workbench callback that feeds every completed experiment to a list of aggregators, in batches of flush_every.
+
+    Configure it with functools.partial before passing it to perform_experiments, e.g.
+        sketches = DecisionSketches()
+        perform_experiments(model, ..., callback=partial(StreamingCallback, aggregators=[sketches]))
+
+    With store_results=False the experiments and outcomes are not kept at all, so memory stays constant in the
+    number of experiments and get_results() returns (None, None).
+
+    progress, if given, is called with the callback at most every progress_interval seconds after a flush,
+    e.g. log_progress(tally) to display the live tallies during the run.
+
+    stores, {outcome name: store}, writes array outcomes to disk by experiment ID instead of keeping them in
+    memory, e.g. {"cash_flows": cash_flow_store.CashFlowStore("cash_flows.npy")}.
+    """
+    def __init__(self, uncertainties, levers, outcomes, nr_experiments, reporting_interval=None, reporting_frequency=10,
+                 log_progress=False, aggregators=(), store_results=True, flush_every=1000, progress=None, progress_interval=10.0,
+                 stores=None):
+        self.stores = dict(stores or {})
+        for store in self.stores.values():
+            store.open(nr_experiments)
+        outcomes = [outcome for outcome in outcomes if outcome.name not in self.stores]
+        self.store_results = store_results
+        if store_results:
+            super().__init__(uncertainties, levers, outcomes, nr_experiments, reporting_interval, reporting_frequency, log_progress)
+        else:
+            AbstractCallback.__init__(self, uncertainties, levers, outcomes, nr_experiments, reporting_interval, reporting_frequency, log_progress)
+        self.aggregators = list(aggregators)
+        self.flush_every = flush_every
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self._last_progress = time.monotonic()
+        self._buffer = []
+
+    def __call__(self, experiment, outcomes):
+        if self.stores:
+            for name, store in self.stores.items():
+                store.write(experiment.experiment_id, outcomes[name])
+            outcomes = {name: value for name, value in outcomes.items() if name not in self.stores}
+        if self.store_results:
+            super().__call__(experiment, outcomes)
+        else:
+            AbstractCallback.__call__(self, experiment, outcomes)
+
+        row = {**experiment.scenario, **experiment.policy}
+        row.update((name, value) for name, value in outcomes.items() if np.ndim(value) == 0)
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        batch = pd.DataFrame.from_records(self._buffer)
+        self._buffer = []
+        for aggregator in self.aggregators:
+            aggregator.update(batch)
+
+        if self.progress is not None and time.monotonic() - self._last_progress >= self.progress_interval:
+            self._last_progress = time.monotonic()
+            self.progress(self)
+
+    def get_results(self):
+        self.flush()
+        for store in self.stores.values():
+            store.flush()
+        if self.store_results:
+            return super().get_results()
+        return None, None
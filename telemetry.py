@@ -0,0 +1,254 @@
+import os
+import json
+import glob
+import time
+import resource
+import threading
+import multiprocessing.util
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+# Live telemetry of long experiment runs: experiments per second, ETA, per-worker busy fraction, queue depth,
+# experiment latency percentiles and peak RSS per worker, refreshed every few seconds into a Prometheus text file
+# (for node_exporter's textfile collector, or just `watch cat metrics.prom`) and/or served on localhost, e.g.
+#
+#   telemetry = Telemetry("metrics.prom", port=9464)
+#   telemetry.instrument(model)     # before the evaluator starts its worker processes
+#   with MultiprocessingEvaluator(model) as evaluator:
+#       run_experiments(model, 1000, 500, evaluator=evaluator, telemetry=telemetry)
+#
+# and then curl localhost:9464/metrics (Prometheus text) or localhost:9464/metrics.json.
+# ema_workbench dispatches one experiment per pool task, so the chunk latency is the latency of one experiment.
+
+LATENCY_BUCKETS = np.logspace(-5, 2, 57) # [s] upper bounds, 8 per decade from 10us to 100s
+
+class TimedFunction:
+    """
+    Model function wrapper that records, in each process, the busy time, the number of experiments and a latency
+    histogram, and writes them together with the peak RSS to <directory>/worker-<pid>.json every interval seconds.
+    """
+    def __init__(self, function, directory, interval=2.0):
+        self.function = function
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._since = time.time()
+        self._written = 0.0
+        self._busy = 0.0
+        self._experiments = 0
+        self._latency = np.zeros(len(LATENCY_BUCKETS) + 1, dtype=np.int64)
+        multiprocessing.util.Finalize(None, self.write, exitpriority=10) # Final state when the worker exits
+
+    def __call__(self, **kwargs):
+        if self._pid != os.getpid(): # First call in this (worker) process
+            self._start()
+        start = time.perf_counter()
+        result = self.function(**kwargs)
+        elapsed = time.perf_counter() - start
+
+        self._busy += elapsed
+        self._experiments += 1
+        self._latency[np.searchsorted(LATENCY_BUCKETS, elapsed)] += 1
+        if time.time() - self._written > self.interval:
+            self.write()
+        return result
+
+    def write(self):
+        self._written = time.time()
+        state = {
+            "pid": self._pid,
+            "since": self._since,
+            "updated": self._written,
+            "busy": self._busy,
+            "experiments": self._experiments,
+            "latency": self._latency.tolist(),
+            "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, # ru_maxrss is in KiB on Linux
+        }
+        path = os.path.join(self.directory, f"worker-{self._pid}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+def latency_quantiles(histogram, quantiles=(0.5, 0.9, 0.99)):
+    """
+    Quantiles of a LATENCY_BUCKETS histogram, interpolated log-linearly within a bucket.
+    """
+    histogram = np.asarray(histogram, dtype=float)
+    total = histogram.sum()
+    if total == 0:
+        return {q: np.nan for q in quantiles}
+    edges = np.concatenate([[LATENCY_BUCKETS[0] / 10**(1/8)], LATENCY_BUCKETS, [LATENCY_BUCKETS[-1] * 10**(1/8)]])
+    cumulative = np.cumsum(histogram)
+    result = {}
+    for q in quantiles:
+        i = int(np.searchsorted(cumulative, q * total))
+        below = cumulative[i - 1] if i > 0 else 0.0
+        fraction = (q * total - below) / histogram[i] if histogram[i] else 1.0
+        result[q] = float(edges[i] * (edges[i + 1] / edges[i]) ** fraction)
+    return result
+
+class Telemetry:
+    """
+    Collects run metrics in a background thread every interval seconds. path, if given, receives the Prometheus
+    text format; port, if given, serves /metrics (Prometheus text) and /metrics.json on 127.0.0.1.
+    """
+    def __init__(self, path="metrics.prom", port=None, interval=5.0, rate_window=60.0):
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.rate_window = rate_window
+        self.directory = (path or "telemetry") + ".workers"
+        self.snapshot = {}
+        self._completed = 0
+        self._history = []  # (time, completed) over the last rate_window seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+        self._function = None
+
+    def instrument(self, model):
+        """
+        Wraps the function of an ema_workbench Model so that its workers report their state, and returns self.
+        Must be called before the evaluator pickles the model into its worker processes.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        for path in glob.glob(os.path.join(self.directory, "worker-*.json")):
+            os.remove(path)
+        if not isinstance(model.function, TimedFunction):
+            model.function = TimedFunction(model.function, self.directory, self.interval / 2)
+        self._function = model.function
+        return self
+
+    def start(self, n_experiments, evaluator=None):
+        self.n_experiments = n_experiments
+        self.evaluator = evaluator
+        self._started = time.time()
+        self._history = [(self._started, 0)]
+        self._stop.clear()
+        self.update()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+        if self.port is not None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _handler(self))
+            threading.Thread(target=self._server.serve_forever, name="telemetry server", daemon=True).start()
+
+    def completed(self, n=1):
+        """
+        Called by the runner for every collected experiment.
+        """
+        self._completed += n
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._function is not None and self._function._pid == os.getpid(): # Sequential run: the main process is the worker
+            self._function.write()
+        self.update()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.update()
+
+    def queue_depth(self):
+        # Experiments submitted to the multiprocessing pool and not yet collected (ema_workbench keeps the pool private)
+        pool = getattr(self.evaluator, "_pool", None)
+        return len(pool._cache) if pool is not None else 0
+
+    def workers(self):
+        workers = []
+        for path in glob.glob(os.path.join(self.directory, "worker-*.json")):
+            try:
+                with open(path) as f:
+                    workers.append(json.load(f))
+            except (OSError, ValueError): # Being replaced right now, the next update will have it
+                pass
+        return sorted(workers, key=lambda worker: worker["pid"])
+
+    def update(self):
+        now = time.time()
+        completed = self._completed
+        self._history.append((now, completed))
+        self._history = [(t, n) for t, n in self._history if now - t <= self.rate_window] or [(now, completed)]
+        t0, n0 = self._history[0]
+        rate = (completed - n0) / (now - t0) if now > t0 else 0.0
+        remaining = self.n_experiments - completed
+
+        workers = self.workers()
+        latency = np.sum([worker["latency"] for worker in workers], axis=0) if workers else np.zeros(len(LATENCY_BUCKETS) + 1)
+        self.snapshot = {
+            "time": now,
+            "elapsed_seconds": now - self._started,
+            "experiments_total": self.n_experiments,
+            "experiments_completed": completed,
+            "experiments_per_second": rate,
+            "eta_seconds": remaining / rate if rate > 0 else None,
+            "queue_depth": self.queue_depth(),
+            "main_peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "latency_seconds": {str(q): value for q, value in latency_quantiles(latency).items()},
+            "latency_count": int(latency.sum()),
+            "workers": {str(worker["pid"]): {
+                "experiments": worker["experiments"],
+                "busy_fraction": worker["busy"] / max(worker["updated"] - worker["since"], 1e-9),
+                "peak_rss_bytes": worker["peak_rss"],
+            } for worker in workers},
+        }
+        if self.path:
+            with open(self.path + ".tmp", "w") as f:
+                f.write(self.prometheus())
+            os.replace(self.path + ".tmp", self.path)
+        return self.snapshot
+
+    def prometheus(self):
+        """
+        The current snapshot in the Prometheus text exposition format.
+        """
+        s = self.snapshot
+        lines = []
+        def metric(name, kind, help, samples):
+            lines.append(f"# HELP beccs_{name} {help}")
+            lines.append(f"# TYPE beccs_{name} {kind}")
+            for labels, value in samples:
+                value = "NaN" if value is None or value != value else value
+                lines.append(f"beccs_{name}{labels} {value}")
+
+        metric("experiments_total", "gauge", "Experiments in the run.", [("", s["experiments_total"])])
+        metric("experiments_completed", "counter", "Experiments collected so far.", [("", s["experiments_completed"])])
+        metric("experiments_per_second", "gauge", "Collection rate over the last rate window.", [("", s["experiments_per_second"])])
+        metric("eta_seconds", "gauge", "Estimated time to completion at the current rate.", [("", s["eta_seconds"])])
+        metric("queue_depth", "gauge", "Experiments submitted to the pool and not yet collected.", [("", s["queue_depth"])])
+        metric("main_peak_rss_bytes", "gauge", "Peak resident set size of the main process.", [("", s["main_peak_rss_bytes"])])
+        metric("chunk_latency_seconds", "summary", "Latency of one pool task (one experiment).",
+               [(f'{{quantile="{q}"}}', value) for q, value in s["latency_seconds"].items()])
+        lines.append(f"beccs_chunk_latency_seconds_count {s['latency_count']}")
+        for name, help in [("busy_fraction", "Share of the worker's lifetime spent in the model."),
+                           ("peak_rss_bytes", "Peak resident set size of the worker."),
+                           ("experiments", "Experiments run by the worker.")]:
+            metric(f"worker_{name}", "gauge", help, [(f'{{worker="{pid}"}}', worker[name]) for pid, worker in s["workers"].items()])
+        return "\n".join(lines) + "\n"
+
+def _handler(telemetry):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, kind = json.dumps(telemetry.snapshot, indent=2).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, kind = telemetry.prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args): # Keep the run's log clean
+            pass
+    return Handler
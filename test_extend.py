@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from batch_model import regret_BECCS_batch
+from cash_flow_store import append_cash_flows, load_cash_flows, write_cash_flows
+from extend import MANIFEST, extend_run, read_manifest, run_parameters, start_run
+from validation import random_design
+
+# Round trips of the run extension: appending to a stored run must give the rows, IDs, cash flows and manifest of
+# the run as if it had been sampled at once.
+
+def read_run(directory):
+    return (pd.read_csv(os.path.join(directory, "experiments.csv")),
+            pd.read_csv(os.path.join(directory, "outcomes.csv")))
+
+def test_append_cash_flows_round_trip(tmp_path):
+    design = random_design(30, seed=1)
+    path, direct = str(tmp_path / "cash_flows.npy"), str(tmp_path / "direct.npy")
+    write_cash_flows(design.iloc[:20], path)
+    append_cash_flows(design.iloc[20:], path, chunk_size=7)
+    write_cash_flows(design, direct)
+    np.testing.assert_array_equal(load_cash_flows(path), load_cash_flows(direct))
+    assert not os.path.exists(path + ".extending")
+
+def test_extend_sobol_run_round_trip(tmp_path):
+    directory = str(tmp_path)
+    start_run(16, 3, directory, method="sobol", seed=1, cash_flows=True)
+    stored, stored_outcomes = read_run(directory)
+    new, new_outcomes = extend_run(16, directory)
+    experiments, outcomes = read_run(directory)
+
+    # Stored rows are kept as they were, the new ones follow them policy-major as ema_workbench orders them
+    assert len(experiments) == len(outcomes) == 96
+    pd.testing.assert_frame_equal(experiments.iloc[:48], stored)
+    pd.testing.assert_frame_equal(outcomes.iloc[:48], stored_outcomes)
+    assert list(new.index) == list(range(48, 96))
+    added = experiments.iloc[48:]
+    assert list(added["scenario"]) == list(np.tile(np.arange(19, 35), 3))  # After the stored scenarios and policies 16-18
+    assert list(added["policy"]) == list(np.repeat([16, 17, 18], 16))
+    policies = stored.drop_duplicates("policy").set_index("policy")
+    for lever in [lever.name for lever in run_parameters()[1]]:
+        assert (added[lever].to_numpy() == policies.loc[added["policy"], lever].to_numpy()).all()
+
+    # The new scenarios continue the Sobol sequence, and every row's outcomes and cash flows are its own
+    uncertainties = [p.name for p in run_parameters()[0]]
+    direct, _ = start_run(32, policies.reset_index(), str(tmp_path / "direct"), method="sobol", seed=1)
+    np.testing.assert_allclose(added.drop_duplicates("scenario")[uncertainties].to_numpy(dtype=float),
+                               direct.drop_duplicates("scenario")[uncertainties].iloc[16:].to_numpy(dtype=float))
+    expected = regret_BECCS_batch(experiments)
+    for outcome in outcomes:
+        np.testing.assert_allclose(outcomes[outcome], expected[outcome], rtol=1e-12, atol=1e-9)
+    write_cash_flows(experiments, str(tmp_path / "direct.npy"))
+    np.testing.assert_allclose(load_cash_flows(os.path.join(directory, "cash_flows.npy")),
+                               load_cash_flows(str(tmp_path / "direct.npy")), rtol=1e-6, atol=1e-6)
+
+    manifest = read_manifest(directory)
+    assert [batch["batch"] for batch in manifest["batches"]] == [0, 1]
+    batch = manifest["batches"][1]
+    assert (batch["method"], batch["seed"], batch["scenarios"], batch["first_scenario"]) == ("sobol", 1, 16, 19)
+    assert batch["experiments"] == [48, 96]
+
+def test_extend_run_without_manifest(tmp_path):
+    directory = str(tmp_path)
+    start_run(10, 2, directory, method="lhs", seed=2)
+    os.remove(os.path.join(directory, MANIFEST))
+    extend_run(10, directory, seed=3)
+    experiments, outcomes = read_run(directory)
+    assert len(experiments) == len(outcomes) == 40
+    assert experiments["scenario"].nunique() == 20 and not experiments.duplicated(["scenario", "policy"]).any()
+
+    manifest = read_manifest(directory)
+    assert [batch["method"] for batch in manifest["batches"]] == [None, "lhs"]
+    assert manifest["batches"][1]["experiments"] == [20, 40]
+    with pytest.raises(ValueError):
+        extend_run(5, directory, method="sobol")
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from model import regret_BECCS
+from batch_model import as_inputs, yearly_cash_flows
+from fleet import PLANT_PARAMETERS, check_fleet, load_plants
+from validation import FAST_PATHS, random_design, reference, compare
+
+# Every fast path against the reference scalar regret_BECCS on a small random design (validation.py runs the same
+# comparison at scale: python validation.py --n 100000).
+
+@pytest.fixture(scope="module")
+def design():
+    return random_design(200, seed=11)
+
+@pytest.fixture(scope="module")
+def expected(design):
+    return reference(design)
+
+@pytest.mark.parametrize("name", sorted(FAST_PATHS))
+def test_fast_path_matches_reference(name, design, expected):
+    report = compare(expected, FAST_PATHS[name](design))
+    assert report["passed"], report
+
+def test_fleet_matches_single_plant_runs(design):
+    reports = check_fleet(design.iloc[:60])
+    assert set(reports) == set(load_plants()["plant"])
+    for plant, report in reports.items():
+        assert report["passed"], (plant, report)
+
+def test_fleet_plant_matches_reference(design):
+    plants = load_plants()
+    p = int(np.flatnonzero(plants["plant"] != "Malmo")[0])
+    rows = design.iloc[:20].assign(**{name: plants[name][p] for name in PLANT_PARAMETERS})
+    report = compare(reference(rows), FAST_PATHS["batch"](rows))
+    assert report["passed"], report
+
+def test_yearly_cash_flows_match_reference(design):
+    rows = design.iloc[:20]
+    flows = yearly_cash_flows(as_inputs(rows))
+    for i, row in enumerate(rows.to_dict("records")):
+        np.testing.assert_allclose(flows[i], regret_BECCS(**row, cash_flows=True)["cash_flows"], rtol=1e-6, atol=1e-6)
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from model import regret_BECCS
+from batch_model import regret_BECCS_batch, TECHS
+from incremental import Incremental
+from gradients import regret_BECCS_gradients
+from designs import sample_design
+
+# Differential validation of fast model paths against the reference scalar regret_BECCS: both are run on the same
+# random design over the full uncertainty and lever ranges of controller.py, and every outcome is compared, e.g.
+#   python validation.py --n 100000 --jobs 8
+
+OUTCOMES = ["regret", "regret_ref", "regret_amine", "regret_clc", "regret_oxy", "npv_ref", "npv_amine", "npv_oxy", "npv_clc"]
+
+# name: function(design DataFrame) -> {outcome: array}
+FAST_PATHS = {
+    "batch": regret_BECCS_batch,
+    "incremental": lambda design: Incremental(design).outcomes(),
+    "gradients": lambda design: regret_BECCS_gradients(design)[0],
+}
+
+def register_fast_path(name, function):
+    """
+    Registers a fast path to validate, as a function of a design DataFrame returning {outcome: array}.
+    """
+    FAST_PATHS[name] = function
+    return function
+
+def random_design(n, seed=None):
+    """
+    n random experiments over the uncertainties and levers of controller.py, plus every optional shock it leaves
+    out, so that the fast paths are validated with the shocks too.
+    """
+    from controller import model, opted_in_shocks, OPTIONAL_SHOCKS
+    names = {parameter.name for parameter in model.uncertainties}
+    shocks = opted_in_shocks([name for name in OPTIONAL_SHOCKS if name not in names])
+    return sample_design(model.uncertainties + shocks + model.levers, n, seed=seed, method="mc")
+
+def reference_chunk(rows):
+    outcomes = [regret_BECCS(**row) for row in rows]
+    return {outcome: np.array([result[outcome] for result in outcomes]) for outcome in OUTCOMES}
+
+def reference(design, jobs=1, chunk_size=5000):
+    """
+    Reference outcomes of design, one regret_BECCS call per row, in jobs processes.
+    """
+    rows = design.to_dict("records")
+    chunks = [rows[start:start+chunk_size] for start in range(0, len(rows), chunk_size)]
+    if jobs == 1:
+        results = [reference_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(reference_chunk, chunks))
+    return {outcome: np.concatenate([result[outcome] for result in results]) for outcome in OUTCOMES}
+
+def best_tech(outcomes):
+    """
+    Index into TECHS of the technology with the highest NPV, per experiment.
+    """
+    return np.argmax(np.column_stack([outcomes[f"npv_{tech}"] for tech in TECHS]), axis=1)
+
+def compare(expected, actual, atol=1e-9, rtol=1e-9):
+    """
+    Maximum absolute and relative deviation per outcome, and the experiments whose best technology differs.
+    """
+    report = {"outcomes": {}, "passed": True}
+    for outcome in OUTCOMES:
+        difference = np.abs(np.asarray(actual[outcome], dtype=float) - expected[outcome])
+        relative = difference / np.maximum(np.abs(expected[outcome]), np.finfo(float).tiny)
+        worst = int(np.argmax(difference))
+        failed = int((difference > atol + rtol * np.abs(expected[outcome])).sum())
+        report["outcomes"][outcome] = {
+            "max_abs": float(difference.max()),
+            "max_rel": float(relative.max()),
+            "worst_experiment": worst,
+            "failed": failed,
+        }
+        report["passed"] &= failed == 0
+    flipped = np.flatnonzero(best_tech(expected) != best_tech(actual))
+    report["flipped_argmax"] = len(flipped)
+    report["flipped_experiments"] = flipped[:20].tolist()
+    report["passed"] &= len(flipped) == 0
+    return report
+
+def validate(n=10000, seed=0, paths=None, jobs=1, atol=1e-9, rtol=1e-9):
+    """
+    Returns {fast path name: comparison report} for a random design of n experiments.
+    """
+    design = random_design(n, seed)
+    expected = reference(design, jobs)
+    return {name: compare(expected, FAST_PATHS[name](design), atol, rtol) for name in paths or FAST_PATHS}
+
+def print_report(reports):
+    for name, report in reports.items():
+        print(f"\n{name}: {'passed' if report['passed'] else 'FAILED'}, {report['flipped_argmax']} flipped best technologies")
+        print(f"{'Outcome':<16}{'max abs':>12}{'max rel':>12}{'failed':>8}")
+        for outcome, stats in report["outcomes"].items():
+            print(f"{outcome:<16}{stats['max_abs']:>12.3g}{stats['max_rel']:>12.3g}{stats['failed']:>8}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the fast model paths against the reference regret_BECCS.")
+    parser.add_argument("--n", type=int, default=10000, help="Number of random experiments")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--paths", nargs="+", choices=list(FAST_PATHS))
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Processes for the reference evaluation")
+    parser.add_argument("--atol", type=float, default=1e-9, help="Absolute tolerance [MEUR]")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--out", help="Save the report as JSON")
+    args = parser.parse_args(argv)
+
+    reports = validate(args.n, args.seed, args.paths, args.jobs, args.atol, args.rtol)
+    print_report(reports)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(reports, f, indent=2)
+    return 0 if all(report["passed"] for report in reports.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
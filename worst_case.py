@@ -0,0 +1,201 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ema_workbench import CategoricalParameter, IntegerParameter
+from batch_model import regret_BECCS_batch, TECHS
+from gradients import regret_BECCS_gradients
+
+# Worst-case scenario search: the scenarios in the uncertainty box of controller.py where a technology's regret is
+# highest, found by optimization instead of sampling the tail. For a given policy (the levers), per technology:
+#   1. Screening: every combination of the categorical shocks is evaluated at a few random points of the rest of
+#      the box, with the batched model, and the combinations with the highest regret are kept.
+#   2. Multi-start projected gradient ascent over the real-valued uncertainties (scaled to the unit box), from the
+#      best screened points and random points of each kept combination. All starts are advanced together with one
+#      batched gradient evaluation (gradients.py) per iteration, each with its own backtracking step size.
+#   3. The integer uncertainties (lifetime) are polished by enumeration, then the ascent is repeated once.
+# Of all points evaluated, the k best that are distinct (other shocks or integers, or at least min_distance apart
+# in the unit box) are returned. A search takes thousands of evaluations where sampling the tail takes 10^5-10^6.
+
+def uncertainty_box(uncertainties=None):
+    """
+    The box of the uncertainties (default: controller.py) as ({real name: (lower, upper)},
+    {integer name: (lower, upper)}, {categorical name: values}).
+    """
+    if uncertainties is None:
+        from controller import model
+        uncertainties = model.uncertainties
+    real, integer, categorical = {}, {}, {}
+    for parameter in uncertainties:
+        if isinstance(parameter, CategoricalParameter): # Must come first: CategoricalParameter is an IntegerParameter
+            categorical[parameter.name] = [category.value for category in parameter.categories]
+        elif isinstance(parameter, IntegerParameter):
+            integer[parameter.name] = (parameter.lower_bound, parameter.upper_bound)
+        else:
+            real[parameter.name] = (parameter.lower_bound, parameter.upper_bound)
+    return real, integer, categorical
+
+class Search:
+    """
+    Points of one search: unit-box coordinates of the real uncertainties, the shock combination (row of
+    combinations) and the integer uncertainties, with the model inputs they stand for.
+    """
+    def __init__(self, real, integer, categorical, policy):
+        self.names = list(real)
+        self.lower = np.array([lower for lower, _ in real.values()], dtype=float)
+        self.width = np.array([upper - lower for lower, upper in real.values()], dtype=float)
+        self.integer = integer
+        self.combinations = pd.DataFrame(list(itertools.product(*categorical.values())), columns=list(categorical))
+        self.policy = policy
+        self.evaluations = 0
+        self.gradient_evaluations = 0
+
+    def design(self, u, combination, integers):
+        df = pd.DataFrame(self.lower + u * self.width, columns=self.names)
+        for name in self.combinations:
+            df[name] = self.combinations[name].to_numpy()[combination]
+        for name, values in integers.items():
+            df[name] = values
+        for name, value in self.policy.items():
+            df[name] = value
+        return df
+
+    def evaluate(self, outcome, u, combination, integers):
+        self.evaluations += len(u)
+        return regret_BECCS_batch(self.design(u, combination, integers))[outcome]
+
+    def gradient(self, outcome, u, combination, integers):
+        """
+        The outcome and its gradient with respect to the unit-box coordinates.
+        """
+        self.gradient_evaluations += len(u)
+        outcomes, jacobian = regret_BECCS_gradients(self.design(u, combination, integers), wrt=self.names)
+        return outcomes[outcome], jacobian[outcome] * self.width
+
+def ascend(search, outcome, u, combination, integers, iterations, step=0.1, tolerance=1e-4):
+    """
+    Projected gradient ascent of all points at once, each with its own step size: a step along the gradient
+    (scaled to a largest coordinate change of step) is kept if it improves the outcome, which grows the step by
+    half, and otherwise halves it.
+    """
+    u = u.copy()
+    value, gradient = search.gradient(outcome, u, combination, integers)
+    step = np.full(len(u), step)
+    for _ in range(iterations):
+        active = step > tolerance
+        if not active.any():
+            break
+        scale = np.abs(gradient[active]).max(axis=1, keepdims=True)
+        candidate = np.clip(u[active] + step[active, None] * gradient[active] / np.where(scale > 0, scale, 1.0), 0, 1)
+        candidate_value, candidate_gradient = search.gradient(outcome, candidate, combination[active],
+                                                              {name: values[active] for name, values in integers.items()})
+        better = candidate_value > value[active]
+        rows = np.flatnonzero(active)[better]
+        u[rows], value[rows], gradient[rows] = candidate[better], candidate_value[better], candidate_gradient[better]
+        step[active] = np.where(better, np.minimum(step[active] * 1.5, 0.5), step[active] / 2)
+    return u, value
+
+def polish_integers(search, outcome, u, combination, integers, value):
+    """
+    Each integer uncertainty in turn set to its best value, by evaluating every value at every point.
+    """
+    integers = {name: values.copy() for name, values in integers.items()}
+    for name, (lower, upper) in search.integer.items():
+        candidates = np.arange(lower, upper + 1)
+        repeated = np.repeat(np.arange(len(u)), len(candidates))
+        trial = {key: values[repeated] for key, values in integers.items()}
+        trial[name] = np.tile(candidates, len(u))
+        values = search.evaluate(outcome, u[repeated], combination[repeated], trial).reshape(len(u), len(candidates))
+        best = values.argmax(axis=1)
+        improved = values[np.arange(len(u)), best] > value
+        integers[name] = np.where(improved, candidates[best], integers[name])
+        value = np.where(improved, values[np.arange(len(u)), best], value)
+    return integers, value
+
+def distinct_best(u, combination, integers, value, k, min_distance):
+    """
+    Indices of the k highest values whose points differ from every better one in the shocks or integers, or by
+    at least min_distance in some unit-box coordinate.
+    """
+    chosen = []
+    for i in np.argsort(-value, kind="stable"):
+        if all(combination[i] != combination[j] or any(values[i] != values[j] for values in integers.values())
+               or np.abs(u[i] - u[j]).max() >= min_distance for j in chosen):
+            chosen.append(i)
+            if len(chosen) == k:
+                break
+    return np.array(chosen, dtype=int)
+
+def worst_case(tech, policy=None, k=5, screening=4, combinations=16, starts=8, iterations=30, min_distance=0.05,
+               seed=None, uncertainties=None):
+    """
+    The k distinct scenarios with the highest regret of tech for policy ({lever: value}; default: the
+    regret_BECCS defaults), as a DataFrame of the uncertainties and the regret, highest first.
+
+    screening random points are evaluated per shock combination, and starts ascents are run in each of the
+    combinations best ones. The numbers of model and gradient evaluations are in the attrs of the result.
+    """
+    outcome = f"regret_{tech}"
+    search = Search(*uncertainty_box(uncertainties), policy or {})
+    rng = np.random.default_rng(seed)
+    random_integers = lambda n: {name: rng.integers(lower, upper + 1, n) for name, (lower, upper) in search.integer.items()}
+
+    # 1. Screening of the shock combinations
+    screened_combination = np.repeat(np.arange(len(search.combinations)), screening)
+    screened_u = rng.random((len(screened_combination), len(search.names)))
+    screened_integers = random_integers(len(screened_combination))
+    screened_value = search.evaluate(outcome, screened_u, screened_combination, screened_integers)
+    ranking = pd.Series(screened_value).groupby(screened_combination).max().sort_values(ascending=False, kind="stable")
+
+    # 2. Starts: the best screened points of the kept combinations, then random points
+    rows = [np.flatnonzero(screened_combination == c)[np.argsort(-screened_value[screened_combination == c])][:starts]
+            for c in ranking.index[:combinations]]
+    rows = np.concatenate(rows)
+    extra = np.repeat(ranking.index[:combinations].to_numpy(), starts - min(starts, screening))
+    combination = np.concatenate([screened_combination[rows], extra])
+    u = np.vstack([screened_u[rows], rng.random((len(extra), len(search.names)))])
+    integers = {name: np.concatenate([values[rows], random_integers(len(extra))[name]])
+                for name, values in screened_integers.items()}
+
+    # 3. Ascent, integer polish, ascent
+    u, value = ascend(search, outcome, u, combination, integers, iterations)
+    integers, value = polish_integers(search, outcome, u, combination, integers, value)
+    u, value = ascend(search, outcome, u, combination, integers, iterations)
+
+    u = np.vstack([u, screened_u])
+    combination = np.concatenate([combination, screened_combination])
+    integers = {name: np.concatenate([values, screened_integers[name]]) for name, values in integers.items()}
+    value = np.concatenate([value, screened_value])
+    best = distinct_best(u, combination, integers, value, k, min_distance)
+    df = search.design(u[best], combination[best], {name: values[best] for name, values in integers.items()})
+    df = df.drop(columns=list(search.policy))
+    df[outcome] = value[best]
+    df.attrs.update(evaluations=search.evaluations, gradient_evaluations=search.gradient_evaluations)
+    return df.reset_index(drop=True)
+
+def worst_cases(techs=TECHS, policy=None, k=5, jobs=1, **options):
+    """
+    worst_case for every technology, {tech: DataFrame}, searched in jobs processes.
+    """
+    if jobs == 1:
+        return {tech: worst_case(tech, policy, k, **options) for tech in techs}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {tech: pool.submit(worst_case, tech, policy, k, **options) for tech in techs}
+        return {tech: future.result() for tech, future in futures.items()}
+
+if __name__ == "__main__":
+    import time
+    from controller import model
+    from designs import sample_design
+
+    policy = {"timing": 10, "rate": 0.90, "operating_increase": 600}
+    start = time.perf_counter()
+    found = worst_cases(policy=policy, k=3, seed=1)
+    print(f"Search: {time.perf_counter() - start:.1f} s")
+    sampled = sample_design(model.uncertainties, 200000, seed=1).assign(**policy)
+    results = regret_BECCS_batch(sampled)
+    for tech, df in found.items():
+        print(f"\nregret_{tech}: worst found {df[f'regret_{tech}'].iloc[0]:.1f} MEUR with {df.attrs['evaluations']} model and "
+              f"{df.attrs['gradient_evaluations']} gradient evaluations, worst of {len(sampled)} samples "
+              f"{results[f'regret_{tech}'].max():.1f} MEUR")
+        print(df.T)